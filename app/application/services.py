@@ -1,16 +1,93 @@
-from typing import List, Optional
+import random
+import time
+from array import array
+from contextlib import nullcontext
+from dataclasses import replace
+from typing import Callable, List, Optional, Tuple, TypeVar
 from datetime import datetime
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 
 from ..core.config import settings
-from ..domain.entities import Driver, Passenger, Trip, Invoice, Location, DriverStatus, TripStatus
+from ..domain.entities import (
+    Driver, Passenger, Trip, Invoice, Location, DriverStatus, TripStatus, FareQuote, NearbyQuery,
+    TripCursor, TripHistoryQuery, TrailPoint, RepositionSuggestion, NearbyDrivers
+)
+from ..domain.billing import (
+    InvoiceMismatch, ReconciliationReport, Rounding, TaxRate, bill, exact_cents, from_cents, to_cents
+)
 from ..domain.repositories import DriverRepository, PassengerRepository, TripRepository, InvoiceRepository
-from ..domain.services import calculate_distance, find_closest_drivers
+from ..domain.services import calculate_distance
+from ..domain.spatial import GridIndex
+from ..domain.pricing import SurgePricingEngine, zone_to_str
+from ..domain.exceptions import ConcurrencyConflictError, OutOfServiceAreaError
+from ..domain.trip_state import TripTimeouts, can_transition, sources_of
+from ..domain.zones import ZoneIndex
+from ..domain.liveness import DriverLiveness
+from ..domain.unit_of_work import UnitOfWork
+from ..domain.trail import LocationTrail, path_distance_km
+from ..domain.forecast import DemandForecast
+from ..domain.degradation import DriverSnapshot, NearbyDegradation
+
+T = TypeVar("T")
+
+
+class RetryPolicy:
+    """Re-run a read-modify-write flow when an optimistic update conflicts"""
+    
+    def __init__(self, attempts: int, backoff_seconds: float):
+        self.attempts = attempts
+        self.backoff_seconds = backoff_seconds
+    
+    def run(self, operation: Callable[[], T]) -> T:
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return operation()
+            except ConcurrencyConflictError:
+                if attempt == self.attempts:
+                    raise
+                # Exponential backoff with jitter so colliding requests spread out
+                time.sleep(self.backoff_seconds * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+    
+    @classmethod
+    def from_settings(cls) -> "RetryPolicy":
+        return cls(settings.conflict_retry_attempts, settings.conflict_retry_backoff_seconds)
+
+
+def _live_drivers(drivers: List[Driver], liveness: Optional[DriverLiveness]) -> List[Driver]:
+    return liveness.filter_live(drivers) if liveness else drivers
+
+
+def _search_nearby(
+    degradation: Optional[NearbyDegradation],
+    exact: Callable[[], List[Driver]],
+    approximate: Callable[[DriverSnapshot], List[Driver]]
+) -> NearbyDrivers:
+    """Run a nearby search exactly and time it, or from the snapshot while degraded mode is on"""
+    snapshot = degradation.snapshot() if degradation else None
+    if snapshot is not None:
+        return NearbyDrivers(approximate(snapshot), approximate=True, staleness_seconds=snapshot.age_seconds())
+    start = time.perf_counter()
+    drivers = exact()
+    if degradation:
+        degradation.record_exact(time.perf_counter() - start)
+    return NearbyDrivers(drivers)
 
 
 class DriverService:
-    def __init__(self, driver_repo: DriverRepository):
+    def __init__(
+        self,
+        driver_repo: DriverRepository,
+        liveness: Optional[DriverLiveness] = None,
+        trail: Optional[LocationTrail] = None,
+        degradation: Optional[NearbyDegradation] = None
+    ):
         self.driver_repo = driver_repo
+        self.liveness = liveness
+        self.trail = trail
+        self.degradation = degradation
+    
+    def get_location_trail(self, driver_id: int, start: datetime, end: datetime) -> List[TrailPoint]:
+        return self.trail.points(driver_id, start, end) if self.trail else []
     
     def get_all_drivers(self) -> List[Driver]:
         return self.driver_repo.get_all()
@@ -21,16 +98,78 @@ class DriverService:
     def get_available_drivers(self) -> List[Driver]:
         return self.driver_repo.get_available()
     
-    def get_available_drivers_within_radius(self, location: Location, radius_km: float = None) -> List[Driver]:
+    def get_available_drivers_within_radius(self, location: Location, radius_km: float = None) -> NearbyDrivers:
         if radius_km is None:
             radius_km = settings.default_search_radius_km
-        return self.driver_repo.get_available_within_radius(location, radius_km)
+        return _search_nearby(
+            self.degradation,
+            lambda: _live_drivers(self.driver_repo.get_available_within_radius(location, radius_km), self.liveness),
+            lambda snapshot: _live_drivers(snapshot.within(location, radius_km), self.liveness)
+        )
+    
+    def get_available_drivers_nearby_batch(self, queries: List[NearbyQuery]) -> List[List[Tuple[Driver, float]]]:
+        """Closest available drivers for many points, as (driver, distance_km) lists in query order.
+        
+        The available drivers are loaded and indexed once for the whole batch.
+        """
+        drivers = [driver for driver in _live_drivers(self.driver_repo.get_available(), self.liveness) if driver.current_location]
+        index = GridIndex(
+            [driver.current_location.latitude for driver in drivers],
+            [driver.current_location.longitude for driver in drivers],
+            cell_size_km=settings.default_search_radius_km
+        )
+        results = []
+        for query in queries:
+            radius_km = settings.default_search_radius_km if query.radius_km is None else query.radius_km
+            limit = settings.max_nearby_drivers if query.limit is None else query.limit
+            results.append([(drivers[i], distance) for i, distance in index.within(query.location, radius_km, limit)])
+        return results
+
+
+class RepositionService:
+    def __init__(self, forecast: Optional[DemandForecast], driver_repo: DriverRepository, liveness: Optional[DriverLiveness] = None):
+        self.forecast = forecast
+        self.driver_repo = driver_repo
+        self.liveness = liveness
+    
+    def suggest_for_driver(self, driver_id: int, now: Optional[datetime] = None) -> Optional[List[RepositionSuggestion]]:
+        """Nearby cells where an idle driver can expect more pickups this hour; None if no such driver.
+        
+        Busy, offline and unlocated drivers get no suggestions.
+        """
+        driver = self.driver_repo.get_by_id(driver_id)
+        if not driver:
+            return None
+        location = driver.current_location
+        if not self.forecast or driver.status != DriverStatus.AVAILABLE or not location:
+            return []
+        
+        radius_km = settings.reposition_radius_km
+        # Drivers in a candidate cell can sit up to a cell beyond the radius from its center
+        idle_drivers = _live_drivers(
+            self.driver_repo.get_available_within_radius(location, radius_km + self.forecast.cell_size_km), self.liveness
+        )
+        supply = {}
+        for idle_driver in idle_drivers:
+            zone = self.forecast.zone_for(idle_driver.current_location)
+            supply[zone] = supply.get(zone, 0) + 1
+        return self.forecast.suggest(
+            location, now or datetime.utcnow(), radius_km, settings.max_reposition_suggestions, supply
+        )
 
 
 class PassengerService:
-    def __init__(self, passenger_repo: PassengerRepository, driver_repo: DriverRepository):
+    def __init__(
+        self,
+        passenger_repo: PassengerRepository,
+        driver_repo: DriverRepository,
+        liveness: Optional[DriverLiveness] = None,
+        degradation: Optional[NearbyDegradation] = None
+    ):
         self.passenger_repo = passenger_repo
         self.driver_repo = driver_repo
+        self.liveness = liveness
+        self.degradation = degradation
     
     def get_all_passengers(self) -> List[Passenger]:
         return self.passenger_repo.get_all()
@@ -38,79 +177,268 @@ class PassengerService:
     def get_passenger_by_id(self, passenger_id: int) -> Optional[Passenger]:
         return self.passenger_repo.get_by_id(passenger_id)
     
-    def get_closest_drivers_for_passenger(self, passenger_id: int, pickup_location: Location, limit: int = None) -> List[Driver]:
+    def get_closest_drivers_for_passenger(self, passenger_id: int, pickup_location: Location, limit: int = None) -> NearbyDrivers:
         if limit is None:
             limit = settings.max_nearby_drivers
-        available_drivers = self.driver_repo.get_available()
-        return find_closest_drivers(available_drivers, pickup_location, limit)
+        
+        def exact() -> List[Driver]:
+            # Spares cover drivers dropped by the liveness filter; ask again for more if they were not enough
+            wanted = limit * 2 if self.liveness else limit
+            while True:
+                closest = self.driver_repo.get_closest_available(pickup_location, wanted)
+                live = _live_drivers(closest, self.liveness)
+                if len(live) >= limit or len(closest) < wanted:
+                    return live[:limit]
+                wanted *= 2
+        
+        def approximate(snapshot: DriverSnapshot) -> List[Driver]:
+            # Ask for spares so a few drivers dropped by the liveness filter don't shorten the list
+            closest = _live_drivers(snapshot.closest(pickup_location, limit * 2), self.liveness)
+            return closest[:limit]
+        
+        return _search_nearby(self.degradation, exact, approximate)
 
 
 class TripService:
-    def __init__(self, trip_repo: TripRepository, driver_repo: DriverRepository, passenger_repo: PassengerRepository):
+    def __init__(
+        self,
+        trip_repo: TripRepository,
+        driver_repo: DriverRepository,
+        passenger_repo: PassengerRepository,
+        pricing_engine: Optional[SurgePricingEngine] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        trip_timeouts: Optional[TripTimeouts] = None,
+        zone_index: Optional[ZoneIndex] = None,
+        liveness: Optional[DriverLiveness] = None,
+        unit_of_work: Optional[UnitOfWork] = None,
+        trail: Optional[LocationTrail] = None
+    ):
         self.trip_repo = trip_repo
         self.driver_repo = driver_repo
         self.passenger_repo = passenger_repo
+        self.pricing_engine = pricing_engine
+        self.retry_policy = retry_policy or RetryPolicy.from_settings()
+        self.trip_timeouts = trip_timeouts
+        self.zone_index = zone_index
+        self.liveness = liveness
+        # Each write flow attempt commits once; without a unit of work every repository write commits
+        self.unit_of_work = unit_of_work or nullcontext()
+        self.trail = trail
     
     def get_all_active_trips(self) -> List[Trip]:
         return self.trip_repo.get_all_active()
     
+    def get_trip_history(self, query: TripHistoryQuery) -> Tuple[List[Trip], Optional[TripCursor]]:
+        """One page of trips, newest first, and the cursor of the next page (None on the last page)"""
+        trips = self.trip_repo.get_history(replace(query, limit=query.limit + 1))
+        if len(trips) <= query.limit:
+            return trips, None
+        last = trips[query.limit - 1]
+        return trips[:query.limit], TripCursor(created_at=last.created_at, trip_id=last.id)
+    
     def create_trip_request(self, passenger_id: int, pickup_location: Location, destination_location: Optional[Location] = None) -> Optional[Trip]:
         passenger = self.passenger_repo.get_by_id(passenger_id)
         if not passenger:
             return None
         
-        available_drivers = self.driver_repo.get_available_within_radius(pickup_location, settings.default_search_radius_km)
-        if not available_drivers:
-            return None
+        pickup_zone = None
+        if self.zone_index:
+            zone = self.zone_index.classify(pickup_location.latitude, pickup_location.longitude)
+            if zone is None and settings.enforce_service_area:
+                raise OutOfServiceAreaError()
+            pickup_zone = zone.id if zone else None
         
-        closest_drivers = find_closest_drivers(available_drivers, pickup_location, 1)
-        if not closest_drivers:
-            return None
-        closest_driver = closest_drivers[0]
+        if self.pricing_engine:
+            self.pricing_engine.record_demand(pickup_location)
         
-        trip = Trip(
-            id=None,
-            passenger_id=passenger_id,
-            driver_id=closest_driver.id,
-            pickup_location=pickup_location,
-            destination_location=destination_location,
-            status=TripStatus.REQUESTED,
-            fare=None,
-            distance_km=None
+        trip = self.retry_policy.run(
+            lambda: self._assign_closest_driver(passenger_id, pickup_location, destination_location, pickup_zone)
         )
+        if trip and self.trip_timeouts:
+            self.trip_timeouts.schedule(trip.id)
+        return trip
+    
+    def _find_closest_driver(
+        self, location: Location, exclude_driver_id: Optional[int] = None
+    ) -> Tuple[Optional[Driver], float]:
+        """Closest live driver and the search radius it took: the default radius, widened step by step up to the cap.
         
-        created_trip = self.trip_repo.create(trip)
+        A dense area costs one query at the default radius, as before. When that finds nobody, the drivers within
+        the cap are read in one more query and the rings are widened in memory over a grid index.
+        """
+        max_radius_km = max(settings.max_search_radius_km, settings.default_search_radius_km)
+        radius_km = min(settings.default_search_radius_km, max_radius_km)
         
-        closest_driver.status = DriverStatus.BUSY
-        self.driver_repo.update(closest_driver)
+        def candidates_within(radius: float) -> List[Driver]:
+            return [
+                driver for driver in _live_drivers(self.driver_repo.get_available_within_radius(location, radius), self.liveness)
+                if driver.id != exclude_driver_id and driver.current_location
+            ]
         
-        return created_trip
-    
-    def complete_trip(self, trip_id: int, destination_location: Location, fare: Decimal) -> Optional[Trip]:
-        trip = self.trip_repo.get_by_id(trip_id)
-        if not trip or trip.status != TripStatus.REQUESTED:
-            return None
+        candidates = candidates_within(radius_km)
+        if candidates or radius_km >= max_radius_km:
+            closest = min(candidates, key=lambda driver: calculate_distance(
+                location.latitude, location.longitude, driver.current_location.latitude, driver.current_location.longitude
+            ), default=None)
+            return closest, radius_km
         
-        distance_km = calculate_distance(
-            trip.pickup_location.latitude, trip.pickup_location.longitude,
-            destination_location.latitude, destination_location.longitude
+        candidates = candidates_within(max_radius_km)
+        index = GridIndex(
+            [driver.current_location.latitude for driver in candidates],
+            [driver.current_location.longitude for driver in candidates],
+            cell_size_km=settings.search_radius_step_km
+        )
+        matches, radius_km = index.nearest(
+            location, 1, radius_km + settings.search_radius_step_km, settings.search_radius_step_km, max_radius_km
         )
+        return (candidates[matches[0][0]] if matches else None), radius_km
+    
+    def _claim_driver(self, driver: Driver) -> None:
+        # The versioned update fails if another request claimed the driver first
+        driver.status = DriverStatus.BUSY
+        self.driver_repo.update(driver)
+    
+    def _assign_closest_driver(
+        self, passenger_id: int, pickup_location: Location, destination_location: Optional[Location], pickup_zone: Optional[str] = None
+    ) -> Optional[Trip]:
+        closest_driver, search_radius_km = self._find_closest_driver(pickup_location)
+        if not closest_driver:
+            return None
         
-        trip.destination_location = destination_location
-        trip.status = TripStatus.COMPLETED
-        trip.fare = fare
-        trip.distance_km = distance_km
-        trip.completed_at = datetime.utcnow()
+        with self.unit_of_work:
+            self._claim_driver(closest_driver)
+            trip = Trip(
+                id=None,
+                passenger_id=passenger_id,
+                driver_id=closest_driver.id,
+                pickup_location=pickup_location,
+                destination_location=destination_location,
+                status=TripStatus.REQUESTED,
+                fare=None,
+                distance_km=None,
+                pickup_zone=pickup_zone,
+                search_radius_km=search_radius_km
+            )
+            return self.trip_repo.create(trip)
+    
+    def _transition(
+        self, trip_id: int, target: TripStatus, apply: Optional[Callable[[Trip], None]] = None, release_driver: bool = False
+    ) -> Optional[Trip]:
+        """Move a trip to target if the state machine allows it; None otherwise"""
+        def attempt() -> Optional[Trip]:
+            with self.unit_of_work:
+                trip = self.trip_repo.get_by_id(trip_id)
+                if not trip or not can_transition(trip.status, target):
+                    return None
+                trip.status = target
+                if apply:
+                    apply(trip)
+                updated = self.trip_repo.update(trip)
+                if release_driver and updated.driver_id:
+                    self._release_driver(updated.driver_id)
+                return updated
         
-        updated_trip = self.trip_repo.update(trip)
+        return self.retry_policy.run(attempt)
+    
+    def accept_trip(self, trip_id: int) -> Optional[Trip]:
+        # Accepting and starting need nothing from the current row, so the state machine
+        # check rides in the UPDATE's WHERE clause: one statement, no conflict to retry
+        trip = self.trip_repo.update_status_if(trip_id, sources_of(TripStatus.ACCEPTED), TripStatus.ACCEPTED)
+        if trip and self.trip_timeouts:
+            self.trip_timeouts.cancel(trip_id)
+        return trip
+    
+    def start_trip(self, trip_id: int) -> Optional[Trip]:
+        return self.trip_repo.update_status_if(
+            trip_id, sources_of(TripStatus.IN_PROGRESS), TripStatus.IN_PROGRESS, started_at=datetime.utcnow()
+        )
+    
+    def cancel_trip(self, trip_id: int) -> Optional[Trip]:
+        trip = self._transition(trip_id, TripStatus.CANCELLED, release_driver=True)
+        return self._settle(trip)
+    
+    def complete_trip(self, trip_id: int, destination_location: Location, fare: Decimal) -> Optional[Trip]:
+        def apply(trip: Trip) -> None:
+            trip.destination_location = destination_location
+            trip.fare = fare
+            trip.completed_at = datetime.utcnow()
+            trip.distance_km = self._driven_distance(trip)
         
-        if trip.driver_id:
-            driver = self.driver_repo.get_by_id(trip.driver_id)
-            if driver:
-                driver.status = DriverStatus.AVAILABLE
-                self.driver_repo.update(driver)
+        trip = self._transition(trip_id, TripStatus.COMPLETED, apply, release_driver=True)
+        return self._settle(trip)
+    
+    def _driven_distance(self, trip: Trip) -> float:
+        """Length of the recorded trail between start and completion; straight line when there is none"""
+        if self.trail and trip.driver_id and trip.started_at:
+            points = self.trail.points(trip.driver_id, trip.started_at, trip.completed_at)
+            if len(points) >= 2:
+                return path_distance_km(points)
+        return calculate_distance(
+            trip.pickup_location.latitude, trip.pickup_location.longitude,
+            trip.destination_location.latitude, trip.destination_location.longitude
+        )
+    
+    def get_trip_trail(self, trip_id: int) -> Optional[List[TrailPoint]]:
+        """Where the driver went between start and completion (up to now for a trip in progress); None if no such trip"""
+        trip = self.trip_repo.get_by_id(trip_id)
+        if not trip:
+            return None
+        if not self.trail or not trip.driver_id or not trip.started_at:
+            return []
+        return self.trail.points(trip.driver_id, trip.started_at, trip.completed_at or datetime.utcnow())
+    
+    def expire_trip(self, trip_id: int) -> Optional[Trip]:
+        """Handle an acceptance timeout: reassign the trip to the next closest driver, or cancel it"""
+        def attempt() -> Optional[Trip]:
+            with self.unit_of_work:
+                trip = self.trip_repo.get_by_id(trip_id)
+                if not trip or trip.status != TripStatus.REQUESTED:
+                    return None
+                previous_driver_id = trip.driver_id
+                next_driver, search_radius_km = self._find_closest_driver(
+                    trip.pickup_location, exclude_driver_id=previous_driver_id
+                )
+                if next_driver:
+                    self._claim_driver(next_driver)
+                    trip.driver_id = next_driver.id
+                    trip.search_radius_km = search_radius_km
+                else:
+                    trip.status = TripStatus.CANCELLED
+                try:
+                    updated = self.trip_repo.update(trip)
+                except ConcurrencyConflictError:
+                    # The trip moved on (e.g. accepted at the last moment); hand the new driver back.
+                    # Inside a unit of work the claim is rolled back with it anyway.
+                    if next_driver:
+                        self._release_driver(next_driver.id)
+                    raise
+                if previous_driver_id:
+                    self._release_driver(previous_driver_id)
+                return updated
         
-        return updated_trip
+        trip = self.retry_policy.run(attempt)
+        if trip and trip.status == TripStatus.REQUESTED and self.trip_timeouts:
+            self.trip_timeouts.schedule(trip.id)
+        return trip
+    
+    def schedule_pending_timeouts(self) -> int:
+        """Re-arm acceptance timeouts for trips still awaiting a driver, e.g. after a restart"""
+        if not self.trip_timeouts:
+            return 0
+        pending = self.trip_repo.get_by_status(TripStatus.REQUESTED)
+        for trip in pending:
+            self.trip_timeouts.schedule(trip.id)
+        return len(pending)
+    
+    def _settle(self, trip: Optional[Trip]) -> Optional[Trip]:
+        """Drop the timers of a trip that reached a terminal state (its driver is released with the transition)"""
+        if trip and self.trip_timeouts:
+            self.trip_timeouts.cancel(trip.id)
+        return trip
+    
+    def _release_driver(self, driver_id: int) -> None:
+        # Only a BUSY driver goes back to AVAILABLE; never resurrect one who went offline
+        self.driver_repo.update_status_if(driver_id, DriverStatus.BUSY, DriverStatus.AVAILABLE)
 
 
 class InvoiceService:
@@ -127,17 +455,91 @@ class InvoiceService:
         if existing_invoice:
             return existing_invoice
         
-        tax_rate = Decimal(str(settings.tax_rate))
-        amount = trip.fare
-        tax_amount = amount * tax_rate
-        total_amount = amount + tax_amount
+        rounding = Rounding(settings.billing_rounding)
+        amount = to_cents(trip.fare, rounding)
+        tax_amount = TaxRate(settings.tax_rate).tax(amount, rounding)
         
         invoice = Invoice(
             id=None,
             trip_id=trip_id,
-            amount=amount,
-            tax_amount=tax_amount,
-            total_amount=total_amount
+            amount=from_cents(amount),
+            tax_amount=from_cents(tax_amount),
+            total_amount=from_cents(amount + tax_amount)
         )
         
-        return self.invoice_repo.create(invoice)
\ No newline at end of file
+        return self.invoice_repo.create(invoice)
+    
+    def reconcile(self, batch_size: int = 5000, max_mismatches: int = 100) -> ReconciliationReport:
+        """Recompute every stored invoice from its trip's fare and compare, column by column.
+        
+        Invoices of archived trips are recomputed from their stored amount. Each
+        batch is billed in one pass; stored values that are not whole cents never match.
+        """
+        rounding = Rounding(settings.billing_rounding)
+        rate = TaxRate(settings.tax_rate)
+        report = ReconciliationReport(tax_rate=Decimal(str(settings.tax_rate)), rounding=rounding)
+        for batch in self.invoice_repo.iter_stored(batch_size):
+            amounts = array("q")
+            for invoice in batch:
+                if invoice.fare is None:
+                    report.fares_unavailable += 1
+                amounts.append(to_cents(invoice.amount if invoice.fare is None else invoice.fare, rounding))
+            lines = bill(amounts, rate, rounding)
+            report.expected.add(lines.sums())
+            for invoice, amount, tax_amount, total_amount in zip(batch, lines.amounts, lines.taxes, lines.totals):
+                report.invoices += 1
+                report.stored_amount += invoice.amount
+                report.stored_tax += invoice.tax_amount
+                report.stored_total += invoice.total_amount
+                mismatched = False
+                for column, stored, expected in (
+                    ("amount", invoice.amount, amount),
+                    ("tax_amount", invoice.tax_amount, tax_amount),
+                    ("total_amount", invoice.total_amount, total_amount)
+                ):
+                    if exact_cents(stored) == expected:
+                        continue
+                    mismatched = True
+                    if len(report.mismatches) < max_mismatches:
+                        report.mismatches.append(InvoiceMismatch(
+                            invoice.invoice_id, invoice.trip_id, column, stored, from_cents(expected)
+                        ))
+                report.mismatched_invoices += mismatched
+        return report
+
+
+class PricingService:
+    def __init__(self, pricing_engine: SurgePricingEngine, driver_repo: DriverRepository, refresh_on_request: bool = True):
+        self.pricing_engine = pricing_engine
+        self.driver_repo = driver_repo
+        # Off when a background refresher keeps the surge tables current
+        self.refresh_on_request = refresh_on_request
+    
+    def refresh(self) -> bool:
+        """Recompute surge tables when the tick interval has elapsed; one caller at a time"""
+        return self.pricing_engine.refresh_if_due(self.driver_repo.get_available)
+    
+    def quote(self, pickup_location: Location, destination_location: Optional[Location] = None) -> FareQuote:
+        if self.refresh_on_request:
+            self.refresh()
+        zone, multiplier = self.pricing_engine.multiplier_for(pickup_location)
+        
+        base_fare = Decimal(str(settings.base_fare))
+        distance_km = None
+        fare = base_fare
+        if destination_location:
+            distance_km = calculate_distance(
+                pickup_location.latitude, pickup_location.longitude,
+                destination_location.latitude, destination_location.longitude
+            )
+            fare += Decimal(str(settings.per_km_rate)) * Decimal(str(distance_km))
+        
+        estimated_fare = (fare * Decimal(str(multiplier))).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        
+        return FareQuote(
+            zone=zone_to_str(zone),
+            surge_multiplier=multiplier,
+            base_fare=base_fare,
+            distance_km=distance_km,
+            estimated_fare=estimated_fare
+        )
@@ -0,0 +1,165 @@
+"""
+Command line entry points for operational tasks.
+
+Schema bootstrap and sample data loading live here so the API process does not
+have to run them on every boot (see the FAST_BOOT setting).
+
+Usage:
+    python -m app.cli init-db [--seed]
+    python -m app.cli seed
+    python -m app.cli archive-trips [--older-than-days N]
+    python -m app.cli fit-demand [--weeks N]
+    python -m app.cli reconcile-invoices [--batch-size N]
+    python -m app.cli serve [--workers N]
+
+Pass --city NAME before the command to run it against a configured city's database.
+"""
+
+import argparse
+
+
+def init_db(args: argparse.Namespace) -> None:
+    from .infrastructure.database import create_tables
+    create_tables()
+    print("Database schema is up to date.")
+    if args.seed:
+        seed(args)
+
+
+def seed(args: argparse.Namespace) -> None:
+    from .infrastructure.seed_data import create_sample_data
+    create_sample_data()
+
+
+def archive_trips(args: argparse.Namespace) -> None:
+    from datetime import datetime, timedelta
+    from .core.config import settings
+    from .infrastructure.database import current_session_factory
+    from .infrastructure.trip_partitions import archive_settled_trips
+    days = settings.trip_archive_after_days if args.older_than_days is None else args.older_than_days
+    db = current_session_factory()()
+    try:
+        moved = archive_settled_trips(db, datetime.utcnow() - timedelta(days=days))
+    finally:
+        db.close()
+    print(f"Moved {moved} settled trips into monthly partitions.")
+
+
+def fit_demand(args: argparse.Namespace) -> None:
+    from .core.config import settings
+    from .infrastructure.database import current_session_factory
+    from .infrastructure.demand_forecast import fit_from_trips, save_forecast
+    weeks = settings.demand_forecast_weeks if args.weeks is None else args.weeks
+    db = current_session_factory()()
+    try:
+        forecast = fit_from_trips(db, weeks, settings.demand_cell_size_km, settings.demand_forecast_alpha)
+    finally:
+        db.close()
+    save_forecast(forecast, settings.demand_forecast_path)
+    print(f"Fitted demand for {len(forecast.cells)} cells over {weeks} weeks into {settings.demand_forecast_path}.")
+
+
+def reconcile_invoices(args: argparse.Namespace) -> None:
+    from .application.services import InvoiceService
+    from .domain.billing import from_cents
+    from .infrastructure.database import current_session_factory
+    from .infrastructure.repositories import SQLInvoiceRepository, SQLTripRepository
+    db = current_session_factory()()
+    try:
+        report = InvoiceService(SQLInvoiceRepository(db), SQLTripRepository(db)).reconcile(
+            args.batch_size, args.max_mismatches
+        )
+    finally:
+        db.close()
+    expected = report.expected
+    print(
+        f"Checked {report.invoices} invoices at tax rate {report.tax_rate} ({report.rounding.value}); "
+        f"{report.fares_unavailable} recomputed from their amount (trip archived)."
+    )
+    print(f"stored:   amount {report.stored_amount}  tax {report.stored_tax}  total {report.stored_total}")
+    print(f"expected: amount {from_cents(expected.amount)}  tax {from_cents(expected.tax)}  total {from_cents(expected.total)}")
+    for mismatch in report.mismatches:
+        print(
+            f"invoice {mismatch.invoice_id} (trip {mismatch.trip_id}) {mismatch.column}: "
+            f"stored {mismatch.stored}, expected {mismatch.expected}"
+        )
+    if not report.reconciled:
+        print(f"{report.mismatched_invoices} invoices do not reconcile.")
+        raise SystemExit(1)
+    print("All invoices reconcile.")
+
+
+def serve(args: argparse.Namespace) -> None:
+    import uvicorn
+    from .core.config import settings
+    # Each worker is a separate process with its own in-memory state,
+    # kept consistent through the change feed
+    uvicorn.run(
+        "main:app",
+        host=args.host or settings.host,
+        port=args.port or settings.port,
+        workers=args.workers or settings.workers
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Taxi24 operational commands")
+    parser.add_argument("--city", help="Run against this city from CITIES (default: DATABASE_URL and the base settings)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init_db_parser = commands.add_parser("init-db", help="Create missing database tables")
+    init_db_parser.add_argument("--seed", action="store_true", help="Also load sample data")
+    init_db_parser.set_defaults(handler=init_db)
+
+    seed_parser = commands.add_parser("seed", help="Load sample data into an empty database")
+    seed_parser.set_defaults(handler=seed)
+
+    archive_parser = commands.add_parser(
+        "archive-trips", help="Move settled trips into monthly history partitions"
+    )
+    archive_parser.add_argument(
+        "--older-than-days", type=int, help="Archive trips created before this many days ago (default: TRIP_ARCHIVE_AFTER_DAYS)"
+    )
+    archive_parser.set_defaults(handler=archive_trips)
+
+    fit_parser = commands.add_parser("fit-demand", help="Fit the demand forecast used to reposition idle drivers")
+    fit_parser.add_argument("--weeks", type=int, help="Weeks of trip requests to fit on (default: DEMAND_FORECAST_WEEKS)")
+    fit_parser.set_defaults(handler=fit_demand)
+
+    reconcile_parser = commands.add_parser(
+        "reconcile-invoices", help="Compare every stored invoice with its amounts recomputed from the trip fare"
+    )
+    reconcile_parser.add_argument("--batch-size", type=int, default=5000, help="Invoices read and billed per batch")
+    reconcile_parser.add_argument("--max-mismatches", type=int, default=100, help="Mismatches to list")
+    reconcile_parser.set_defaults(handler=reconcile_invoices)
+
+    serve_parser = commands.add_parser("serve", help="Run the API with one or more worker processes")
+    serve_parser.add_argument("--workers", type=int, help="Number of worker processes (default: WORKERS)")
+    serve_parser.add_argument("--host", help="Bind address (default: HOST)")
+    serve_parser.add_argument("--port", type=int, help="Bind port (default: PORT)")
+    serve_parser.set_defaults(handler=serve)
+
+    return parser
+
+
+def main(argv=None) -> None:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.city is None:
+        args.handler(args)
+        return
+    from .core.config import process_settings, use_city_settings
+    from .infrastructure.database import bind_database, open_database
+    if args.city not in process_settings.cities:
+        parser.error(f"unknown city {args.city!r}; configure it in CITIES")
+    city = process_settings.for_city(args.city)
+    database = open_database(city)
+    try:
+        with use_city_settings(city), bind_database(database):
+            args.handler(args)
+    finally:
+        database.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
-from typing import Optional
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -7,6 +10,11 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./taxi24.db"
+    replica_database_urls: List[str] = []
+    replica_selection: str = "round_robin"  # or "least_latency"
+    replica_health_check_interval_seconds: float = 5.0
+    # Reads of a client that just wrote stay on the primary this long (0 disables)
+    replica_read_after_write_seconds: float = 5.0
     
     # API
     api_title: str = "Taxi24 API"
@@ -15,15 +23,171 @@ class Settings(BaseSettings):
     
     # Business Logic
     default_search_radius_km: float = 3.0
+    # Dispatch widens its search from the default radius in steps up to the cap
+    search_radius_step_km: float = 2.0
+    max_search_radius_km: float = 10.0
     tax_rate: float = 0.18  # 18% tax
+    billing_rounding: str = "half_up"  # half_up, half_even, half_down, up or down, to the cent
     max_nearby_drivers: int = 3
+    conflict_retry_attempts: int = 3
+    conflict_retry_backoff_seconds: float = 0.01
+    
+    # Trip acceptance timeouts
+    trip_acceptance_timeout_seconds: float = 30.0
+    trip_scheduler_enabled: bool = True
+    trip_scheduler_tick_seconds: float = 1.0
+    trip_scheduler_wheel_size: int = 512
+    
+    # Pricing
+    base_fare: float = 5.00
+    per_km_rate: float = 1.50
+    surge_cell_size_km: float = 1.0
+    surge_window_seconds: float = 300.0
+    surge_tick_seconds: float = 15.0
+    surge_sensitivity: float = 0.5
+    surge_max_multiplier: float = 3.0
+    # Tick the surge tables in a background thread; otherwise the first quote after each tick does it
+    surge_refresh_enabled: bool = True
+    
+    # Service zones (GeoJSON polygons; the bundled Lima zones when unset)
+    zones_geojson_path: Optional[str] = None
+    enforce_service_area: bool = True
+    
+    # Idempotency
+    idempotency_ttl_seconds: float = 86400.0
+    idempotency_max_keys: int = 100000
+    idempotency_wait_timeout_seconds: float = 30.0
+    
+    # Admission control
+    rate_limit_enabled: bool = True
+    rate_limit_backend_path: Optional[str] = None  # SQLite file shared by workers; in-process when unset
+    rate_limit_idle_ttl_seconds: float = 300.0
+    rate_limit_api_keys: List[str] = []  # issued X-API-Key values limited per key; other clients per IP
+    nearby_rate_per_second: float = 10.0
+    nearby_burst: int = 20
+    concurrency_initial_limit: int = 32
+    concurrency_min_limit: int = 4
+    concurrency_max_limit: int = 128
+    concurrency_high_priority_reserve: int = 16
+    concurrency_queue_delay_target_seconds: float = 0.05  # waits longer than this shrink the limit
+    concurrency_max_queue_wait_seconds: float = 0.5  # requests still waiting for a slot then are shed
+    
+    # Degraded nearby search: approximate answers from a snapshot while the latency SLO is breached
+    nearby_degradation_enabled: bool = True
+    nearby_latency_slo_seconds: float = 0.25
+    nearby_latency_quantile: float = 0.95
+    nearby_latency_window_seconds: float = 10.0
+    nearby_latency_min_samples: int = 10
+    nearby_recover_ratio: float = 0.7
+    nearby_probe_every: int = 10
+    nearby_snapshot_refresh_seconds: float = 2.0
+    
+    # Change feed (keeps per-worker in-memory state in sync)
+    change_feed_enabled: bool = True
+    change_feed_poll_interval_seconds: float = 0.05
+    change_feed_batch_size: int = 500
+    change_feed_retention_seconds: float = 3600.0
+    change_feed_gap_grace_seconds: float = 5.0  # how long a missing event id may still commit (PostgreSQL)
+    # Warm restarts: the fleet state is saved here periodically and restored on boot,
+    # replaying only the change feed since then (a full load when that was pruned)
+    fleet_snapshot_enabled: bool = True
+    fleet_snapshot_path: str = "./fleet_state.snapshot"
+    fleet_snapshot_interval_seconds: float = 30.0
+    
+    # Driver heartbeats (drivers silent for the TTL are taken offline)
+    heartbeat_enabled: bool = True
+    heartbeat_ttl_seconds: float = 60.0
+    heartbeat_sweep_interval_seconds: float = 5.0
+    
+    # Driver location trails (compressed ping chunks, used for trip distances)
+    trail_enabled: bool = True
+    trail_chunk_points: int = 256
+    trail_chunk_span_seconds: float = 60.0
+    trail_flush_interval_seconds: float = 5.0
+    
+    # Demand forecast for repositioning idle drivers (fitted offline: `python -m app.cli fit-demand`)
+    demand_forecast_path: str = "./demand_forecast.json"
+    demand_forecast_weeks: int = 8
+    demand_forecast_alpha: float = 0.3
+    demand_cell_size_km: float = 1.0
+    reposition_radius_km: float = 5.0
+    max_reposition_suggestions: int = 3
+    
+    # Trip history: settled trips older than this move to monthly partitions (`python -m app.cli archive-trips`)
+    trip_archive_after_days: int = 90
+    
+    # SQL query budgets per endpoint: "off", "log" (warn on overrun) or "raise" (tests)
+    query_budget_mode: str = "log"
+    
+    # Response encoding (gzip, or brotli when installed, above the threshold)
+    compression_enabled: bool = True
+    compression_min_size_bytes: int = 1024
+    
+    # Cities: name -> overrides of the settings above (at least its own database_url).
+    # Requests pick a city with the X-City header; the rest use the settings as they are.
+    cities: Dict[str, Dict[str, Any]] = {}
+    tenant_idle_ttl_seconds: float = 900.0  # a city unused this long is unloaded from memory
+    max_loaded_tenants: int = 8
     
     # Server
     host: str = "0.0.0.0"
     port: int = 8000
+    workers: int = 1
+    fast_boot: bool = False  # skip schema bootstrap and seeding on startup
+    # Import time main may add on top of FastAPI, pydantic and SQLAlchemy, as a fraction of theirs (0.20-0.27 measured);
+    # a ratio, so the budget holds on slow and fast machines alike
+    startup_import_budget_ratio: float = 0.3
     
     class Config:
         env_file = ".env"
+    
+    def for_city(self, city: str) -> "Settings":
+        """These settings with the city's overrides applied; KeyError for an unknown city.
+        
+        Files a city writes or reads on its own get the city's name before the
+        extension unless the city sets them (./fleet_state.lima.snapshot).
+        """
+        overrides = self.cities[city]
+        values = {**self.model_dump(), **overrides, "cities": {}}
+        for name in CITY_FILE_SETTINGS:
+            if name not in overrides:
+                root, extension = os.path.splitext(values[name])
+                values[name] = f"{root}.{city}{extension}"
+        return type(self).model_validate(values)
+
+
+# Per-city files: cities never share a fleet snapshot or a demand forecast
+CITY_FILE_SETTINGS = ("fleet_snapshot_path", "demand_forecast_path")
+
+
+_city_settings: ContextVar[Optional[Settings]] = ContextVar("city_settings", default=None)
+
+
+@contextmanager
+def use_city_settings(city: Settings) -> Iterator[None]:
+    """Make `settings` resolve to a city's settings in this context"""
+    token = _city_settings.set(city)
+    try:
+        yield
+    finally:
+        _city_settings.reset(token)
+
+
+class SettingsProxy:
+    """Reads the current city's settings, or the process settings outside a city.
+    
+    Assignments always change the process settings (cities copy them when loaded).
+    """
+    
+    def __init__(self, process: Settings):
+        object.__setattr__(self, "_process", process)
+    
+    def __getattr__(self, name: str):
+        return getattr(_city_settings.get() or self._process, name)
+    
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._process, name, value)
 
 
-settings = Settings()
\ No newline at end of file
+process_settings = Settings()
+settings = SettingsProxy(process_settings)
\ No newline at end of file
@@ -0,0 +1,150 @@
+from array import array
+from dataclasses import dataclass, field
+from decimal import Decimal
+from enum import Enum
+from typing import List, Optional, Sequence, Union
+
+
+class Rounding(str, Enum):
+    HALF_UP = "half_up"  # ties away from zero
+    HALF_EVEN = "half_even"  # ties to the even cent
+    HALF_DOWN = "half_down"  # ties toward zero
+    UP = "up"  # away from zero
+    DOWN = "down"  # toward zero
+
+
+def divide(numerator: int, denominator: int, rounding: Rounding) -> int:
+    """numerator / denominator (denominator > 0) rounded to an integer, without floats"""
+    quotient, remainder = divmod(numerator, denominator)  # floor division
+    if remainder == 0:
+        return quotient
+    if rounding is Rounding.DOWN:
+        return quotient if numerator >= 0 else quotient + 1
+    if rounding is Rounding.UP:
+        return quotient + 1 if numerator >= 0 else quotient
+    twice = 2 * remainder
+    if twice != denominator:
+        return quotient + 1 if twice > denominator else quotient
+    if rounding is Rounding.HALF_EVEN:
+        return quotient + (quotient & 1)
+    away = Rounding.HALF_UP is rounding
+    return quotient + 1 if (numerator >= 0) == away else quotient
+
+
+def to_cents(value: Decimal, rounding: Rounding = Rounding.HALF_UP) -> int:
+    """value in currency units as whole cents"""
+    numerator, denominator = (value * 100).as_integer_ratio()
+    return divide(numerator, denominator, rounding)
+
+
+def exact_cents(value: Decimal) -> Optional[int]:
+    """value as cents, or None when it is not a whole number of cents"""
+    numerator, denominator = (value * 100).as_integer_ratio()
+    return numerator if denominator == 1 else None
+
+
+def from_cents(cents: int) -> Decimal:
+    return Decimal(cents).scaleb(-2)
+
+
+class TaxRate:
+    """A tax rate held as an exact fraction, so 0.18 means 18/100 and not the nearest float"""
+
+    __slots__ = ("numerator", "denominator")
+
+    def __init__(self, rate: Union[Decimal, float, str]):
+        self.numerator, self.denominator = Decimal(str(rate)).as_integer_ratio()
+
+    def tax(self, amount_cents: int, rounding: Rounding) -> int:
+        return divide(amount_cents * self.numerator, self.denominator, rounding)
+
+
+@dataclass(slots=True)
+class BilledLines:
+    """Amount, tax and total per line, in cents; totals always equal amount + tax, line by line and summed"""
+    amounts: array
+    taxes: array
+    totals: array
+
+    def sums(self) -> "BillingTotals":
+        return BillingTotals(sum(self.amounts), sum(self.taxes), sum(self.totals))
+
+
+@dataclass(slots=True)
+class BillingTotals:
+    amount: int = 0
+    tax: int = 0
+    total: int = 0
+
+    def add(self, other: "BillingTotals") -> None:
+        self.amount += other.amount
+        self.tax += other.tax
+        self.total += other.total
+
+
+def bill(amounts: Sequence[int], rate: TaxRate, rounding: Rounding = Rounding.HALF_UP) -> BilledLines:
+    """Tax and total for many amounts (in cents) in one pass of integer arithmetic.
+
+    Non-negative amounts use a single floor division per line for every mode
+    but HALF_EVEN; the rest go through divide().
+    """
+    amounts = amounts if isinstance(amounts, array) else array("q", amounts)
+    numerator, denominator = rate.numerator, rate.denominator
+    if rounding is Rounding.HALF_EVEN or (amounts and min(amounts) < 0):
+        taxes = array("q", [divide(amount * numerator, denominator, rounding) for amount in amounts])
+    elif rounding is Rounding.DOWN:
+        taxes = array("q", [amount * numerator // denominator for amount in amounts])
+    elif rounding is Rounding.UP:
+        taxes = array("q", [-(-amount * numerator // denominator) for amount in amounts])
+    else:
+        # round(x / d) = floor((2x + d) / 2d), or ceil((2x - d) / 2d) when ties go down
+        twice_numerator, twice_denominator = 2 * numerator, 2 * denominator
+        if rounding is Rounding.HALF_UP:
+            taxes = array("q", [
+                (amount * twice_numerator + denominator) // twice_denominator for amount in amounts
+            ])
+        else:
+            taxes = array("q", [
+                -((denominator - amount * twice_numerator) // twice_denominator) for amount in amounts
+            ])
+    totals = array("q", map(int.__add__, amounts, taxes))
+    return BilledLines(amounts, taxes, totals)
+
+
+@dataclass(slots=True)
+class StoredInvoice:
+    """An invoice as stored, unrounded, with the fare of its trip when that is still in the trips table"""
+    invoice_id: int
+    trip_id: int
+    fare: Optional[Decimal]
+    amount: Decimal
+    tax_amount: Decimal
+    total_amount: Decimal
+
+
+@dataclass(slots=True)
+class InvoiceMismatch:
+    invoice_id: int
+    trip_id: int
+    column: str  # amount, tax_amount or total_amount
+    stored: Decimal
+    expected: Decimal
+
+
+@dataclass(slots=True)
+class ReconciliationReport:
+    """Stored invoices (summed exactly as stored) against the amounts recomputed from their fares (in cents)"""
+    tax_rate: Decimal
+    rounding: Rounding
+    invoices: int = 0
+    mismatched_invoices: int = 0
+    fares_unavailable: int = 0
+    stored_amount: Decimal = Decimal("0.00")
+    stored_tax: Decimal = Decimal("0.00")
+    stored_total: Decimal = Decimal("0.00")
+    expected: BillingTotals = field(default_factory=BillingTotals)
+    mismatches: List[InvoiceMismatch] = field(default_factory=list)
+
+    @property
+    def reconciled(self) -> bool:
+        return self.mismatched_invoices == 0
@@ -0,0 +1,42 @@
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from .entities import Driver, Location
+from .spatial import GridIndex
+
+
+class DriverSnapshot:
+    """Available drivers as of taken_at, indexed for approximate nearby searches"""
+
+    def __init__(self, drivers: List[Driver], cell_size_km: float, taken_at: Optional[float] = None):
+        self.drivers = [driver for driver in drivers if driver.current_location]
+        self.taken_at = time.time() if taken_at is None else taken_at
+        self.index = GridIndex(
+            [driver.current_location.latitude for driver in self.drivers],
+            [driver.current_location.longitude for driver in self.drivers],
+            cell_size_km=cell_size_km,
+            approximate=True
+        )
+
+    def age_seconds(self, now: Optional[float] = None) -> float:
+        return max((time.time() if now is None else now) - self.taken_at, 0.0)
+
+    def within(self, location: Location, radius_km: float) -> List[Driver]:
+        return [self.drivers[i] for i, _ in self.index.within(location, radius_km, len(self.drivers))]
+
+    def closest(self, location: Location, limit: int) -> List[Driver]:
+        return [self.drivers[i] for i, _ in self.index.closest(location, limit)]
+
+
+class NearbyDegradation(ABC):
+    """Switches nearby searches to an approximate snapshot while their latency SLO is breached"""
+
+    @abstractmethod
+    def snapshot(self) -> Optional[DriverSnapshot]:
+        """The snapshot to serve this search from; None means search exactly (and record the latency)"""
+        pass
+
+    @abstractmethod
+    def record_exact(self, seconds: float) -> None:
+        pass
@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 from dataclasses import dataclass
 from decimal import Decimal
 
@@ -13,18 +13,19 @@ class DriverStatus(Enum):
 
 class TripStatus(Enum):
     REQUESTED = "requested"
+    ACCEPTED = "accepted"
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
     CANCELLED = "cancelled"
 
 
-@dataclass
+@dataclass(slots=True)
 class Location:
     latitude: float
     longitude: float
 
 
-@dataclass
+@dataclass(slots=True)
 class Driver:
     id: Optional[int]
     name: str
@@ -35,9 +36,10 @@ class Driver:
     current_location: Optional[Location]
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    version: Optional[int] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Passenger:
     id: Optional[int]
     name: str
@@ -47,7 +49,7 @@ class Passenger:
     updated_at: Optional[datetime] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Trip:
     id: Optional[int]
     passenger_id: int
@@ -59,13 +61,85 @@ class Trip:
     distance_km: Optional[float]
     created_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
+    version: Optional[int] = None
+    pickup_zone: Optional[str] = None
+    started_at: Optional[datetime] = None
+    search_radius_km: Optional[float] = None  # how far dispatch had to look for the driver
 
 
-@dataclass
+@dataclass(slots=True)
 class Invoice:
     id: Optional[int]
     trip_id: int
     amount: Decimal
     tax_amount: Decimal
     total_amount: Decimal
-    issued_at: Optional[datetime] = None
\ No newline at end of file
+    issued_at: Optional[datetime] = None
+
+
+@dataclass(slots=True)
+class FareQuote:
+    zone: str
+    surge_multiplier: float
+    base_fare: Decimal
+    distance_km: Optional[float]
+    estimated_fare: Decimal
+
+
+@dataclass(slots=True)
+class DriverPosition:
+    """Lightweight driver view built from a FleetSnapshot row"""
+    id: int
+    status: DriverStatus
+    current_location: Optional[Location]
+
+
+@dataclass(slots=True)
+class NearbyQuery:
+    """One point of a batch nearby-driver search; unset radius/limit use the defaults"""
+    location: Location
+    radius_km: Optional[float] = None
+    limit: Optional[int] = None
+
+
+@dataclass(slots=True, frozen=True)
+class TripCursor:
+    """Keyset position in a newest-first trip listing: the last (created_at, id) returned"""
+    created_at: datetime
+    trip_id: int
+
+
+@dataclass(slots=True)
+class TripHistoryQuery:
+    """Trip history filter; start is inclusive, end exclusive, results newest first"""
+    passenger_id: Optional[int] = None
+    driver_id: Optional[int] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    before: Optional[TripCursor] = None
+    limit: int = 50
+
+
+@dataclass(slots=True)
+class TrailPoint:
+    """One recorded driver position"""
+    timestamp: datetime
+    latitude: float
+    longitude: float
+
+
+@dataclass(slots=True)
+class RepositionSuggestion:
+    """A forecast cell worth driving to: its center, distance, expected pickups this hour and idle drivers already there"""
+    location: Location
+    distance_km: float
+    expected_pickups: float
+    idle_drivers: int
+
+
+@dataclass(slots=True)
+class NearbyDrivers:
+    """Result of a nearby-driver search; approximate when served from the degraded-mode snapshot"""
+    drivers: List[Driver]
+    approximate: bool = False
+    staleness_seconds: Optional[float] = None  # age of the snapshot, when approximate
@@ -0,0 +1,6 @@
+class ConcurrencyConflictError(Exception):
+    """Raised when a compare-and-swap update finds the row changed since it was read"""
+
+
+class OutOfServiceAreaError(Exception):
+    """Raised when a trip is requested from a pickup outside every service zone"""
@@ -0,0 +1,76 @@
+import math
+from array import array
+from typing import Iterable, List, Optional
+
+from .entities import Driver, DriverPosition, DriverStatus, Location
+
+STATUSES = [DriverStatus.AVAILABLE, DriverStatus.BUSY, DriverStatus.OFFLINE]
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+
+class FleetSnapshot:
+    """Columnar driver fleet: parallel arrays of ids, status codes, lat and lon.
+
+    Drivers without a known location are stored with NaN coordinates. Row views
+    (DriverPosition) are only materialized for the rows a caller asks for.
+    """
+
+    __slots__ = ("ids", "status_codes", "latitudes", "longitudes")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.status_codes = array("b")
+        self.latitudes = array("d")
+        self.longitudes = array("d")
+
+    @classmethod
+    def from_drivers(cls, drivers: Iterable[Driver]) -> "FleetSnapshot":
+        snapshot = cls()
+        for driver in drivers:
+            location = driver.current_location
+            snapshot.append(
+                driver.id,
+                driver.status,
+                location.latitude if location else math.nan,
+                location.longitude if location else math.nan
+            )
+        return snapshot
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, driver_id: int, status: DriverStatus, latitude: float, longitude: float) -> None:
+        self.ids.append(driver_id)
+        self.status_codes.append(STATUS_CODES[status])
+        self.latitudes.append(latitude)
+        self.longitudes.append(longitude)
+
+    def row(self, index: int) -> DriverPosition:
+        latitude = self.latitudes[index]
+        location = None if math.isnan(latitude) else Location(latitude=latitude, longitude=self.longitudes[index])
+        return DriverPosition(
+            id=self.ids[index],
+            status=STATUSES[self.status_codes[index]],
+            current_location=location
+        )
+
+    def rows(self, indices: Iterable[int]) -> List[DriverPosition]:
+        return [self.row(index) for index in indices]
+
+    def with_status(self, status: DriverStatus) -> "FleetSnapshot":
+        """Return a new snapshot holding only the rows with the given status"""
+        code = STATUS_CODES[status]
+        filtered = FleetSnapshot()
+        for index, row_code in enumerate(self.status_codes):
+            if row_code == code:
+                filtered.ids.append(self.ids[index])
+                filtered.status_codes.append(row_code)
+                filtered.latitudes.append(self.latitudes[index])
+                filtered.longitudes.append(self.longitudes[index])
+        return filtered
+
+    def index_of(self, driver_id: int) -> Optional[int]:
+        try:
+            return self.ids.index(driver_id)
+        except ValueError:
+            return None
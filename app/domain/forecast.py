@@ -0,0 +1,134 @@
+import heapq
+import math
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .entities import Location, RepositionSuggestion
+from .pricing import KM_PER_DEGREE, Zone
+from .services import calculate_distance
+
+HOURS_PER_WEEK = 168
+WEEK = timedelta(weeks=1)
+
+
+def hour_of_week(moment: datetime) -> int:
+    """0 is Monday 00:00-01:00 (UTC, like every stored timestamp)"""
+    return moment.weekday() * 24 + moment.hour
+
+
+def smoothing_weights(weeks: int, alpha: float) -> array:
+    """Weight of each week's count in the exponentially smoothed level after the last week.
+
+    level = alpha * count + (1 - alpha) * level, seeded with the first week and
+    unrolled, so fitting is a single weighted pass over the pickups.
+    """
+    weights = array("d", (alpha * (1 - alpha) ** (weeks - 1 - week) for week in range(weeks)))
+    weights[0] = (1 - alpha) ** (weeks - 1)
+    return weights
+
+
+def _cell(latitude: float, longitude: float, cell_size_deg: float) -> Zone:
+    return math.floor(latitude / cell_size_deg), math.floor(longitude / cell_size_deg)
+
+
+class DemandForecast:
+    """Expected pickups per grid cell and hour of the week.
+
+    The rates are one flat array of len(cells) * 168 doubles, row-major by
+    cell, so a lookup is a dict hit for the cell plus an array index. Cells
+    without historical pickups are not stored and expect none.
+    """
+
+    def __init__(self, cell_size_km: float, cells: Sequence[Zone], rates: array, fitted_at: Optional[datetime] = None):
+        if len(rates) != len(cells) * HOURS_PER_WEEK:
+            raise ValueError("Expected one rate per cell and hour of the week")
+        self.cell_size_km = cell_size_km
+        self.cell_size_deg = cell_size_km / KM_PER_DEGREE
+        self.cells = list(cells)
+        self.rates = rates
+        self.fitted_at = fitted_at
+        self._rows: Dict[Zone, int] = {cell: row for row, cell in enumerate(self.cells)}
+
+    def zone_for(self, location: Location) -> Zone:
+        return _cell(location.latitude, location.longitude, self.cell_size_deg)
+
+    def cell_center(self, zone: Zone) -> Location:
+        return Location(latitude=(zone[0] + 0.5) * self.cell_size_deg, longitude=(zone[1] + 0.5) * self.cell_size_deg)
+
+    def expected_pickups(self, location: Location, moment: datetime) -> float:
+        row = self._rows.get(self.zone_for(location))
+        return 0.0 if row is None else self.rates[row * HOURS_PER_WEEK + hour_of_week(moment)]
+
+    def suggest(
+        self, location: Location, moment: datetime, radius_km: float, limit: int, supply: Optional[Dict[Zone, int]] = None
+    ) -> List[RepositionSuggestion]:
+        """Cells within radius_km where a driver can expect more pickups than where it is, best first.
+
+        supply counts the idle drivers per cell, the asking driver included, so
+        idle drivers are not all sent to the same hotspot: a cell is ranked by its
+        expected pickups per idle driver once the asking driver has arrived.
+        """
+        supply = supply or {}
+        hour = hour_of_week(moment)
+        rates, rows = self.rates, self._rows
+        here = self.zone_for(location)
+        here_row = rows.get(here)
+        here_rate = 0.0 if here_row is None else rates[here_row * HOURS_PER_WEEK + hour]
+        here_score = here_rate / max(supply.get(here, 0), 1)
+
+        lat_cells = math.ceil(radius_km / self.cell_size_km)
+        lon_cells = math.ceil(lat_cells / max(math.cos(math.radians(location.latitude)), 1e-6))
+        size = self.cell_size_deg
+        candidates = []
+        for row_offset in range(-lat_cells, lat_cells + 1):
+            for col_offset in range(-lon_cells, lon_cells + 1):
+                zone = (here[0] + row_offset, here[1] + col_offset)
+                row = rows.get(zone)
+                if row is None or zone == here:
+                    continue
+                rate = rates[row * HOURS_PER_WEEK + hour]
+                idle = supply.get(zone, 0)
+                score = rate / (idle + 1)
+                if score <= here_score:
+                    continue
+                distance = calculate_distance(
+                    location.latitude, location.longitude, (zone[0] + 0.5) * size, (zone[1] + 0.5) * size
+                )
+                if distance <= radius_km:
+                    candidates.append((-score, distance, zone, rate, idle))
+        return [
+            RepositionSuggestion(self.cell_center(zone), distance, rate, idle)
+            for _, distance, zone, rate, idle in heapq.nsmallest(limit, candidates)
+        ]
+
+
+def fit_demand_forecast(
+    pickups: Iterable[Tuple[datetime, float, float]],
+    start: datetime,
+    weeks: int,
+    cell_size_km: float,
+    alpha: float,
+    fitted_at: Optional[datetime] = None
+) -> DemandForecast:
+    """Exponentially smoothed weekly pickup counts per cell and hour of the week.
+
+    pickups are (created_at, latitude, longitude); those outside the weeks
+    starting at start are ignored. Only cells with pickups get a row.
+    """
+    cell_size_deg = cell_size_km / KM_PER_DEGREE
+    weights = smoothing_weights(weeks, alpha)
+    empty_row = array("d", bytes(8 * HOURS_PER_WEEK))
+    rows: Dict[Zone, int] = {}
+    rates = array("d")
+    for created_at, latitude, longitude in pickups:
+        week = (created_at - start) // WEEK
+        if not 0 <= week < weeks:
+            continue
+        zone = _cell(latitude, longitude, cell_size_deg)
+        row = rows.get(zone)
+        if row is None:
+            row = rows[zone] = len(rows)
+            rates.extend(empty_row)
+        rates[row * HOURS_PER_WEEK + hour_of_week(created_at)] += weights[week]
+    return DemandForecast(cell_size_km, list(rows), rates, fitted_at)
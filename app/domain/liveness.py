@@ -0,0 +1,15 @@
+from abc import ABC, abstractmethod
+from typing import List
+
+from .entities import Driver
+
+
+class DriverLiveness(ABC):
+    """Whether a driver's app is still connected, judged from its heartbeats"""
+
+    @abstractmethod
+    def is_live(self, driver_id: int) -> bool:
+        pass
+
+    def filter_live(self, drivers: List[Driver]) -> List[Driver]:
+        return [driver for driver in drivers if self.is_live(driver.id)]
@@ -0,0 +1,131 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from .entities import Driver, Location
+
+Zone = Tuple[int, int]
+
+KM_PER_DEGREE = 111.32
+
+
+def zone_to_str(zone: Zone) -> str:
+    return f"{zone[0]}:{zone[1]}"
+
+
+def compute_surge_multiplier(demand: int, supply: int, sensitivity: float, max_multiplier: float) -> float:
+    """Compute a surge multiplier from the demand/supply ratio of a zone"""
+    if demand == 0:
+        return 1.0
+    ratio = demand / max(supply, 1)
+    if ratio <= 1:
+        return 1.0
+    multiplier = 1.0 + sensitivity * (ratio - 1.0)
+    # Round to 0.1 steps so quotes don't jitter between ticks
+    return min(round(multiplier, 1), max_multiplier)
+
+
+class SurgePricingEngine:
+    """Rolling per-zone supply/demand counters with precomputed surge tables.
+
+    Demand events are appended in O(1) and expired on each tick. Multipliers are
+    recomputed once per tick into a plain dict so quote lookups stay O(1).
+    """
+
+    def __init__(
+        self,
+        cell_size_km: float,
+        window_seconds: float,
+        tick_seconds: float,
+        sensitivity: float,
+        max_multiplier: float
+    ):
+        self.cell_size_deg = cell_size_km / KM_PER_DEGREE
+        self.window_seconds = window_seconds
+        self.tick_seconds = tick_seconds
+        self.sensitivity = sensitivity
+        self.max_multiplier = max_multiplier
+        self._demand: Dict[Zone, Deque[float]] = {}
+        self._supply: Dict[Zone, int] = {}
+        self._multipliers: Dict[Zone, float] = {}
+        self._last_tick: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def zone_for(self, location: Location) -> Zone:
+        return (
+            math.floor(location.latitude / self.cell_size_deg),
+            math.floor(location.longitude / self.cell_size_deg)
+        )
+
+    def record_demand(self, location: Location, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        zone = self.zone_for(location)
+        with self._lock:
+            events = self._demand.get(zone)
+            if events is None:
+                events = self._demand[zone] = deque()
+            events.append(now)
+
+    def update_supply(self, drivers: Iterable[Driver]) -> None:
+        supply: Dict[Zone, int] = {}
+        for driver in drivers:
+            if driver.current_location:
+                zone = self.zone_for(driver.current_location)
+                supply[zone] = supply.get(zone, 0) + 1
+        with self._lock:
+            self._supply = supply
+
+    def is_due(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return self._last_tick is None or now - self._last_tick >= self.tick_seconds
+
+    def tick(self, now: Optional[float] = None) -> None:
+        """Expire old demand events and rebuild the multiplier table"""
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.window_seconds
+        with self._lock:
+            multipliers: Dict[Zone, float] = {}
+            for zone in list(self._demand):
+                events = self._demand[zone]
+                while events and events[0] < cutoff:
+                    events.popleft()
+                if not events:
+                    del self._demand[zone]
+                    continue
+                multiplier = compute_surge_multiplier(
+                    len(events), self._supply.get(zone, 0), self.sensitivity, self.max_multiplier
+                )
+                if multiplier > 1.0:
+                    multipliers[zone] = multiplier
+            # Swap the whole table so readers never see a half-built one
+            self._multipliers = multipliers
+            self._last_tick = now
+
+    def refresh_if_due(self, load_supply: Callable[[], Iterable[Driver]], now: Optional[float] = None) -> bool:
+        """Reload supply and tick when due; True if this call did it.
+
+        Single-flight: while one caller refreshes, others neither wait nor load
+        the drivers again, and keep reading the current table.
+        """
+        if not self.is_due(now) or not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            if not self.is_due(now):  # refreshed between the check and the lock
+                return False
+            self.update_supply(load_supply())
+            self.tick(now)
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def multiplier_for(self, location: Location) -> Tuple[Zone, float]:
+        zone = self.zone_for(location)
+        return zone, self._multipliers.get(zone, 1.0)
+
+    def zone_counts(self, zone: Zone) -> Tuple[int, int]:
+        """Return the (demand, supply) counts of a zone as of now"""
+        with self._lock:
+            return len(self._demand.get(zone, ())), self._supply.get(zone, 0)
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from .entities import Driver, Passenger, Trip, Invoice, Location
+from datetime import datetime
+from typing import FrozenSet, Iterator, List, Optional
+from .billing import StoredInvoice
+from .entities import Driver, Passenger, Trip, Invoice, Location, DriverStatus, TripStatus, TripHistoryQuery
 
 
 class DriverRepository(ABC):
@@ -20,6 +22,11 @@ class DriverRepository(ABC):
     def get_available_within_radius(self, location: Location, radius_km: float) -> List[Driver]:
         pass
     
+    @abstractmethod
+    def get_closest_available(self, location: Location, limit: int) -> List[Driver]:
+        """Up to limit located available drivers, closest first"""
+        pass
+    
     @abstractmethod
     def create(self, driver: Driver) -> Driver:
         pass
@@ -27,6 +34,11 @@ class DriverRepository(ABC):
     @abstractmethod
     def update(self, driver: Driver) -> Driver:
         pass
+    
+    @abstractmethod
+    def update_status_if(self, driver_id: int, expected: DriverStatus, status: DriverStatus) -> Optional[Driver]:
+        """Atomically move a driver from expected to status; None if it was not in expected"""
+        pass
 
 
 class PassengerRepository(ABC):
@@ -52,6 +64,10 @@ class TripRepository(ABC):
     def get_by_id(self, trip_id: int) -> Optional[Trip]:
         pass
     
+    @abstractmethod
+    def get_by_status(self, status: TripStatus) -> List[Trip]:
+        pass
+    
     @abstractmethod
     def create(self, trip: Trip) -> Trip:
         pass
@@ -59,6 +75,18 @@ class TripRepository(ABC):
     @abstractmethod
     def update(self, trip: Trip) -> Trip:
         pass
+    
+    @abstractmethod
+    def update_status_if(
+        self, trip_id: int, expected: FrozenSet[TripStatus], status: TripStatus, started_at: Optional[datetime] = None
+    ) -> Optional[Trip]:
+        """Atomically move a trip from any of expected to status; None if it was in none of them"""
+        pass
+    
+    @abstractmethod
+    def get_history(self, query: TripHistoryQuery) -> List[Trip]:
+        """Up to query.limit trips matching the filter, newest first, strictly before query.before"""
+        pass
 
 
 class InvoiceRepository(ABC):
@@ -68,4 +96,9 @@ class InvoiceRepository(ABC):
     
     @abstractmethod
     def create(self, invoice: Invoice) -> Invoice:
+        pass
+    
+    @abstractmethod
+    def iter_stored(self, batch_size: int) -> Iterator[List[StoredInvoice]]:
+        """Every invoice as stored, in id order, batch_size at a time"""
         pass
\ No newline at end of file
@@ -1,6 +1,9 @@
 import math
-from typing import List
-from .entities import Location, Driver
+from typing import List, Sequence, Union
+from .entities import Location, Driver, DriverPosition
+from .fleet import FleetSnapshot
+
+EARTH_RADIUS_KM = 6371
 
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -21,8 +24,33 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return R * c
 
 
-def find_drivers_within_radius(drivers: List[Driver], location: Location, radius_km: float) -> List[Driver]:
+def calculate_distances(latitudes: Sequence[float], longitudes: Sequence[float], location: Location) -> List[float]:
+    """Haversine distance from location to every (lat, lon) pair in one pass.
+    
+    Terms that only depend on the query point are computed once. NaN
+    coordinates yield NaN distances, which never compare as within a radius.
+    """
+    lat_rad = math.radians(location.latitude)
+    lon_rad = math.radians(location.longitude)
+    cos_lat = math.cos(lat_rad)
+    radians, sin, cos, asin, sqrt = math.radians, math.sin, math.cos, math.asin, math.sqrt
+    
+    distances = []
+    for lat, lon in zip(latitudes, longitudes):
+        lat2 = radians(lat)
+        a = sin((lat2 - lat_rad) / 2) ** 2 + cos_lat * cos(lat2) * sin((radians(lon) - lon_rad) / 2) ** 2
+        distances.append(2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0))))
+    return distances
+
+
+def find_drivers_within_radius(
+    drivers: Union[List[Driver], FleetSnapshot], location: Location, radius_km: float
+) -> Union[List[Driver], List[DriverPosition]]:
     """Find drivers within specified radius of a location"""
+    if isinstance(drivers, FleetSnapshot):
+        distances = calculate_distances(drivers.latitudes, drivers.longitudes, location)
+        return drivers.rows(i for i, distance in enumerate(distances) if distance <= radius_km)
+    
     nearby_drivers = []
     for driver in drivers:
         if driver.current_location:
@@ -35,8 +63,16 @@ def find_drivers_within_radius(drivers: List[Driver], location: Location, radius
     return nearby_drivers
 
 
-def find_closest_drivers(drivers: List[Driver], location: Location, limit: int) -> List[Driver]:
+def find_closest_drivers(
+    drivers: Union[List[Driver], FleetSnapshot], location: Location, limit: int
+) -> Union[List[Driver], List[DriverPosition]]:
     """Find the closest drivers to a location, limited by count"""
+    if isinstance(drivers, FleetSnapshot):
+        distances = calculate_distances(drivers.latitudes, drivers.longitudes, location)
+        located = [i for i, distance in enumerate(distances) if not math.isnan(distance)]
+        located.sort(key=distances.__getitem__)
+        return drivers.rows(located[:limit])
+    
     drivers_with_distance = []
     for driver in drivers:
         if driver.current_location:
@@ -47,4 +83,4 @@ def find_closest_drivers(drivers: List[Driver], location: Location, limit: int)
             drivers_with_distance.append((driver, distance))
     
     drivers_with_distance.sort(key=lambda x: x[1])
-    return [driver for driver, _ in drivers_with_distance[:limit]]
\ No newline at end of file
+    return [driver for driver, _ in drivers_with_distance[:limit]]
@@ -0,0 +1,126 @@
+import heapq
+import math
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .entities import Location
+from .pricing import KM_PER_DEGREE
+from .services import EARTH_RADIUS_KM
+
+Bounds = Tuple[int, int, int, int]  # row_min, row_max, col_min, col_max (inclusive cell numbers)
+
+
+def bounding_box(location: Location, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) holding every point within radius_km on the haversine sphere"""
+    angle = radius_km / EARTH_RADIUS_KM
+    lat_span = math.degrees(angle)
+    ratio = math.sin(min(angle, math.pi / 2)) / max(math.cos(math.radians(location.latitude)), 1e-12)
+    lon_span = 180.0 if ratio >= 1 else math.degrees(math.asin(ratio))
+    return (
+        location.latitude - lat_span, location.latitude + lat_span,
+        location.longitude - lon_span, location.longitude + lon_span
+    )
+
+
+class GridIndex:
+    """Uniform lat/lon grid over a set of points, for repeated radius queries.
+
+    Built once per snapshot: each point is bucketed by cell and its radians and
+    cosine are precomputed, so a query only visits the cells overlapping its
+    radius and pays a few multiplications per candidate. Points with NaN
+    coordinates are left out of the index.
+
+    An approximate index measures with the equirectangular projection around
+    the query point instead of haversine: no trigonometry per candidate, and
+    well under 1% off at city distances.
+    """
+
+    def __init__(
+        self, latitudes: Sequence[float], longitudes: Sequence[float], cell_size_km: float = 1.0, approximate: bool = False
+    ):
+        self.approximate = approximate
+        self.cell_size_deg = cell_size_km / KM_PER_DEGREE
+        self.lat_rad = array("d", (math.radians(lat) for lat in latitudes))
+        self.lon_rad = array("d", (math.radians(lon) for lon in longitudes))
+        self.cos_lat = array("d", (math.cos(lat) for lat in self.lat_rad))
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        for index, (lat, lon) in enumerate(zip(latitudes, longitudes)):
+            if math.isnan(lat) or math.isnan(lon):
+                continue
+            self.cells.setdefault((self._cell(lat), self._cell(lon)), []).append(index)
+
+    def _cell(self, degrees: float) -> int:
+        return math.floor(degrees / self.cell_size_deg)
+
+    def _bounds(self, location: Location, radius_km: float) -> Bounds:
+        min_lat, max_lat, min_lon, max_lon = bounding_box(location, radius_km)
+        return self._cell(min_lat), self._cell(max_lat), self._cell(min_lon), self._cell(max_lon)
+
+    def _candidates(self, bounds: Bounds, inner: Optional[Bounds] = None) -> Iterator[int]:
+        """Points in the cells of bounds, minus those in the cells of inner"""
+        row_min, row_max, col_min, col_max = bounds
+
+        def outside_inner(row: int, col: int) -> bool:
+            return inner is None or not (inner[0] <= row <= inner[1] and inner[2] <= col <= inner[3])
+
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self.cells):
+            # Very large radius: scanning the occupied cells is cheaper than the range
+            for (row, col), indices in self.cells.items():
+                if row_min <= row <= row_max and col_min <= col <= col_max and outside_inner(row, col):
+                    yield from indices
+            return
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                if outside_inner(row, col):
+                    yield from self.cells.get((row, col), ())
+
+    def _distances(self, location: Location, indices: Iterable[int]) -> Iterator[Tuple[int, float]]:
+        lat0 = math.radians(location.latitude)
+        lon0 = math.radians(location.longitude)
+        cos0 = math.cos(lat0)
+        lat_rad, lon_rad, cos_lat = self.lat_rad, self.lon_rad, self.cos_lat
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+        if self.approximate:
+            for index in indices:
+                x = (lon_rad[index] - lon0) * cos0
+                y = lat_rad[index] - lat0
+                yield index, EARTH_RADIUS_KM * sqrt(x * x + y * y)
+            return
+        for index in indices:
+            a = sin((lat_rad[index] - lat0) / 2) ** 2 + cos0 * cos_lat[index] * sin((lon_rad[index] - lon0) / 2) ** 2
+            yield index, 2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0)))
+
+    def within(self, location: Location, radius_km: float, limit: int) -> List[Tuple[int, float]]:
+        """Up to limit (index, distance_km) pairs within radius_km, closest first"""
+        candidates = self._candidates(self._bounds(location, radius_km))
+        matches = [match for match in self._distances(location, candidates) if match[1] <= radius_km]
+        matches.sort(key=lambda match: match[1])
+        return matches[:limit]
+
+    def closest(self, location: Location, limit: int) -> List[Tuple[int, float]]:
+        """The limit closest points at any distance, closest first"""
+        indices = (index for indices in self.cells.values() for index in indices)
+        return heapq.nsmallest(limit, self._distances(location, indices), key=lambda match: match[1])
+
+    def nearest(
+        self, location: Location, limit: int, radius_km: float, step_km: float, max_radius_km: float
+    ) -> Tuple[List[Tuple[int, float]], float]:
+        """Up to limit closest points, widening the radius by step_km until limit are found.
+
+        Returns the (index, distance_km) pairs, closest first, and the radius the
+        search stopped at (at most max_radius_km). Each step only visits the ring
+        of cells the previous step did not cover, so every point is measured at
+        most once and a sparse area costs no more than one search at the cap.
+        """
+        radius_km = min(radius_km, max_radius_km)
+        measured: List[Tuple[int, float]] = []
+        inner = None
+        while True:
+            bounds = self._bounds(location, radius_km)
+            measured.extend(self._distances(location, self._candidates(bounds, inner)))
+            matches = [match for match in measured if match[1] <= radius_km]
+            if len(matches) >= limit or radius_km >= max_radius_km:
+                matches.sort(key=lambda match: match[1])
+                return matches[:limit], radius_km
+            inner = bounds
+            radius_km = min(radius_km + step_km, max_radius_km)
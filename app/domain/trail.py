@@ -0,0 +1,103 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, Sequence, Tuple
+
+from .entities import TrailPoint
+from .services import calculate_distance
+
+# Pings are stored as integers: milliseconds since the epoch and micro-degrees (~0.1 m)
+COORDINATE_SCALE = 1_000_000
+
+RawPing = Tuple[int, int, int]  # (timestamp_ms, latitude_e6, longitude_e6)
+
+
+def _zigzag(value: int) -> int:
+    """Map signed to unsigned so small negative deltas also get short varints"""
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def encode_pings(pings: Sequence[RawPing]) -> bytes:
+    """Compress pings (sorted by time) into a chunk.
+
+    Timestamps are stored as delta-of-delta, so a steady ping interval costs
+    one byte; coordinates as deltas from the previous ping. Every number is a
+    zigzag varint, which puts a typical ping at 3-6 bytes.
+    """
+    out = bytearray()
+    _write_varint(out, len(pings))
+    previous_time = previous_interval = previous_lat = previous_lon = 0
+    for timestamp, lat, lon in pings:
+        interval = timestamp - previous_time
+        _write_varint(out, _zigzag(interval - previous_interval))
+        _write_varint(out, _zigzag(lat - previous_lat))
+        _write_varint(out, _zigzag(lon - previous_lon))
+        previous_time, previous_interval, previous_lat, previous_lon = timestamp, interval, lat, lon
+    return bytes(out)
+
+
+def decode_pings(data: bytes) -> List[RawPing]:
+    count, position = _read_varint(data, 0)
+    pings = []
+    timestamp = interval = lat = lon = 0
+    for _ in range(count):
+        value, position = _read_varint(data, position)
+        interval += _unzigzag(value)
+        timestamp += interval
+        value, position = _read_varint(data, position)
+        lat += _unzigzag(value)
+        value, position = _read_varint(data, position)
+        lon += _unzigzag(value)
+        pings.append((timestamp, lat, lon))
+    return pings
+
+
+def to_raw_ping(timestamp_ms: int, latitude: float, longitude: float) -> RawPing:
+    return timestamp_ms, round(latitude * COORDINATE_SCALE), round(longitude * COORDINATE_SCALE)
+
+
+def to_trail_point(ping: RawPing) -> TrailPoint:
+    timestamp, lat, lon = ping
+    return TrailPoint(
+        timestamp=datetime.utcfromtimestamp(timestamp / 1000),
+        latitude=lat / COORDINATE_SCALE,
+        longitude=lon / COORDINATE_SCALE
+    )
+
+
+def path_distance_km(points: Sequence[TrailPoint]) -> float:
+    """Length of the polyline through the points, in order"""
+    return sum(
+        calculate_distance(start.latitude, start.longitude, end.latitude, end.longitude)
+        for start, end in zip(points, points[1:])
+    )
+
+
+class LocationTrail(ABC):
+    """Recorded positions of drivers over time"""
+
+    @abstractmethod
+    def points(self, driver_id: int, start: datetime, end: datetime) -> List[TrailPoint]:
+        """Positions recorded in [start, end], oldest first"""
+        pass
@@ -0,0 +1,36 @@
+from abc import ABC, abstractmethod
+from typing import Dict, FrozenSet
+
+from .entities import TripStatus
+
+# REQUESTED -> REQUESTED is a reassignment after the driver failed to accept in time
+TRIP_TRANSITIONS: Dict[TripStatus, FrozenSet[TripStatus]] = {
+    TripStatus.REQUESTED: frozenset({
+        TripStatus.REQUESTED, TripStatus.ACCEPTED, TripStatus.COMPLETED, TripStatus.CANCELLED
+    }),
+    TripStatus.ACCEPTED: frozenset({TripStatus.IN_PROGRESS, TripStatus.COMPLETED, TripStatus.CANCELLED}),
+    TripStatus.IN_PROGRESS: frozenset({TripStatus.COMPLETED}),
+    TripStatus.COMPLETED: frozenset(),
+    TripStatus.CANCELLED: frozenset(),
+}
+
+
+def can_transition(current: TripStatus, target: TripStatus) -> bool:
+    return target in TRIP_TRANSITIONS[current]
+
+
+def sources_of(target: TripStatus) -> FrozenSet[TripStatus]:
+    """Statuses a trip may move to target from"""
+    return frozenset(status for status, targets in TRIP_TRANSITIONS.items() if target in targets)
+
+
+class TripTimeouts(ABC):
+    """Acceptance deadlines for trips waiting on their assigned driver"""
+    
+    @abstractmethod
+    def schedule(self, trip_id: int) -> None:
+        pass
+    
+    @abstractmethod
+    def cancel(self, trip_id: int) -> None:
+        pass
@@ -0,0 +1,19 @@
+from abc import ABC, abstractmethod
+
+
+class UnitOfWork(ABC):
+    """Groups repository writes into one transaction.
+
+    Inside `with unit_of_work:` repositories stage their writes instead of
+    committing; the outermost block commits them together on success and
+    discards them on error. Nested blocks only discard their own writes, so a
+    retried step can run inside a larger unit.
+    """
+
+    @abstractmethod
+    def __enter__(self) -> "UnitOfWork":
+        pass
+
+    @abstractmethod
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        pass
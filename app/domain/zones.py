@@ -0,0 +1,108 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# GeoJSON order: (longitude, latitude)
+Ring = Sequence[Tuple[float, float]]
+Polygon = Sequence[Ring]  # exterior ring followed by holes
+
+
+@dataclass(slots=True)
+class Zone:
+    id: str
+    name: str
+    kind: str
+    polygons: List[Polygon]
+    bbox: Tuple[float, float, float, float] = field(default=(0.0, 0.0, 0.0, 0.0))  # min_lon, min_lat, max_lon, max_lat
+    area: float = 0.0
+
+    def __post_init__(self):
+        points = [point for polygon in self.polygons for point in polygon[0]]
+        lons = [point[0] for point in points]
+        lats = [point[1] for point in points]
+        self.bbox = (min(lons), min(lats), max(lons), max(lats))
+        self.area = sum(abs(_ring_area(polygon[0])) for polygon in self.polygons)
+
+    def contains(self, longitude: float, latitude: float) -> bool:
+        min_lon, min_lat, max_lon, max_lat = self.bbox
+        if not (min_lon <= longitude <= max_lon and min_lat <= latitude <= max_lat):
+            return False
+        for polygon in self.polygons:
+            if point_in_ring(longitude, latitude, polygon[0]) and not any(
+                point_in_ring(longitude, latitude, hole) for hole in polygon[1:]
+            ):
+                return True
+        return False
+
+
+def _ring_area(ring: Ring) -> float:
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:])) / 2
+
+
+def point_in_ring(x: float, y: float, ring: Ring) -> bool:
+    """Ray casting (even-odd rule) test of point (x, y) against a closed ring"""
+    inside = False
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def parse_geojson_zones(data: Dict) -> List[Zone]:
+    """Build zones from a GeoJSON FeatureCollection of Polygon/MultiPolygon features.
+
+    Each feature needs `id`, `name` and `kind` properties.
+    """
+    zones = []
+    for feature in data["features"]:
+        geometry = feature["geometry"]
+        if geometry["type"] == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry["type"] == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            raise ValueError(f"Unsupported zone geometry: {geometry['type']}")
+        properties = feature["properties"]
+        zones.append(Zone(
+            id=str(properties["id"]),
+            name=properties["name"],
+            kind=properties["kind"],
+            polygons=[[[tuple(point) for point in ring] for ring in polygon] for polygon in polygons]
+        ))
+    return zones
+
+
+class ZoneIndex:
+    """Precomputed cell -> candidate zones grid over the zones' bounding boxes.
+
+    A lookup is one dict access plus ray casts against the few zones whose
+    bounding box overlaps the cell. Candidates are ordered smallest first, so
+    a specific zone (airport) wins over an enclosing one (service area).
+    """
+
+    def __init__(self, zones: List[Zone], cell_size_deg: float = 0.01):
+        self.zones = zones
+        self.cell_size_deg = cell_size_deg
+        self._cells: Dict[Tuple[int, int], Tuple[Zone, ...]] = {}
+        cells: Dict[Tuple[int, int], List[Zone]] = {}
+        for zone in sorted(zones, key=lambda z: z.area):
+            min_lon, min_lat, max_lon, max_lat = zone.bbox
+            for row in range(self._cell(min_lat), self._cell(max_lat) + 1):
+                for col in range(self._cell(min_lon), self._cell(max_lon) + 1):
+                    cells.setdefault((row, col), []).append(zone)
+        self._cells = {cell: tuple(candidates) for cell, candidates in cells.items()}
+
+    def _cell(self, degrees: float) -> int:
+        return math.floor(degrees / self.cell_size_deg)
+
+    def classify(self, latitude: float, longitude: float) -> Optional[Zone]:
+        """Return the most specific zone containing the point, or None when out of area"""
+        for zone in self._cells.get((self._cell(latitude), self._cell(longitude)), ()):
+            if zone.contains(longitude, latitude):
+                return zone
+        return None
+
+    def get(self, zone_id: str) -> Optional[Zone]:
+        return next((zone for zone in self.zones if zone.id == zone_id), None)
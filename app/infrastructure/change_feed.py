@@ -0,0 +1,246 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.orm import Session, SessionTransaction
+
+from ..domain.entities import Driver, Trip
+from .models import ChangeEventModel
+
+logger = logging.getLogger(__name__)
+
+DRIVER = "driver"
+TRIP = "trip"
+
+_PENDING_CHANGES = "pending_changes"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    id: int
+    entity: str
+    entity_id: int
+    payload: Dict
+
+
+def record_driver_change(db: Session, driver: Driver) -> None:
+    """Append a driver change to the outbox; committed with the caller's transaction"""
+    location = driver.current_location
+    _record(db, DRIVER, driver.id, {
+        "status": driver.status.value,
+        "latitude": location.latitude if location else None,
+        "longitude": location.longitude if location else None,
+        "version": driver.version
+    })
+
+
+def record_trip_change(db: Session, trip: Trip) -> None:
+    """Append a trip change to the outbox; committed with the caller's transaction"""
+    _record(db, TRIP, trip.id, {
+        "status": trip.status.value,
+        "passenger_id": trip.passenger_id,
+        "driver_id": trip.driver_id,
+        "version": trip.version
+    })
+
+
+def _record(db: Session, entity: str, entity_id: int, payload: Dict) -> None:
+    # Buffered until the outermost commit, which writes every change of the transaction with
+    # one executemany INSERT; each change remembers its savepoint so a rolled-back one is dropped
+    db.info.setdefault(_PENDING_CHANGES, []).append((
+        db.get_nested_transaction() or db.get_transaction(),
+        {"entity": entity, "entity_id": entity_id, "payload": json.dumps(payload, separators=(",", ":"))}
+    ))
+
+
+def _within(transaction: Optional[SessionTransaction], ancestor: SessionTransaction) -> bool:
+    while transaction is not None:
+        if transaction is ancestor:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending_changes(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    pending = session.info.pop(_PENDING_CHANGES, None)
+    if pending:
+        session.execute(insert(ChangeEventModel), [row for _, row in pending])
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_rolled_back_changes(session: Session, previous_transaction: SessionTransaction) -> None:
+    pending = session.info.get(_PENDING_CHANGES)
+    if pending:
+        session.info[_PENDING_CHANGES] = [
+            (transaction, row) for transaction, row in pending if not _within(transaction, previous_transaction)
+        ]
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_changes(session: Session, transaction: SessionTransaction) -> None:
+    # Closing a session without committing ends its transaction without a rollback event
+    if transaction.parent is None:
+        session.info.pop(_PENDING_CHANGES, None)
+
+
+def latest_cursor(db: Session) -> int:
+    return db.scalar(select(func.coalesce(func.max(ChangeEventModel.id), 0)))
+
+
+def can_replay_from(db: Session, cursor: int) -> bool:
+    """Whether every event after cursor is still in the outbox (none pruned, same database)"""
+    earliest, latest = db.execute(select(func.min(ChangeEventModel.id), func.max(ChangeEventModel.id))).one()
+    if latest is None:
+        return cursor == 0
+    return cursor <= latest and earliest <= cursor + 1
+
+
+def read_changes(db: Session, cursor: int, limit: int) -> List[ChangeEvent]:
+    rows = db.execute(
+        select(ChangeEventModel.id, ChangeEventModel.entity, ChangeEventModel.entity_id, ChangeEventModel.payload)
+        .where(ChangeEventModel.id > cursor)
+        .order_by(ChangeEventModel.id)
+        .limit(limit)
+    ).all()
+    return [ChangeEvent(row.id, row.entity, row.entity_id, json.loads(row.payload)) for row in rows]
+
+
+def read_changes_by_id(db: Session, ids: List[int]) -> List[ChangeEvent]:
+    rows = db.execute(
+        select(ChangeEventModel.id, ChangeEventModel.entity, ChangeEventModel.entity_id, ChangeEventModel.payload)
+        .where(ChangeEventModel.id.in_(ids))
+        .order_by(ChangeEventModel.id)
+    ).all()
+    return [ChangeEvent(row.id, row.entity, row.entity_id, json.loads(row.payload)) for row in rows]
+
+
+def existing_ids(db: Session, after: int, through: int) -> List[int]:
+    return list(db.scalars(
+        select(ChangeEventModel.id).where(ChangeEventModel.id > after, ChangeEventModel.id <= through)
+    ))
+
+
+def prune_changes(db: Session, retention_seconds: float) -> int:
+    cutoff = datetime.utcnow() - timedelta(seconds=retention_seconds)
+    result = db.execute(delete(ChangeEventModel).where(ChangeEventModel.created_at < cutoff))
+    db.commit()
+    return result.rowcount
+
+
+class ChangeFeedPoller:
+    """Tails the change_events outbox with a monotonic id cursor.
+
+    Ids are handed out when a transaction inserts its events, not when it
+    commits, so on a database with concurrent writers (PostgreSQL) an event can
+    become visible after events with higher ids. A missing id below the newest
+    one read is kept as a gap and looked up again on every poll until it shows
+    up or gap_grace_seconds pass (its transaction rolled back). The cursor
+    handed to apply() stays below the oldest open gap, so a snapshot taken at
+    that cursor replays the late event. Applying is idempotent, so events read
+    ahead of a gap are not held back. On SQLite writers are serialized and
+    there are no gaps.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        apply: Callable[[List[ChangeEvent], int], None],
+        poll_interval_seconds: float,
+        batch_size: int,
+        retention_seconds: float,
+        cursor: int = 0,
+        gap_grace_seconds: float = 5.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.session_factory = session_factory
+        self.apply = apply
+        self.poll_interval_seconds = poll_interval_seconds
+        self.batch_size = batch_size
+        self.retention_seconds = retention_seconds
+        self.gap_grace_seconds = gap_grace_seconds
+        self._clock = clock
+        self.cursor = cursor
+        self._next_prune = clock() + retention_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def cursor(self) -> int:
+        """Every event up to here has been applied (or its gap given up)"""
+        return min(self._gaps) - 1 if self._gaps else self._read_through
+
+    @cursor.setter
+    def cursor(self, cursor: int) -> None:
+        self._read_through = cursor
+        self._gaps: Dict[int, float] = {}
+        self._look_back = True  # ids just below a loaded cursor may still be in flight
+
+    def poll_once(self) -> int:
+        """Apply all pending events; returns how many were applied"""
+        applied = 0
+        db = self.session_factory()
+        try:
+            now = self._clock()
+            if self._look_back:
+                self._look_back = False
+                after = max(self._read_through - self.batch_size, 0)
+                self._add_gaps(set(range(after + 1, self._read_through + 1)) - set(existing_ids(db, after, self._read_through)), now)
+            if self._gaps:
+                late = read_changes_by_id(db, sorted(self._gaps))
+                for event in late:
+                    del self._gaps[event.id]
+                for gap, seen in list(self._gaps.items()):
+                    if now - seen > self.gap_grace_seconds:
+                        del self._gaps[gap]
+                self.apply(late, self.cursor)
+                applied += len(late)
+            while True:
+                events = read_changes(db, self._read_through, self.batch_size)
+                if not events:
+                    break
+                previous = self._read_through
+                for event in events:
+                    self._add_gaps(range(previous + 1, event.id), now)
+                    previous = event.id
+                self._read_through = previous
+                self.apply(events, self.cursor)
+                applied += len(events)
+                if len(events) < self.batch_size:
+                    break
+            if self._clock() >= self._next_prune:
+                prune_changes(db, self.retention_seconds)
+                self._next_prune = self._clock() + self.retention_seconds
+        finally:
+            db.close()
+        return applied
+
+    def _add_gaps(self, ids: Iterable[int], now: float) -> None:
+        for gap in ids:
+            self._gaps.setdefault(gap, now)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval_seconds):
+            try:
+                self.poll_once()
+            except Exception:
+                logger.exception("Change feed poll failed at cursor %s", self.cursor)
@@ -1,21 +1,252 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import ORMExecuteState, Session, sessionmaker
 from .models import Base
-from ..core.config import settings
+from .query_tracking import untracked
+from . import table_versions  # noqa: F401  registers the per-table change counters
+from ..core.config import Settings, process_settings, settings
+
+
+def make_engine(url: str) -> Engine:
+    """Create an engine with the connect args the URL's backend needs"""
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    return create_engine(url, connect_args=connect_args)
+
+
+_engine: Optional[Engine] = None
+
+
+def get_engine() -> Engine:
+    """Primary engine, created on first use so importing this module stays cheap"""
+    global _engine
+    if _engine is None:
+        _engine = make_engine(process_settings.database_url)
+    return _engine
+
+
+def __getattr__(name: str):
+    # Keeps `from .database import engine` working without eager engine creation
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class LazySessionMaker(sessionmaker):
+    """sessionmaker that binds to the primary engine on first use"""
+    
+    def __call__(self, **local_kw) -> Session:
+        if self.kw.get("bind") is None and "bind" not in local_kw:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = LazySessionMaker(autocommit=False, autoflush=False)
+
+
+class ReplicaPool:
+    """Read replica engines, health-checked by a background thread.
+
+    Selection only reads the latest check results, so a slow or hanging
+    replica never delays a request. Unhealthy replicas are skipped until a
+    later check succeeds; with no healthy replica, reads fall back to the
+    primary.
+    """
+
+    def __init__(self, urls: List[str], health_check_interval_seconds: float, selection: str = "round_robin"):
+        if selection not in ("round_robin", "least_latency"):
+            raise ValueError(f"Unknown replica selection strategy: {selection}")
+        self.engines = [make_engine(url) for url in urls]
+        self.health_check_interval_seconds = health_check_interval_seconds
+        self.selection = selection
+        self.healthy = [True] * len(self.engines)
+        self.latencies = [0.0] * len(self.engines)
+        self._round_robin = itertools.count()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check_health(self) -> None:
+        healthy, latencies = list(self.healthy), list(self.latencies)
+        for index, replica in enumerate(self.engines):
+            start = time.perf_counter()
+            try:
+                with untracked(), replica.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            except Exception:
+                healthy[index] = False
+                continue
+            healthy[index] = True
+            latencies[index] = time.perf_counter() - start
+        # Swapped whole, so selection never sees a half-updated round
+        self.healthy, self.latencies = healthy, latencies
+
+    def choose(self) -> Optional[Engine]:
+        if not self.engines:
+            return None
+        healthy, latencies = self.healthy, self.latencies
+        candidates = [index for index, up in enumerate(healthy) if up]
+        if not candidates:
+            return None
+        if self.selection == "least_latency":
+            return self.engines[min(candidates, key=latencies.__getitem__)]
+        return self.engines[candidates[next(self._round_robin) % len(candidates)]]
+
+    def start(self) -> None:
+        if not self.engines or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-health-check", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            self.check_health()
+            if self._stop.wait(self.health_check_interval_seconds):
+                return
+
+
+replica_pool = ReplicaPool(
+    settings.replica_database_urls,
+    settings.replica_health_check_interval_seconds,
+    settings.replica_selection
+)
+
+
+@dataclass(slots=True)
+class DatabaseBinding:
+    """A city's own primary engine (and connection pool) and read replicas"""
+    engine: Engine
+    session_factory: sessionmaker
+    replicas: ReplicaPool
+
+    def dispose(self) -> None:
+        self.engine.dispose()
+        for replica in self.replicas.engines:
+            replica.dispose()
+
+
+def open_database(city: Settings) -> DatabaseBinding:
+    """New engines for a city's database_url and replica_database_urls"""
+    engine = make_engine(city.database_url)
+    return DatabaseBinding(
+        engine,
+        sessionmaker(autocommit=False, autoflush=False, bind=engine),
+        ReplicaPool(city.replica_database_urls, city.replica_health_check_interval_seconds, city.replica_selection)
+    )
+
+
+_binding: ContextVar[Optional[DatabaseBinding]] = ContextVar("database_binding", default=None)
 
-engine = create_engine(settings.database_url, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@contextmanager
+def bind_database(binding: DatabaseBinding) -> Iterator[None]:
+    """Route sessions opened in this context to a city's database"""
+    token = _binding.set(binding)
+    try:
+        yield
+    finally:
+        _binding.reset(token)
+
+
+def current_session_factory() -> sessionmaker:
+    binding = _binding.get()
+    return binding.session_factory if binding else SessionLocal
 
 
 def create_tables():
     """Create all database tables"""
-    Base.metadata.create_all(bind=engine)
+    binding = _binding.get()
+    Base.metadata.create_all(bind=binding.engine if binding else get_engine())
 
 
 def get_db():
     """Database dependency for FastAPI"""
-    db = SessionLocal()
+    db = current_session_factory()()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Set on responses to requests that committed to the primary; see ReadYourWritesMiddleware
+READ_PRIMARY_COOKIE = "read_primary"
+
+_WROTE = "wrote_primary"
+
+
+@dataclass(slots=True)
+class PrimaryWrites:
+    committed: bool = False
+
+
+_primary_writes: ContextVar[Optional[PrimaryWrites]] = ContextVar("primary_writes", default=None)
+
+
+@contextmanager
+def track_primary_writes() -> Iterator[PrimaryWrites]:
+    """Note whether any session in this context (request) commits a write"""
+    writes = PrimaryWrites()
+    token = _primary_writes.set(writes)
+    try:
+        yield writes
+    finally:
+        _primary_writes.reset(token)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session: Session, flush_context) -> None:
+    session.info[_WROTE] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_write(orm_execute_state: ORMExecuteState) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WROTE] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _note_commit(session: Session) -> None:
+    writes = _primary_writes.get()
+    if session.info.pop(_WROTE, False) and writes is not None:
+        writes.committed = True
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(session: Session) -> None:
+    session.info.pop(_WROTE, None)
+
+
+def get_read_db(request: Request, primary: Session = Depends(get_db)):
+    """Read-only database dependency routed to a healthy replica.
+
+    Falls back to the primary session when no replica is available, for a
+    client that wrote within the last few seconds (it still sends the
+    read_primary cookie), or when the client asks for read-your-own-writes
+    consistency via X-Read-Consistency.
+    """
+    replica = None
+    if request.headers.get("x-read-consistency", "").lower() != "primary" and READ_PRIMARY_COOKIE not in request.cookies:
+        binding = _binding.get()
+        replica = (binding.replicas if binding else replica_pool).choose()
+    if replica is None:
+        yield primary
+        return
+
+    db = current_session_factory()(bind=replica)
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,215 @@
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import replace
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..domain.degradation import DriverSnapshot, NearbyDegradation
+from ..domain.entities import Driver, DriverStatus, Location
+from .fleet_state import FleetState
+from .repositories import SQLDriverRepository
+
+logger = logging.getLogger(__name__)
+
+
+class LatencySLOController(NearbyDegradation):
+    """Degraded mode driven by the latency of exact nearby searches.
+
+    Exact searches record their latency in a sliding time window. Degraded mode
+    starts when the window's quantile exceeds the SLO and ends once it falls
+    below recover_ratio times the SLO, or when too few samples remain to judge
+    (traffic died down). While degraded, searches are served from the snapshot
+    except one in probe_every, which still runs exactly so recovery is noticed.
+    Without a snapshot every search runs exactly.
+    """
+
+    def __init__(
+        self,
+        slo_seconds: float,
+        quantile: float = 0.95,
+        window_seconds: float = 10.0,
+        min_samples: int = 10,
+        recover_ratio: float = 0.7,
+        probe_every: int = 10,
+        max_samples: int = 1024
+    ):
+        self.slo_seconds = slo_seconds
+        self.quantile = quantile
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.recover_ratio = recover_ratio
+        self.probe_every = probe_every
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        self._snapshot: Optional[DriverSnapshot] = None
+        self._degraded_since: Optional[float] = None
+        self._degraded_seconds = 0.0
+        self._entered = 0
+        self._exited = 0
+        self._exact = 0
+        self._approximate = 0
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def degraded(self) -> bool:
+        return self._degraded_since is not None
+
+    def set_snapshot(self, snapshot: Optional[DriverSnapshot]) -> None:
+        self._snapshot = snapshot
+
+    def snapshot(self, now: Optional[float] = None) -> Optional[DriverSnapshot]:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._degraded_since is not None:
+                self._expire(now)
+                if len(self._samples) < self.min_samples:
+                    self._exit(now)
+            self._calls += 1
+            if self._degraded_since is None or self._snapshot is None or self._calls % self.probe_every == 0:
+                return None
+            self._approximate += 1
+            return self._snapshot
+
+    def record_exact(self, seconds: float, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._exact += 1
+            self._samples.append((now, seconds))
+            self._expire(now)
+            if len(self._samples) < self.min_samples:
+                return
+            latency = self._window_quantile()
+            if self._degraded_since is None and latency > self.slo_seconds:
+                self._degraded_since = now
+                self._entered += 1
+                logger.warning("Nearby search p%d latency %.3fs breached the %.3fs SLO; serving approximate results",
+                               self.quantile * 100, latency, self.slo_seconds)
+            elif self._degraded_since is not None and latency <= self.slo_seconds * self.recover_ratio:
+                self._exit(now)
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        samples = self._samples
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+
+    def _window_quantile(self) -> Optional[float]:
+        if not self._samples:
+            return None
+        latencies = sorted(latency for _, latency in self._samples)
+        return latencies[min(int(len(latencies) * self.quantile), len(latencies) - 1)]
+
+    def _exit(self, now: float) -> None:
+        if self._degraded_since is None:
+            return
+        self._degraded_seconds += now - self._degraded_since
+        self._degraded_since = None
+        self._exited += 1
+        logger.warning("Nearby search latency recovered; serving exact results again")
+
+    def metrics(self, now: Optional[float] = None) -> Dict:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            degraded_seconds = self._degraded_seconds
+            if self._degraded_since is not None:
+                degraded_seconds += now - self._degraded_since
+            snapshot = self._snapshot
+            return {
+                "degraded": self._degraded_since is not None,
+                "entered_total": self._entered,
+                "exited_total": self._exited,
+                "degraded_seconds_total": round(degraded_seconds, 3),
+                "exact_searches_total": self._exact,
+                "approximate_searches_total": self._approximate,
+                "latency_quantile": self.quantile,
+                "latency_seconds": self._window_quantile(),
+                "latency_slo_seconds": self.slo_seconds,
+                "window_samples": len(self._samples),
+                "snapshot_drivers": len(snapshot.drivers) if snapshot else None,
+                "snapshot_age_seconds": round(snapshot.age_seconds(), 3) if snapshot else None
+            }
+
+
+class DriverSnapshotRefresher:
+    """Background thread rebuilding the available-driver snapshot every interval while degraded.
+
+    Positions come from the worker's fleet state, which the change feed keeps
+    current, so a rebuild only reads the details (name, contacts) of drivers it
+    has not seen yet in the current degraded episode. Without a fleet state the
+    available drivers are loaded from the database. While searches are healthy
+    nothing is read and the snapshot is dropped.
+    """
+
+    def __init__(
+        self,
+        controller: LatencySLOController,
+        session_factory: Callable[[], Session],
+        interval_seconds: float,
+        cell_size_km: float,
+        fleet_state: Optional[FleetState] = None
+    ):
+        self.controller = controller
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.cell_size_km = cell_size_km
+        self.fleet_state = fleet_state
+        self._details: Dict[int, Driver] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> Optional[DriverSnapshot]:
+        if not self.controller.degraded:
+            self._details.clear()
+            self.controller.set_snapshot(None)
+            return None
+        snapshot = DriverSnapshot(self._available_drivers(), self.cell_size_km)
+        self.controller.set_snapshot(snapshot)
+        return snapshot
+
+    def _available_drivers(self) -> List[Driver]:
+        if self.fleet_state is None:
+            db = self.session_factory()
+            try:
+                return SQLDriverRepository(db).get_available()
+            finally:
+                db.close()
+        positions = self.fleet_state.available_drivers()
+        missing = [driver_id for driver_id in positions if driver_id not in self._details]
+        if missing:
+            db = self.session_factory()
+            try:
+                self._details.update((driver.id, driver) for driver in SQLDriverRepository(db).get_by_ids(missing))
+            finally:
+                db.close()
+        return [
+            replace(
+                self._details[driver_id], status=DriverStatus.AVAILABLE,
+                current_location=Location(latitude=latitude, longitude=longitude), version=version
+            )
+            for driver_id, (latitude, longitude, version) in positions.items() if driver_id in self._details
+        ]
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="driver-snapshot-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Driver snapshot refresh failed")
+            if self._stop.wait(self.interval_seconds):
+                return
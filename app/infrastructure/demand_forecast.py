@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import threading
+from array import array
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..domain.forecast import DemandForecast, fit_demand_forecast
+from .models import TripModel
+from .trip_partitions import existing_partitions, partition_bounds, partition_table
+
+FORMAT_VERSION = 1
+
+
+def load_pickups(db: Session, start: datetime, end: datetime) -> Iterator[Tuple[datetime, float, float]]:
+    """(created_at, latitude, longitude) of every trip request in [start, end), archived ones included.
+
+    Cancelled and unassigned requests count too: they are demand all the same.
+    """
+    tables = [TripModel.__table__] + [
+        partition_table(name) for name in existing_partitions(db)
+        if partition_bounds(name)[1] > start and partition_bounds(name)[0] < end
+    ]
+    for table in tables:
+        yield from db.execute(
+            select(table.c.created_at, table.c.pickup_latitude, table.c.pickup_longitude)
+            .where(table.c.created_at >= start, table.c.created_at < end)
+        ).tuples()
+
+
+def fit_from_trips(
+    db: Session, weeks: int, cell_size_km: float, alpha: float, now: Optional[datetime] = None
+) -> DemandForecast:
+    """Fit the forecast on the last `weeks` full weeks of trip requests"""
+    now = now or datetime.utcnow()
+    start = now - timedelta(weeks=weeks)
+    return fit_demand_forecast(load_pickups(db, start, now), start, weeks, cell_size_km, alpha, fitted_at=now)
+
+
+def save_forecast(forecast: DemandForecast, path: str) -> None:
+    """Write the forecast as JSON, atomically so serving workers never read a partial file"""
+    document = {
+        "version": FORMAT_VERSION,
+        "cell_size_km": forecast.cell_size_km,
+        "fitted_at": forecast.fitted_at.isoformat() if forecast.fitted_at else None,
+        "cells": [list(cell) for cell in forecast.cells],
+        "rates": [round(rate, 4) for rate in forecast.rates]
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            json.dump(document, f, separators=(",", ":"))
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def load_forecast(path: str) -> DemandForecast:
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    if document.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported demand forecast format in {path}")
+    fitted_at = document["fitted_at"]
+    return DemandForecast(
+        document["cell_size_km"],
+        [tuple(cell) for cell in document["cells"]],
+        array("d", document["rates"]),
+        datetime.fromisoformat(fitted_at) if fitted_at else None
+    )
+
+
+class DemandForecastFile:
+    """The fitted forecast on disk, reloaded whenever the file is replaced by a new fit"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._forecast: Optional[DemandForecast] = None
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[DemandForecast]:
+        """The current forecast; None until one has been fitted"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._forecast = load_forecast(self.path)
+                    self._mtime = mtime
+        return self._forecast
@@ -3,50 +3,122 @@ FastAPI dependency injection for services.
 This module provides dependency injection functions for FastAPI endpoints.
 """
 
-from ..application.services import DriverService, PassengerService, TripService, InvoiceService
-from .repositories import SQLDriverRepository, SQLPassengerRepository, SQLTripRepository, SQLInvoiceRepository
-from .database import SessionLocal
+from typing import Optional
 
+from fastapi import Depends
+from sqlalchemy.orm import Session
 
-def get_driver_service() -> DriverService:
+from ..core.config import process_settings, settings
+from ..application.services import DriverService, PassengerService, TripService, InvoiceService, PricingService, RepositionService
+from ..domain.zones import ZoneIndex
+from .repositories import SQLPassengerRepository, SQLTripRepository, SQLInvoiceRepository, driver_repository
+from .database import get_db, get_read_db
+from .fleet_state import FleetState
+from .heartbeats import HeartbeatTracker
+from .unit_of_work import SQLUnitOfWork
+from .location_trail import LocationTrailStore, SQLLocationTrail
+from .degradation import LatencySLOController
+from .tenants import DEFAULT_ZONES_PATH, Tenant, TenantRegistry, active_tenant, load_city, load_zone_index  # noqa: F401
+
+
+def build_trip_service(db: Session) -> TripService:
+    """Build a trip service wired to the current tenant's pricing and timeout state."""
+    tenant = current_tenant()
+    trip_repo = SQLTripRepository(db)
+    driver_repo = driver_repository(db)
+    passenger_repo = SQLPassengerRepository(db)
+    return TripService(
+        trip_repo, driver_repo, passenger_repo, tenant.pricing_engine,
+        trip_timeouts=tenant.trip_timeouts, zone_index=get_zone_index(), liveness=get_liveness(),
+        unit_of_work=SQLUnitOfWork(db), trail=get_location_trail(db)
+    )
+
+
+# Requests without a city, and everything outside a request, use the process settings and database
+default_tenant = Tenant(None, process_settings, build_trip_service)
+
+# Configured cities, each with its own engine and in-memory state, loaded on first request
+tenants = TenantRegistry(
+    lambda city: load_city(process_settings, build_trip_service, city),
+    idle_ttl_seconds=process_settings.tenant_idle_ttl_seconds,
+    max_loaded=process_settings.max_loaded_tenants
+)
+
+
+def current_tenant() -> Tenant:
+    return active_tenant() or default_tenant
+
+
+def get_zone_index() -> ZoneIndex:
+    """Service zones, loaded from GeoJSON on first use"""
+    return current_tenant().zone_index()
+
+
+def get_location_trail_store() -> Optional[LocationTrailStore]:
+    return current_tenant().location_trail_store if settings.trail_enabled else None
+
+
+def get_location_trail(db: Session) -> Optional[SQLLocationTrail]:
+    return SQLLocationTrail(current_tenant().location_trail_store, db) if settings.trail_enabled else None
+
+
+def get_nearby_degradation() -> Optional[LatencySLOController]:
+    return current_tenant().nearby_degradation if settings.nearby_degradation_enabled else None
+
+
+def get_heartbeats() -> HeartbeatTracker:
+    return current_tenant().heartbeats
+
+
+def get_liveness() -> Optional[HeartbeatTracker]:
+    return current_tenant().heartbeats if settings.heartbeat_enabled else None
+
+
+def get_fleet_state() -> FleetState:
+    return current_tenant().fleet_state
+
+
+def get_driver_service(db: Session = Depends(get_read_db)) -> DriverService:
     """Get driver service with injected dependencies."""
-    db = SessionLocal()
-    try:
-        driver_repo = SQLDriverRepository(db)
-        return DriverService(driver_repo)
-    finally:
-        db.close()
+    driver_repo = driver_repository(db)
+    return DriverService(driver_repo, get_liveness(), get_location_trail(db), get_nearby_degradation())
+
 
+def get_reposition_service(db: Session = Depends(get_read_db)) -> RepositionService:
+    """Get reposition service with the current demand forecast."""
+    driver_repo = driver_repository(db)
+    return RepositionService(current_tenant().demand_forecast_file.get(), driver_repo, get_liveness())
 
-def get_passenger_service() -> PassengerService:
+
+def get_passenger_service(db: Session = Depends(get_read_db)) -> PassengerService:
     """Get passenger service with injected dependencies."""
-    db = SessionLocal()
-    try:
-        passenger_repo = SQLPassengerRepository(db)
-        driver_repo = SQLDriverRepository(db)
-        return PassengerService(passenger_repo, driver_repo)
-    finally:
-        db.close()
+    passenger_repo = SQLPassengerRepository(db)
+    driver_repo = driver_repository(db)
+    return PassengerService(passenger_repo, driver_repo, get_liveness(), get_nearby_degradation())
 
 
-def get_trip_service() -> TripService:
+def get_trip_service(db: Session = Depends(get_db)) -> TripService:
     """Get trip service with injected dependencies."""
-    db = SessionLocal()
-    try:
-        trip_repo = SQLTripRepository(db)
-        driver_repo = SQLDriverRepository(db)
-        passenger_repo = SQLPassengerRepository(db)
-        return TripService(trip_repo, driver_repo, passenger_repo)
-    finally:
-        db.close()
+    return build_trip_service(db)
+
 
+def get_read_trip_service(db: Session = Depends(get_read_db)) -> TripService:
+    """Get trip service bound to a read replica, for read-only trip queries."""
+    trip_repo = SQLTripRepository(db)
+    driver_repo = driver_repository(db)
+    passenger_repo = SQLPassengerRepository(db)
+    return TripService(trip_repo, driver_repo, passenger_repo, trail=get_location_trail(db))
 
-def get_invoice_service() -> InvoiceService:
+
+def get_invoice_service(db: Session = Depends(get_db)) -> InvoiceService:
     """Get invoice service with injected dependencies."""
-    db = SessionLocal()
-    try:
-        invoice_repo = SQLInvoiceRepository(db)
-        trip_repo = SQLTripRepository(db)
-        return InvoiceService(invoice_repo, trip_repo)
-    finally:
-        db.close()
\ No newline at end of file
+    invoice_repo = SQLInvoiceRepository(db)
+    trip_repo = SQLTripRepository(db)
+    return InvoiceService(invoice_repo, trip_repo)
+
+
+def get_pricing_service(db: Session = Depends(get_read_db)) -> PricingService:
+    """Get pricing service with injected dependencies."""
+    tenant = current_tenant()
+    driver_repo = driver_repository(db)
+    return PricingService(tenant.pricing_engine, driver_repo, refresh_on_request=not tenant.surge_pricing_refresher.running)
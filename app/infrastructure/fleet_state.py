@@ -0,0 +1,130 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..domain.entities import DriverStatus, TripStatus
+from ..domain.fleet import FleetSnapshot
+from .change_feed import ChangeEvent, DRIVER, TRIP, latest_cursor
+from .models import DriverModel, TripModel, TripStatusEnum
+
+ACTIVE_TRIP_STATUSES = {TripStatus.REQUESTED, TripStatus.ACCEPTED, TripStatus.IN_PROGRESS}
+
+# driver id -> (status, latitude, longitude, version)
+DriverRow = Tuple[DriverStatus, float, float, int]
+# trip id -> (status, passenger id, driver id, version)
+TripRow = Tuple[TripStatus, int, int, int]
+
+
+class FleetState:
+    """Per-worker in-memory copy of driver positions and active trips.
+
+    Built once from the database, then kept current by applying change-feed
+    deltas. Each row carries its version, so replayed or duplicated events
+    are ignored and applying a batch is idempotent. Recently settled trips
+    keep their version, so an older event arriving late (see ChangeFeedPoller)
+    does not bring them back.
+    """
+
+    def __init__(self, settled_trips_kept: int = 65536):
+        self.drivers: Dict[int, DriverRow] = {}
+        self.active_trips: Dict[int, TripRow] = {}
+        self.cursor = 0
+        self._settled: "OrderedDict[int, int]" = OrderedDict()
+        self._settled_trips_kept = settled_trips_kept
+        self._lock = threading.Lock()
+
+    def load(self, db: Session) -> None:
+        # Read the cursor first: events committed during the load are replayed
+        # afterwards and skipped by the version check if already reflected
+        cursor = latest_cursor(db)
+        drivers = {
+            row.id: (
+                DriverStatus(row.status.value),
+                math.nan if row.latitude is None else row.latitude,
+                math.nan if row.longitude is None else row.longitude,
+                row.version
+            )
+            for row in db.query(
+                DriverModel.id, DriverModel.status, DriverModel.latitude, DriverModel.longitude, DriverModel.version
+            )
+        }
+        active_trips = {
+            row.id: (TripStatus(row.status.value), row.passenger_id, row.driver_id, row.version)
+            for row in db.query(
+                TripModel.id, TripModel.status, TripModel.passenger_id, TripModel.driver_id, TripModel.version
+            ).filter(TripModel.status.in_([TripStatusEnum(status.value) for status in ACTIVE_TRIP_STATUSES]))
+        }
+        self.restore(cursor, drivers, active_trips)
+
+    def restore(self, cursor: int, drivers: Dict[int, DriverRow], active_trips: Dict[int, TripRow]) -> None:
+        """Replace the whole state, e.g. with a snapshot; changes after cursor are still to be applied"""
+        with self._lock:
+            self.drivers = drivers
+            self.active_trips = active_trips
+            self.cursor = cursor
+
+    def export(self) -> Tuple[int, Dict[int, DriverRow], Dict[int, TripRow]]:
+        """A consistent copy of the cursor, drivers and active trips"""
+        with self._lock:
+            return self.cursor, dict(self.drivers), dict(self.active_trips)
+
+    def apply(self, events: Iterable[ChangeEvent], cursor: Optional[int] = None) -> None:
+        """Apply change events; cursor is the feed's position (by default the newest event id)"""
+        with self._lock:
+            for event in events:
+                payload = event.payload
+                if event.entity == DRIVER:
+                    current = self.drivers.get(event.entity_id)
+                    if current is None or payload["version"] > current[3]:
+                        self.drivers[event.entity_id] = (
+                            DriverStatus(payload["status"]),
+                            math.nan if payload["latitude"] is None else payload["latitude"],
+                            math.nan if payload["longitude"] is None else payload["longitude"],
+                            payload["version"]
+                        )
+                elif event.entity == TRIP:
+                    self._apply_trip(event.entity_id, payload)
+                if cursor is None:
+                    self.cursor = max(self.cursor, event.id)
+            if cursor is not None:
+                self.cursor = cursor
+
+    def _apply_trip(self, trip_id: int, payload: Dict) -> None:
+        current = self.active_trips.get(trip_id)
+        version = current[3] if current is not None else self._settled.get(trip_id)
+        if version is not None and payload["version"] <= version:
+            return
+        status = TripStatus(payload["status"])
+        if status in ACTIVE_TRIP_STATUSES:
+            self.active_trips[trip_id] = (status, payload["passenger_id"], payload["driver_id"], payload["version"])
+        else:
+            self.active_trips.pop(trip_id, None)
+            self._settled[trip_id] = payload["version"]
+            if len(self._settled) > self._settled_trips_kept:
+                self._settled.popitem(last=False)
+
+    def available_drivers(self) -> Dict[int, Tuple[float, float, int]]:
+        """(latitude, longitude, version) of the AVAILABLE drivers with a known position"""
+        with self._lock:
+            return {
+                driver_id: (latitude, longitude, version)
+                for driver_id, (status, latitude, longitude, version) in self.drivers.items()
+                if status == DriverStatus.AVAILABLE and not math.isnan(latitude)
+            }
+
+    def snapshot(self) -> FleetSnapshot:
+        snapshot = FleetSnapshot()
+        with self._lock:
+            for driver_id, (status, latitude, longitude, _) in self.drivers.items():
+                snapshot.append(driver_id, status, latitude, longitude)
+        return snapshot
+
+    def summary(self) -> Dict:
+        with self._lock:
+            counts = {status.value: 0 for status in DriverStatus}
+            for status, _, _, _ in self.drivers.values():
+                counts[status.value] += 1
+            return {"cursor": self.cursor, "drivers": counts, "active_trips": len(self.active_trips)}
@@ -0,0 +1,206 @@
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..domain.entities import TripStatus
+from ..domain.fleet import STATUS_CODES, STATUSES
+from .change_feed import can_replay_from
+from .fleet_state import DriverRow, FleetState, TripRow
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"T24F"
+FORMAT_VERSION = 1
+TRIP_STATUSES = list(TripStatus)
+TRIP_STATUS_CODES = {status: code for code, status in enumerate(TRIP_STATUSES)}
+NO_DRIVER = -1
+
+# magic, format version, reserved, source checksum, body checksum, cursor, drivers, active trips, written at
+HEADER = struct.Struct("<4sHHIIqqqd")
+
+
+@dataclass(slots=True)
+class StoredFleetState:
+    cursor: int
+    drivers: Dict[int, DriverRow]
+    active_trips: Dict[int, TripRow]
+    written_at: float
+
+
+def source_checksum(source: str) -> int:
+    return zlib.crc32(source.encode())
+
+
+def _aligned(size: int) -> int:
+    return size + (-size % 8)
+
+
+def _padded(data: bytes) -> bytes:
+    return data + b"\0" * (_aligned(len(data)) - len(data))
+
+
+def write_fleet_state(state: FleetState, path: str, source: str) -> int:
+    """Write state as a flat columnar file, atomically; returns the cursor it holds.
+
+    Every column is 8-byte aligned so a reader can cast the mapped bytes in
+    place: driver ids, versions, latitudes, longitudes and status codes, then
+    trip ids, versions, passenger ids, driver ids and status codes. source
+    identifies the database, so a file from another one is never restored.
+    """
+    cursor, drivers, active_trips = state.export()
+    rows = drivers.values()
+    trips = active_trips.values()
+    columns = [
+        array("q", drivers.keys()),
+        array("q", (row[3] for row in rows)),
+        array("d", (row[1] for row in rows)),
+        array("d", (row[2] for row in rows)),
+        _padded(bytes(STATUS_CODES[row[0]] for row in rows)),
+        array("q", active_trips.keys()),
+        array("q", (trip[3] for trip in trips)),
+        array("q", (trip[1] for trip in trips)),
+        array("q", (NO_DRIVER if trip[2] is None else trip[2] for trip in trips)),
+        _padded(bytes(TRIP_STATUS_CODES[trip[0]] for trip in trips)),
+    ]
+    body = b"".join(column if isinstance(column, bytes) else column.tobytes() for column in columns)
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0, source_checksum(source), zlib.crc32(body),
+        cursor, len(drivers), len(active_trips), time.time()
+    )
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(header)
+            f.write(body)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return cursor
+
+
+def read_fleet_state(path: str, source: str) -> Optional[StoredFleetState]:
+    """The state saved at path; None when missing, damaged or written for another database"""
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return _decode(mapped, path, source)
+    except (OSError, ValueError) as exc:  # missing or empty file
+        logger.info("No fleet state snapshot at %s (%s)", path, exc)
+        return None
+
+
+def _decode(mapped: mmap.mmap, path: str, source: str) -> Optional[StoredFleetState]:
+    if len(mapped) < HEADER.size:
+        logger.warning("Ignoring truncated fleet state snapshot %s", path)
+        return None
+    magic, version, _, source_crc, body_crc, cursor, driver_count, trip_count, written_at = HEADER.unpack_from(mapped)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        logger.warning("Ignoring fleet state snapshot %s in an unknown format", path)
+        return None
+    if source_crc != source_checksum(source):
+        logger.warning("Ignoring fleet state snapshot %s written for another database", path)
+        return None
+    expected_size = HEADER.size + driver_count * 32 + _aligned(driver_count) + trip_count * 32 + _aligned(trip_count)
+    with memoryview(mapped) as view:
+        body = view[HEADER.size:]
+        if len(mapped) != expected_size or zlib.crc32(body) != body_crc:
+            body.release()
+            logger.warning("Ignoring damaged fleet state snapshot %s", path)
+            return None
+        columns: List[memoryview] = []
+        offset = 0
+        for code, count in (("q", driver_count), ("q", driver_count), ("d", driver_count), ("d", driver_count),
+                            ("B", driver_count), ("q", trip_count), ("q", trip_count), ("q", trip_count),
+                            ("q", trip_count), ("B", trip_count)):
+            size = count * (1 if code == "B" else 8)
+            columns.append(body[offset:offset + size].cast(code))
+            offset += _aligned(size)
+        try:
+            ids, versions, latitudes, longitudes, codes = columns[:5]
+            drivers = dict(zip(ids, zip([STATUSES[code] for code in codes], latitudes, longitudes, versions)))
+            trip_ids, trip_versions, passenger_ids, driver_ids, trip_codes = columns[5:]
+            active_trips = dict(zip(trip_ids, zip(
+                [TRIP_STATUSES[code] for code in trip_codes], passenger_ids,
+                [None if driver_id == NO_DRIVER else driver_id for driver_id in driver_ids], trip_versions
+            )))
+        finally:
+            for column in columns:
+                column.release()
+            body.release()
+    return StoredFleetState(cursor, drivers, active_trips, written_at)
+
+
+def restore_fleet_state(state: FleetState, path: str, source: str, db: Session) -> bool:
+    """Load state from the snapshot at path if the change feed can bring it up to date from there.
+
+    The caller then replays the events after state.cursor. Returns False,
+    leaving state untouched, when there is no usable snapshot or the events
+    after its cursor have already been pruned.
+    """
+    stored = read_fleet_state(path, source)
+    if stored is None:
+        return False
+    if not can_replay_from(db, stored.cursor):
+        logger.warning("Fleet state snapshot %s at cursor %s is older than the change feed", path, stored.cursor)
+        return False
+    state.restore(stored.cursor, stored.drivers, stored.active_trips)
+    logger.info(
+        "Restored %s drivers and %s active trips from %s at cursor %s",
+        len(stored.drivers), len(stored.active_trips), path, stored.cursor
+    )
+    return True
+
+
+class FleetStateWriter:
+    """Background thread saving the fleet state every interval, and once more on stop"""
+
+    def __init__(self, state: FleetState, path: str, interval_seconds: float, source: str):
+        self.state = state
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.source = source
+        self._written_cursor: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> bool:
+        """Save the state unless nothing was applied since the last save"""
+        if self.state.cursor == self._written_cursor:
+            return False
+        self._written_cursor = write_fleet_state(self.state, self.path, self.source)
+        return True
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fleet-state-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is None:
+            return  # never started: the state was not being kept current
+        self._thread.join()
+        try:
+            self.run_once()
+        except Exception:
+            logger.exception("Saving the fleet state on shutdown failed")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Saving the fleet state failed")
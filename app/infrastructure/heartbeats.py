@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..domain.liveness import DriverLiveness
+from .repositories import SQLDriverRepository
+
+logger = logging.getLogger(__name__)
+
+
+def _as_datetimes(last_seen: Dict[int, float]) -> Dict[int, datetime]:
+    return {driver_id: datetime.utcfromtimestamp(seen) for driver_id, seen in last_seen.items()}
+
+
+def _as_timestamps(last_seen: Dict[int, datetime]) -> Dict[int, float]:
+    return {driver_id: seen.replace(tzinfo=timezone.utc).timestamp() for driver_id, seen in last_seen.items()}
+
+
+class HeartbeatTracker(DriverLiveness):
+    """Last-seen time per driver, kept in last-seen order.
+
+    A heartbeat moves the driver to the end of an OrderedDict, so the stalest
+    drivers are always at the front and expiry pops only the entries that are
+    actually stale. Heartbeats never touch the database; the times seen since
+    the last flush are handed to the monitor in one batch.
+
+    Drivers this process has not heard from (e.g. apps that predate
+    heartbeats, or beats received by another worker) count as live.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._last_seen: "OrderedDict[int, float]" = OrderedDict()
+        self._pending: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._last_seen)
+
+    def beat(self, driver_id: int, now: Optional[float] = None) -> None:
+        self.beat_many((driver_id,), now)
+
+    def beat_many(self, driver_ids: Iterable[int], now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        count = 0
+        with self._lock:
+            last_seen, pending = self._last_seen, self._pending
+            for driver_id in driver_ids:
+                last_seen[driver_id] = now
+                last_seen.move_to_end(driver_id)
+                pending[driver_id] = now
+                count += 1
+        return count
+
+    def is_live(self, driver_id: int, now: Optional[float] = None) -> bool:
+        seen = self._last_seen.get(driver_id)
+        if seen is None:
+            return True
+        now = time.time() if now is None else now
+        return now - seen <= self.ttl_seconds
+
+    def take_pending(self) -> Dict[int, float]:
+        """Last-seen times recorded since the previous call"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def pop_expired(self, now: Optional[float] = None) -> List[int]:
+        """Remove and return the drivers not heard from within the TTL"""
+        cutoff = (time.time() if now is None else now) - self.ttl_seconds
+        expired = []
+        with self._lock:
+            while self._last_seen:
+                driver_id, seen = next(iter(self._last_seen.items()))
+                if seen >= cutoff:
+                    break
+                del self._last_seen[driver_id]
+                expired.append(driver_id)
+        return expired
+
+    def keep_stale(self, last_seen: Dict[int, float]) -> None:
+        """Track expired drivers again as stale (e.g. silent while on a trip) unless they beat since"""
+        with self._lock:
+            for driver_id, seen in sorted(last_seen.items(), key=lambda item: item[1], reverse=True):
+                if driver_id not in self._last_seen:
+                    self._last_seen[driver_id] = seen
+                    self._last_seen.move_to_end(driver_id, last=False)  # older than every tracked driver
+
+
+class HeartbeatMonitor:
+    """Background sweeper: flushes last-seen times and takes stale drivers offline.
+
+    The OFFLINE flip re-checks the flushed last_seen_at in the database, so a
+    driver whose heartbeats reach a different worker is left alone. Stale
+    drivers that are not AVAILABLE (silent mid-trip) stay tracked as stale, so
+    they are not offered trips and go OFFLINE once their trip releases them.
+    """
+
+    def __init__(self, tracker: HeartbeatTracker, session_factory: Callable[[], Session], interval_seconds: float):
+        self.tracker = tracker
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self, now: Optional[float] = None) -> List[int]:
+        """Flush pending heartbeats, then return the ids of drivers switched to OFFLINE"""
+        now = time.time() if now is None else now
+        pending = self.tracker.take_pending()
+        expired = self.tracker.pop_expired(now)
+        if not pending and not expired:
+            return []
+
+        db = self.session_factory()
+        try:
+            repo = SQLDriverRepository(db)
+            repo.record_heartbeats(_as_datetimes(pending))
+            if not expired:
+                return []
+            seen_before = datetime.utcfromtimestamp(now - self.tracker.ttl_seconds)
+            offline = [driver.id for driver in repo.mark_offline_if_stale(expired, seen_before)]
+            remaining = set(expired).difference(offline)
+            if remaining:
+                self.tracker.keep_stale(_as_timestamps(repo.get_stale_last_seen(list(remaining), seen_before)))
+            return offline
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="heartbeat-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        # Keep the last-seen times received since the final sweep
+        pending = self.tracker.take_pending()
+        if pending:
+            db = self.session_factory()
+            try:
+                SQLDriverRepository(db).record_heartbeats(_as_datetimes(pending))
+            finally:
+                db.close()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Heartbeat sweep failed")
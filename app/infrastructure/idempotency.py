@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    status_code: int
+    body: bytes
+
+
+class IdempotencyKeyReusedError(Exception):
+    """Raised when a key is replayed with a different request payload"""
+
+
+class IdempotencyTimeoutError(Exception):
+    """Raised when a duplicate gives up waiting on the in-flight original"""
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires_at", "done", "response")
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.done = threading.Event()
+        self.response: Optional[StoredResponse] = None
+
+
+class IdempotencyStore:
+    """In-memory idempotency key store with TTL eviction.
+
+    Entries are kept in insertion order, and since every entry gets the same TTL
+    that is also expiry order, so eviction only ever looks at the oldest entries.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, wait_timeout_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.wait_timeout_seconds = wait_timeout_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            expired = entry.expires_at <= now
+            over_capacity = len(self._entries) > self.max_entries
+            # In-flight entries are never evicted; their waiters still need them
+            if not entry.done.is_set() or not (expired or over_capacity):
+                break
+            del self._entries[key]
+
+    def _begin(self, key: str, fingerprint: str) -> Tuple[_Entry, bool]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                if entry.fingerprint != fingerprint:
+                    raise IdempotencyKeyReusedError(key)
+                return entry, False
+            entry = _Entry(fingerprint, now + self.ttl_seconds)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            return entry, True
+
+    def _abandon(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def execute(
+        self, key: str, fingerprint: str, handler: Callable[[], StoredResponse]
+    ) -> Tuple[StoredResponse, bool]:
+        """Run handler once per key and replay its response for duplicates.
+
+        Returns the response and whether it was replayed. Duplicates that arrive
+        while the original is still running block until it finishes.
+        """
+        while True:
+            entry, is_owner = self._begin(key, fingerprint)
+            if is_owner:
+                try:
+                    response = handler()
+                except BaseException:
+                    # Let a retry execute again instead of replaying a crash
+                    self._abandon(key, entry)
+                    raise
+                entry.response = response
+                entry.done.set()
+                return response, False
+
+            if not entry.done.wait(self.wait_timeout_seconds):
+                raise IdempotencyTimeoutError(key)
+            if entry.response is not None:
+                return entry.response, True
+            # The original failed and was abandoned; try to become the owner
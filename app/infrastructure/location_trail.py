@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from ..domain.entities import TrailPoint
+from ..domain.trail import LocationTrail, RawPing, decode_pings, encode_pings, to_raw_ping, to_trail_point
+from .models import LocationTrailChunkModel
+from .unit_of_work import commit
+
+logger = logging.getLogger(__name__)
+
+
+def to_epoch_ms(moment: datetime) -> int:
+    """Naive datetimes are UTC, as everywhere in the database"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return round(moment.timestamp() * 1000)
+
+
+def _to_datetime(timestamp_ms: int) -> datetime:
+    return datetime.utcfromtimestamp(timestamp_ms / 1000)
+
+
+class _OpenChunk:
+    __slots__ = ("pings", "first_ms", "opened_at")
+
+    def __init__(self, first_ms: int, opened_at: float):
+        self.pings: List[RawPing] = []
+        self.first_ms = first_ms
+        self.opened_at = opened_at
+
+
+class LocationTrailStore:
+    """Recent pings per driver, cut into chunks that are flushed as compressed BLOB rows.
+
+    Appends only touch an in-memory list. A chunk is closed when it holds
+    chunk_points pings or a ping lands more than chunk_span_seconds from the
+    chunk's first one, so a stored chunk never covers more than twice the span
+    and range reads can bound their index scan. Reads on this worker merge the
+    open chunks, so they are only flushed once they have been open for the span:
+    a driver pinging every second fills whole chunks instead of a row every few
+    seconds, and other workers see the pings within about a span.
+    """
+
+    def __init__(self, chunk_points: int = 256, chunk_span_seconds: float = 60.0, clock: Callable[[], float] = time.time):
+        self.chunk_points = chunk_points
+        self.chunk_span_ms = int(chunk_span_seconds * 1000)
+        self.clock = clock
+        self._open: Dict[int, _OpenChunk] = {}
+        self._closed: List[Tuple[int, List[RawPing]]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def max_chunk_span(self) -> timedelta:
+        return timedelta(milliseconds=2 * self.chunk_span_ms)
+
+    @property
+    def open_chunk_max_age_seconds(self) -> float:
+        return self.chunk_span_ms / 1000
+
+    def append_many(self, driver_id: int, pings: Iterable[Tuple[float, float, Optional[datetime]]]) -> int:
+        """Record (latitude, longitude, timestamp) pings; a missing timestamp means now"""
+        now = self.clock()
+        now_ms = round(now * 1000)
+        raw = [
+            to_raw_ping(now_ms if timestamp is None else to_epoch_ms(timestamp), latitude, longitude)
+            for latitude, longitude, timestamp in pings
+        ]
+        with self._lock:
+            chunk = self._open.get(driver_id)
+            for ping in raw:
+                if chunk is None or len(chunk.pings) >= self.chunk_points or abs(ping[0] - chunk.first_ms) > self.chunk_span_ms:
+                    if chunk is not None:
+                        self._closed.append((driver_id, chunk.pings))
+                    chunk = self._open[driver_id] = _OpenChunk(ping[0], now)
+                chunk.pings.append(ping)
+        return len(raw)
+
+    def append(self, driver_id: int, latitude: float, longitude: float, timestamp: Optional[datetime] = None) -> None:
+        self.append_many(driver_id, ((latitude, longitude, timestamp),))
+
+    def take_chunks(self, max_age_seconds: Optional[float] = None, now: Optional[float] = None) -> List[Tuple[int, List[RawPing]]]:
+        """Closed chunks plus open ones older than max_age_seconds (all open ones when None)"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            chunks, self._closed = self._closed, []
+            for driver_id, chunk in list(self._open.items()):
+                if max_age_seconds is None or now - chunk.opened_at >= max_age_seconds:
+                    chunks.append((driver_id, chunk.pings))
+                    del self._open[driver_id]
+        return chunks
+
+    def put_back(self, chunks: List[Tuple[int, List[RawPing]]]) -> None:
+        """Return taken chunks whose write failed; they are flushed again with the next batch"""
+        with self._lock:
+            self._closed[:0] = chunks
+
+    def buffered(self, driver_id: int, start_ms: int, end_ms: int) -> List[RawPing]:
+        """Pings of this worker not flushed yet"""
+        with self._lock:
+            chunks = [pings for chunk_driver, pings in self._closed if chunk_driver == driver_id]
+            if driver_id in self._open:
+                chunks.append(self._open[driver_id].pings)
+            return [ping for pings in chunks for ping in pings if start_ms <= ping[0] <= end_ms]
+
+
+def write_chunks(db: Session, chunks: List[Tuple[int, List[RawPing]]]) -> None:
+    """Store chunks in one executemany"""
+    rows = []
+    for driver_id, pings in chunks:
+        pings = sorted(pings)
+        rows.append({
+            "driver_id": driver_id,
+            "started_at": _to_datetime(pings[0][0]),
+            "ended_at": _to_datetime(pings[-1][0]),
+            "point_count": len(pings),
+            "data": encode_pings(pings)
+        })
+    if rows:
+        db.execute(insert(LocationTrailChunkModel), rows)
+        commit(db)
+
+
+class SQLLocationTrail(LocationTrail):
+    """Trail reads over the stored chunks plus this worker's unflushed pings"""
+
+    def __init__(self, store: LocationTrailStore, db: Session):
+        self.store = store
+        self.db = db
+
+    def points(self, driver_id: int, start: datetime, end: datetime) -> List[TrailPoint]:
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        chunks = LocationTrailChunkModel.__table__.c
+        blobs = self.db.execute(
+            select(chunks.data).where(
+                chunks.driver_id == driver_id,
+                chunks.started_at >= start - self.store.max_chunk_span,
+                chunks.started_at <= end,
+                chunks.ended_at >= start
+            )
+        ).scalars()
+        pings = [ping for blob in blobs for ping in decode_pings(blob) if start_ms <= ping[0] <= end_ms]
+        pings.extend(self.store.buffered(driver_id, start_ms, end_ms))
+        pings.sort()
+        return [to_trail_point(ping) for ping in pings]
+
+
+class LocationTrailFlusher:
+    """Background thread writing closed chunks, and open ones older than the chunk span, to the database"""
+
+    def __init__(self, store: LocationTrailStore, session_factory: Callable[[], Session], interval_seconds: float):
+        self.store = store
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self, force: bool = False) -> int:
+        """Flush due chunks (every open chunk when forced); returns the number of chunks written"""
+        chunks = self.store.take_chunks(None if force else self.store.open_chunk_max_age_seconds)
+        if not chunks:
+            return 0
+        try:
+            db = self.session_factory()
+            try:
+                write_chunks(db, chunks)
+            finally:
+                db.close()
+        except Exception:
+            self.store.put_back(chunks)  # keep the pings for the next flush instead of dropping them
+            raise
+        return len(chunks)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="location-trail-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.run_once(force=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Location trail flush failed")
@@ -1,5 +1,6 @@
 from typing import Optional, Dict, Any
-from ..domain.entities import Driver, Passenger, Trip, Invoice, Location
+from ..domain.entities import Driver, Passenger, Trip, Invoice, Location, FareQuote, TrailPoint, RepositionSuggestion
+from ..domain.zones import Zone
 
 
 class EntityMapper:
@@ -51,7 +52,23 @@ class EntityMapper:
             "fare": trip.fare,
             "distance_km": trip.distance_km,
             "created_at": trip.created_at,
-            "completed_at": trip.completed_at
+            "started_at": trip.started_at,
+            "completed_at": trip.completed_at,
+            "pickup_zone": trip.pickup_zone,
+            "search_radius_km": trip.search_radius_km
+        }
+    
+    @staticmethod
+    def trail_point_to_dict(point: TrailPoint) -> Dict[str, Any]:
+        return {"latitude": point.latitude, "longitude": point.longitude, "timestamp": point.timestamp}
+    
+    @staticmethod
+    def reposition_suggestion_to_dict(suggestion: RepositionSuggestion) -> Dict[str, Any]:
+        return {
+            "location": EntityMapper.location_to_dict(suggestion.location),
+            "distance_km": suggestion.distance_km,
+            "expected_pickups": suggestion.expected_pickups,
+            "idle_drivers": suggestion.idle_drivers
         }
     
     @staticmethod
@@ -63,4 +80,24 @@ class EntityMapper:
             "tax_amount": invoice.tax_amount,
             "total_amount": invoice.total_amount,
             "issued_at": invoice.issued_at
-        }
\ No newline at end of file
+        }
+    
+    @staticmethod
+    def quote_to_dict(quote: FareQuote) -> Dict[str, Any]:
+        return {
+            "zone": quote.zone,
+            "surge_multiplier": quote.surge_multiplier,
+            "base_fare": quote.base_fare,
+            "distance_km": quote.distance_km,
+            "estimated_fare": quote.estimated_fare
+        }
+    
+    @staticmethod
+    def zone_to_dict(zone: Optional[Zone]) -> Optional[Dict[str, Any]]:
+        if not zone:
+            return None
+        return {
+            "id": zone.id,
+            "name": zone.name,
+            "kind": zone.kind
+        }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, DECIMAL, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, DECIMAL, ForeignKey, Text, Index, LargeBinary, DDL, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -15,6 +15,7 @@ class DriverStatusEnum(enum.Enum):
 
 class TripStatusEnum(enum.Enum):
     REQUESTED = "requested"
+    ACCEPTED = "accepted"
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
     CANCELLED = "cancelled"
@@ -22,6 +23,9 @@ class TripStatusEnum(enum.Enum):
 
 class DriverModel(Base):
     __tablename__ = "drivers"
+    __table_args__ = (
+        Index("ix_drivers_status_latitude", "status", "latitude"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -33,6 +37,22 @@ class DriverModel(Base):
     longitude = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)
+    last_seen_at = Column(DateTime)  # batched from in-memory heartbeats; not versioned
+
+
+# On PostgreSQL, drivers also get a PostGIS point generated from latitude/longitude (so every
+# write path keeps it current) and a GiST index for radius and nearest-neighbour (<->) queries
+event.listen(Base.metadata, "before_create", DDL(
+    "CREATE EXTENSION IF NOT EXISTS postgis"
+).execute_if(dialect="postgresql"))
+event.listen(DriverModel.__table__, "after_create", DDL(
+    "ALTER TABLE drivers ADD COLUMN location geography(Point, 4326) "
+    "GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography) STORED"
+).execute_if(dialect="postgresql"))
+event.listen(DriverModel.__table__, "after_create", DDL(
+    "CREATE INDEX ix_drivers_location ON drivers USING gist (location)"
+).execute_if(dialect="postgresql"))
 
 
 class PassengerModel(Base):
@@ -48,6 +68,15 @@ class PassengerModel(Base):
 
 class TripModel(Base):
     __tablename__ = "trips"
+    __table_args__ = (
+        # Trip history is read newest first per passenger/driver; the rowid (id) rides along in each index
+        Index("ix_trips_passenger_created", "passenger_id", "created_at"),
+        Index("ix_trips_driver_created", "driver_id", "created_at"),
+        Index("ix_trips_created", "created_at"),
+        # Archiving deletes the oldest trips, often the highest ids too; ids must never be
+        # handed out again, since invoices and partitions still refer to the archived ones
+        {"sqlite_autoincrement": True},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     passenger_id = Column(Integer, ForeignKey("passengers.id"), nullable=False)
@@ -61,6 +90,10 @@ class TripModel(Base):
     distance_km = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime)
+    version = Column(Integer, nullable=False, default=1)
+    pickup_zone = Column(String, index=True)
+    started_at = Column(DateTime)
+    search_radius_km = Column(Float)
     
     passenger = relationship("PassengerModel")
     driver = relationship("DriverModel")
@@ -70,10 +103,47 @@ class InvoiceModel(Base):
     __tablename__ = "invoices"
     
     id = Column(Integer, primary_key=True, index=True)
-    trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False)
+    # No foreign key: archiving moves settled trips out of `trips` into their
+    # monthly partition under the same id, and the invoice must stay valid
+    trip_id = Column(Integer, nullable=False, index=True)
     amount = Column(DECIMAL(10, 2), nullable=False)
     tax_amount = Column(DECIMAL(10, 2), nullable=False)
     total_amount = Column(DECIMAL(10, 2), nullable=False)
     issued_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ChangeEventModel(Base):
+    """Transactional outbox of driver/trip changes, consumed by every worker's change feed"""
+    __tablename__ = "change_events"
+    # Ids are never reused once pruned, so a saved cursor always means the same position
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class TableVersionModel(Base):
+    """One shard of a per-table change counter; a write bumps one shard, the counter is their sum"""
+    __tablename__ = "table_versions"
+    
+    name = Column(String, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class LocationTrailChunkModel(Base):
+    """Compressed run of one driver's location pings (see app/domain/trail.py for the encoding)"""
+    __tablename__ = "location_trail_chunks"
+    __table_args__ = (
+        Index("ix_location_trail_chunks_driver_started", "driver_id", "started_at"),
+    )
     
-    trip = relationship("TripModel")
\ No newline at end of file
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    driver_id = Column(Integer, nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    ended_at = Column(DateTime, nullable=False)
+    point_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
@@ -0,0 +1,86 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .models import Base
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class QueryStats:
+    """SQL work done inside a track_queries() block.
+
+    rows counts ORM instances loaded plus rows changed by INSERT/UPDATE/DELETE;
+    column-only SELECTs are not counted as rows.
+    """
+    statements: int = 0
+    rows: int = 0
+    lazy_loads: int = 0
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count statements issued by this context (request, test) on any engine"""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def untracked() -> Iterator[None]:
+    """Exclude housekeeping queries (e.g. health checks) from the current stats"""
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        if cursor.rowcount > 0 and not statement.lstrip().upper().startswith("SELECT"):
+            stats.rows += cursor.rowcount
+
+
+def _on_load(target, context) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += 1
+
+
+def _on_orm_execute(orm_execute_state: ORMExecuteState) -> None:
+    if not orm_execute_state.is_relationship_load:
+        return
+    stats = _current.get()
+    if stats is not None:
+        stats.lazy_loads += 1
+    logger.warning("Relationship load issued a query: %s", orm_execute_state.loader_strategy_path)
+
+
+_installed = False
+
+
+def install_query_tracking() -> None:
+    """Register the engine and ORM event hooks once per process"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Session, "do_orm_execute", _on_orm_execute)
+    event.listen(Base, "load", _on_load, propagate=True)
+    _installed = True
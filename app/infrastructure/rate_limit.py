@@ -0,0 +1,237 @@
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+
+class RateLimitBackend(ABC):
+    blocking = False  # whether acquire() does I/O and must run off the event loop
+
+    @abstractmethod
+    def acquire(self, key: str, rate: float, burst: float, now: Optional[float] = None) -> float:
+        """Take one token from the bucket for key.
+
+        Returns 0 when the request is allowed, otherwise the number of seconds
+        until a token becomes available.
+        """
+        pass
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+
+def _refill(tokens: float, updated_at: float, rate: float, burst: float, now: float) -> float:
+    return min(burst, tokens + (now - updated_at) * rate)
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Token buckets kept in-process, in least-recently-used order.
+
+    A bucket that has been idle long enough to refill completely is
+    indistinguishable from a new one, so idle buckets are dropped from the
+    front of the LRU list. Memory stays proportional to active clients.
+    """
+
+    def __init__(self, idle_ttl_seconds: float):
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str, rate: float, burst: float, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._evict(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket(burst, now)
+            else:
+                bucket.tokens = _refill(bucket.tokens, bucket.updated_at, rate, burst, now)
+                bucket.updated_at = now
+                self._buckets.move_to_end(key)
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return 0.0
+            return (1 - bucket.tokens) / rate
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.idle_ttl_seconds
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket.updated_at > cutoff:
+                break
+            del self._buckets[key]
+
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """Token buckets in a SQLite file shared by every worker on the host.
+
+    Stands in for a networked store such as Redis: every acquire is one short
+    write transaction, so all processes see the same buckets. Timestamps use
+    wall-clock time because monotonic clocks are not comparable across processes.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, idle_ttl_seconds: float):
+        self.path = path
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._local = threading.local()
+        self._last_purge = 0.0
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_updated_at ON rate_limit_buckets (updated_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            import sqlite3  # only needed when the shared backend is configured
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, key: str, rate: float, burst: float, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = burst if row is None else _refill(row[0], row[1], rate, burst, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            if now - self._last_purge >= self.idle_ttl_seconds:
+                conn.execute("DELETE FROM rate_limit_buckets WHERE updated_at < ?", (now - self.idle_ttl_seconds,))
+                self._last_purge = now
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return 0.0 if allowed else (1 - tokens) / rate
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit driven by how long requests wait for a slot.
+
+    Requests over the limit queue for up to max_queue_wait_seconds and are
+    shed after that. The limit is adjusted once per round trip (the smoothed
+    request latency, and no shorter than the queueing target): it shrinks by
+    10% if any request admitted in that window waited longer than the target,
+    so a burst of slow admissions counts as one congestion signal, and grows by
+    one otherwise. High-priority requests may additionally use a reserved
+    headroom so that trip creation and completion keep working while search
+    traffic is being shed.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        high_priority_reserve: int,
+        queue_delay_target_seconds: float,
+        max_queue_wait_seconds: float = 0.0,
+        smoothing: float = 0.2,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.high_priority_reserve = high_priority_reserve
+        self.queue_delay_target_seconds = queue_delay_target_seconds
+        self.max_queue_wait_seconds = max_queue_wait_seconds
+        self.smoothing = smoothing
+        self.clock = clock
+        self.in_flight = 0
+        self.latency_ewma = 0.0
+        self.shed_count = 0
+        self._window_start = clock()
+        self._window_congested = False
+        # One line per priority, so high-priority requests never wait behind shed-able ones
+        self._waiters: Dict[bool, Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {False: deque(), True: deque()}
+        self._lock = threading.Lock()
+
+    def _has_slot(self, high_priority: bool) -> bool:
+        return self.in_flight < int(self.limit) + (self.high_priority_reserve if high_priority else 0)
+
+    async def acquire(self, high_priority: bool = False) -> bool:
+        """Take a slot, waiting in line for up to max_queue_wait_seconds; False when shed"""
+        started = self.clock()
+        with self._lock:
+            waiters = self._waiters[high_priority]
+            if not waiters and self._has_slot(high_priority):
+                self.in_flight += 1
+                self._observe_queue_delay(0.0)
+                return True
+            if self.max_queue_wait_seconds <= 0:
+                self.shed_count += 1
+                return False
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), self.max_queue_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as error:
+            with self._lock:
+                granted = waiter not in waiters
+                if not granted:
+                    waiters.remove(waiter)
+                    self.shed_count += isinstance(error, asyncio.TimeoutError)
+            if isinstance(error, asyncio.CancelledError):
+                if granted:
+                    self.release()  # the slot arrived as the client went away; pass it on
+                raise
+            if not granted:
+                return False
+        with self._lock:
+            self._observe_queue_delay(self.clock() - started)
+        return True
+
+    def release(self, latency_seconds: Optional[float] = None) -> None:
+        """Free a slot and hand it to the longest waiting request that fits; latency is the request's round trip"""
+        with self._lock:
+            self.in_flight -= 1
+            if latency_seconds is not None:
+                self.latency_ewma += self.smoothing * (latency_seconds - self.latency_ewma)
+            for high_priority in (True, False):
+                waiters = self._waiters[high_priority]
+                while waiters and self._has_slot(high_priority):
+                    loop, future = waiters.popleft()
+                    self.in_flight += 1
+                    loop.call_soon_threadsafe(_grant, future)
+
+    def _observe_queue_delay(self, delay_seconds: float) -> None:
+        # Called with the lock held
+        self._window_congested |= delay_seconds > self.queue_delay_target_seconds
+        now = self.clock()
+        if now - self._window_start < max(self.latency_ewma, self.queue_delay_target_seconds):
+            return
+        if self._window_congested:
+            self.limit = max(self.min_limit, self.limit * 0.9)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1)
+        self._window_start = now
+        self._window_congested = False
+
+
+def _grant(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
@@ -1,11 +1,43 @@
-from typing import List, Optional
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, FrozenSet, Iterator, List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import String, and_, bindparam, cast, func, literal_column, select, tuple_, union_all, update
 
-from ..domain.entities import Driver, Passenger, Trip, Invoice, Location, DriverStatus, TripStatus
+from ..domain.billing import StoredInvoice
+from ..domain.entities import Driver, Passenger, Trip, Invoice, Location, DriverStatus, TripStatus, TripHistoryQuery
 from ..domain.repositories import DriverRepository, PassengerRepository, TripRepository, InvoiceRepository
-from ..domain.services import find_drivers_within_radius
+from ..domain.services import find_closest_drivers, find_drivers_within_radius
+from ..domain.spatial import bounding_box
+from ..domain.exceptions import ConcurrencyConflictError
 from .models import DriverModel, PassengerModel, TripModel, InvoiceModel, DriverStatusEnum, TripStatusEnum
+from .change_feed import record_driver_change, record_trip_change
+from .trip_partitions import existing_partitions, partition_bounds, partition_table
+from .unit_of_work import commit, rollback
+from . import table_versions  # noqa: F401  registers the per-table change counters
+
+
+def _compare_and_swap(db: Session, model_class, entity_id: int, expected_version: Optional[int], values: dict):
+    """Update a versioned row only if it still has the expected version.
+    
+    Returns the updated model (via RETURNING) without committing, or None when
+    the row does not exist. An entity without a version (never read from the
+    database) is written unconditionally. Inside a unit of work a conflict
+    leaves the rollback to the unit.
+    """
+    statement = update(model_class).where(model_class.id == entity_id)
+    if expected_version is not None:
+        statement = statement.where(model_class.version == expected_version)
+    statement = statement.values(version=model_class.version + 1, **values).returning(model_class)
+    
+    model = db.execute(statement.execution_options(populate_existing=True)).scalar_one_or_none()
+    if model is None:
+        rollback(db)
+        if expected_version is not None and db.query(model_class.id).filter(model_class.id == entity_id).first():
+            raise ConcurrencyConflictError(
+                f"{model_class.__tablename__} row {entity_id} was modified concurrently"
+            )
+    return model
 
 
 class SQLDriverRepository(DriverRepository):
@@ -26,7 +58,8 @@ class SQLDriverRepository(DriverRepository):
             status=DriverStatus(model.status.value),
             current_location=location,
             created_at=model.created_at,
-            updated_at=model.updated_at
+            updated_at=model.updated_at,
+            version=model.version
         )
     
     def get_all(self) -> List[Driver]:
@@ -37,6 +70,13 @@ class SQLDriverRepository(DriverRepository):
         model = self.db.query(DriverModel).filter(DriverModel.id == driver_id).first()
         return self._to_entity(model) if model else None
     
+    def get_by_ids(self, driver_ids: List[int], batch_size: int = 500) -> List[Driver]:
+        drivers = []
+        for start in range(0, len(driver_ids), batch_size):
+            batch = driver_ids[start:start + batch_size]
+            drivers.extend(self._to_entity(model) for model in self.db.query(DriverModel).filter(DriverModel.id.in_(batch)))
+        return drivers
+    
     def get_available(self) -> List[Driver]:
         models = self.db.query(DriverModel).filter(
             DriverModel.status == DriverStatusEnum.AVAILABLE
@@ -44,8 +84,17 @@ class SQLDriverRepository(DriverRepository):
         return [self._to_entity(model) for model in models]
     
     def get_available_within_radius(self, location: Location, radius_km: float) -> List[Driver]:
-        available_drivers = self.get_available()
-        return find_drivers_within_radius(available_drivers, location, radius_km)
+        # Only rows in the radius' bounding box are loaded (ix_drivers_status_latitude)
+        min_lat, max_lat, min_lon, max_lon = bounding_box(location, radius_km)
+        models = self.db.query(DriverModel).filter(
+            DriverModel.status == DriverStatusEnum.AVAILABLE,
+            DriverModel.latitude.between(min_lat, max_lat),
+            DriverModel.longitude.between(min_lon, max_lon)
+        ).all()
+        return find_drivers_within_radius([self._to_entity(model) for model in models], location, radius_km)
+    
+    def get_closest_available(self, location: Location, limit: int) -> List[Driver]:
+        return find_closest_drivers(self.get_available(), location, limit)
     
     def create(self, driver: Driver) -> Driver:
         model = DriverModel(
@@ -58,25 +107,119 @@ class SQLDriverRepository(DriverRepository):
             longitude=driver.current_location.longitude if driver.current_location else None
         )
         self.db.add(model)
-        self.db.commit()
-        self.db.refresh(model)
-        return self._to_entity(model)
+        self.db.flush()
+        created = self._to_entity(model)
+        record_driver_change(self.db, created)
+        commit(self.db)
+        return created
     
     def update(self, driver: Driver) -> Driver:
-        model = self.db.query(DriverModel).filter(DriverModel.id == driver.id).first()
-        if model:
-            model.name = driver.name
-            model.email = driver.email
-            model.phone = driver.phone
-            model.license_number = driver.license_number
-            model.status = DriverStatusEnum(driver.status.value)
-            if driver.current_location:
-                model.latitude = driver.current_location.latitude
-                model.longitude = driver.current_location.longitude
-            self.db.commit()
-            self.db.refresh(model)
-            return self._to_entity(model)
-        return driver
+        """Compare-and-swap update; raises ConcurrencyConflictError if the row changed since it was read"""
+        values = dict(
+            name=driver.name,
+            email=driver.email,
+            phone=driver.phone,
+            license_number=driver.license_number,
+            status=DriverStatusEnum(driver.status.value)
+        )
+        if driver.current_location:
+            values.update(latitude=driver.current_location.latitude, longitude=driver.current_location.longitude)
+        
+        model = _compare_and_swap(self.db, DriverModel, driver.id, driver.version, values)
+        if model is None:
+            return driver
+        updated = self._to_entity(model)
+        record_driver_change(self.db, updated)
+        commit(self.db)
+        return updated
+    
+    def update_status_if(self, driver_id: int, expected: DriverStatus, status: DriverStatus) -> Optional[Driver]:
+        # One conditional UPDATE ... RETURNING instead of a read followed by a compare-and-swap
+        statement = update(DriverModel).where(
+            DriverModel.id == driver_id, DriverModel.status == DriverStatusEnum(expected.value)
+        ).values(status=DriverStatusEnum(status.value), version=DriverModel.version + 1).returning(DriverModel)
+        model = self.db.execute(statement.execution_options(populate_existing=True)).scalar_one_or_none()
+        if model is None:
+            rollback(self.db)
+            return None
+        updated = self._to_entity(model)
+        record_driver_change(self.db, updated)
+        commit(self.db)
+        return updated
+    
+    def record_heartbeats(self, last_seen: Dict[int, datetime]) -> None:
+        """Write last-seen times in one executemany; liveness does not bump the version"""
+        if not last_seen:
+            return
+        table = DriverModel.__table__
+        statement = update(table).where(table.c.id == bindparam("driver_id")).values(
+            last_seen_at=bindparam("seen_at"),
+            updated_at=table.c.updated_at  # keep the onupdate timestamp for real changes
+        )
+        self.db.execute(
+            statement.execution_options(bump_table_version=False),
+            [{"driver_id": driver_id, "seen_at": seen_at} for driver_id, seen_at in last_seen.items()]
+        )
+        commit(self.db)
+    
+    def get_stale_last_seen(self, driver_ids: List[int], seen_before: datetime) -> Dict[int, datetime]:
+        """Last-seen times of the given drivers last heard from before seen_before"""
+        rows = self.db.execute(
+            select(DriverModel.id, DriverModel.last_seen_at).where(
+                DriverModel.id.in_(driver_ids), DriverModel.last_seen_at < seen_before
+            )
+        )
+        return {driver_id: seen_at for driver_id, seen_at in rows}
+    
+    def mark_offline_if_stale(self, driver_ids: List[int], seen_before: datetime) -> List[Driver]:
+        """Flip AVAILABLE drivers whose last heartbeat is older than seen_before to OFFLINE"""
+        statement = update(DriverModel).where(
+            DriverModel.id.in_(driver_ids),
+            DriverModel.status == DriverStatusEnum.AVAILABLE,
+            DriverModel.last_seen_at < seen_before
+        ).values(status=DriverStatusEnum.OFFLINE, version=DriverModel.version + 1).returning(DriverModel)
+        models = self.db.execute(statement.execution_options(populate_existing=True)).scalars().all()
+        drivers = [self._to_entity(model) for model in models]
+        for driver in drivers:
+            record_driver_change(self.db, driver)
+        commit(self.db)
+        return drivers
+
+
+class PostGISDriverRepository(SQLDriverRepository):
+    """Driver repository for PostgreSQL with PostGIS: spatial queries run in the database.
+    
+    They use the generated `drivers.location` geography column and its GiST
+    index; distances are on the sphere, like the Haversine formula.
+    """
+    
+    location = literal_column("drivers.location")
+    
+    @staticmethod
+    def _point(location: Location):
+        return func.geography(func.ST_SetSRID(func.ST_MakePoint(location.longitude, location.latitude), 4326))
+    
+    def get_available_within_radius(self, location: Location, radius_km: float) -> List[Driver]:
+        models = self.db.query(DriverModel).filter(
+            DriverModel.status == DriverStatusEnum.AVAILABLE,
+            func.ST_DWithin(self.location, self._point(location), radius_km * 1000, False)
+        ).order_by(DriverModel.id).all()
+        return [self._to_entity(model) for model in models]
+    
+    def get_closest_available(self, location: Location, limit: int) -> List[Driver]:
+        # ORDER BY <-> ... LIMIT is a nearest-neighbour scan of the GiST index
+        models = self.db.query(DriverModel).filter(
+            DriverModel.status == DriverStatusEnum.AVAILABLE,
+            self.location.isnot(None)
+        ).order_by(self.location.op("<->")(self._point(location))).limit(limit).all()
+        return [self._to_entity(model) for model in models]
+
+
+def driver_repository(db: Session) -> SQLDriverRepository:
+    """The driver repository for the session's database, chosen by its URL scheme"""
+    if db.get_bind().url.get_backend_name() == "postgresql":
+        return PostGISDriverRepository(db)
+    return SQLDriverRepository(db)
 
 
 class SQLPassengerRepository(PassengerRepository):
@@ -108,9 +251,10 @@ class SQLPassengerRepository(PassengerRepository):
             phone=passenger.phone
         )
         self.db.add(model)
-        self.db.commit()
-        self.db.refresh(model)
-        return self._to_entity(model)
+        self.db.flush()
+        created = self._to_entity(model)
+        commit(self.db)
+        return created
 
 
 class SQLTripRepository(TripRepository):
@@ -136,18 +280,35 @@ class SQLTripRepository(TripRepository):
             fare=model.fare,
             distance_km=model.distance_km,
             created_at=model.created_at,
-            completed_at=model.completed_at
+            completed_at=model.completed_at,
+            version=model.version,
+            pickup_zone=model.pickup_zone,
+            started_at=model.started_at,
+            search_radius_km=model.search_radius_km
         )
     
     def get_all_active(self) -> List[Trip]:
         models = self.db.query(TripModel).filter(
-            TripModel.status.in_([TripStatusEnum.REQUESTED, TripStatusEnum.IN_PROGRESS])
+            TripModel.status.in_([TripStatusEnum.REQUESTED, TripStatusEnum.ACCEPTED, TripStatusEnum.IN_PROGRESS])
         ).all()
         return [self._to_entity(model) for model in models]
     
     def get_by_id(self, trip_id: int) -> Optional[Trip]:
+        """Trip by id from `trips`, or from the monthly partitions once it has been archived"""
         model = self.db.query(TripModel).filter(TripModel.id == trip_id).first()
-        return self._to_entity(model) if model else None
+        if model is not None:
+            return self._to_entity(model)
+        partitions = [partition_table(name) for name in existing_partitions(self.db)]
+        if not partitions:
+            return None
+        row = self.db.execute(
+            union_all(*(select(table).where(table.c.id == trip_id) for table in partitions)).limit(1)
+        ).first()
+        return self._to_entity(row) if row else None
+    
+    def get_by_status(self, status: TripStatus) -> List[Trip]:
+        models = self.db.query(TripModel).filter(TripModel.status == TripStatusEnum(status.value)).all()
+        return [self._to_entity(model) for model in models]
     
     def create(self, trip: Trip) -> Trip:
         model = TripModel(
@@ -159,28 +320,104 @@ class SQLTripRepository(TripRepository):
             destination_longitude=trip.destination_location.longitude if trip.destination_location else None,
             status=TripStatusEnum(trip.status.value),
             fare=trip.fare,
-            distance_km=trip.distance_km
+            distance_km=trip.distance_km,
+            pickup_zone=trip.pickup_zone,
+            search_radius_km=trip.search_radius_km
         )
         self.db.add(model)
-        self.db.commit()
-        self.db.refresh(model)
-        return self._to_entity(model)
+        self.db.flush()
+        created = self._to_entity(model)
+        record_trip_change(self.db, created)
+        commit(self.db)
+        return created
     
     def update(self, trip: Trip) -> Trip:
-        model = self.db.query(TripModel).filter(TripModel.id == trip.id).first()
-        if model:
-            model.driver_id = trip.driver_id
-            model.status = TripStatusEnum(trip.status.value)
-            model.fare = trip.fare
-            model.distance_km = trip.distance_km
-            model.completed_at = trip.completed_at
-            if trip.destination_location:
-                model.destination_latitude = trip.destination_location.latitude
-                model.destination_longitude = trip.destination_location.longitude
-            self.db.commit()
-            self.db.refresh(model)
-            return self._to_entity(model)
-        return trip
+        """Compare-and-swap update; raises ConcurrencyConflictError if the row changed since it was read"""
+        values = dict(
+            driver_id=trip.driver_id,
+            status=TripStatusEnum(trip.status.value),
+            fare=trip.fare,
+            distance_km=trip.distance_km,
+            started_at=trip.started_at,
+            completed_at=trip.completed_at,
+            search_radius_km=trip.search_radius_km
+        )
+        if trip.destination_location:
+            values.update(
+                destination_latitude=trip.destination_location.latitude,
+                destination_longitude=trip.destination_location.longitude
+            )
+        
+        model = _compare_and_swap(self.db, TripModel, trip.id, trip.version, values)
+        if model is None:
+            return trip
+        updated = self._to_entity(model)
+        record_trip_change(self.db, updated)
+        commit(self.db)
+        return updated
+    
+    def update_status_if(
+        self, trip_id: int, expected: FrozenSet[TripStatus], status: TripStatus, started_at: Optional[datetime] = None
+    ) -> Optional[Trip]:
+        # One conditional UPDATE ... RETURNING instead of a read followed by a compare-and-swap;
+        # archived trips are all terminal, so only `trips` can match
+        values = dict(status=TripStatusEnum(status.value), version=TripModel.version + 1)
+        if started_at is not None:
+            values.update(started_at=started_at)
+        statement = update(TripModel).where(
+            TripModel.id == trip_id, TripModel.status.in_([TripStatusEnum(current.value) for current in expected])
+        ).values(**values).returning(TripModel)
+        model = self.db.execute(statement.execution_options(populate_existing=True)).scalar_one_or_none()
+        if model is None:
+            rollback(self.db)
+            return None
+        updated = self._to_entity(model)
+        record_trip_change(self.db, updated)
+        commit(self.db)
+        return updated
+    
+    @staticmethod
+    def _history_statement(table, query: TripHistoryQuery):
+        columns = table.c
+        statement = select(table)
+        if query.passenger_id is not None:
+            statement = statement.where(columns.passenger_id == query.passenger_id)
+        if query.driver_id is not None:
+            statement = statement.where(columns.driver_id == query.driver_id)
+        if query.start is not None:
+            statement = statement.where(columns.created_at >= query.start)
+        if query.end is not None:
+            statement = statement.where(columns.created_at < query.end)
+        if query.before is not None:
+            statement = statement.where(
+                tuple_(columns.created_at, columns.id) < tuple_(query.before.created_at, query.before.trip_id)
+            )
+        return statement.order_by(columns.created_at.desc(), columns.id.desc()).limit(query.limit)
+    
+    def get_history(self, query: TripHistoryQuery) -> List[Trip]:
+        """Keyset page over `trips` plus the monthly partitions that can still contribute.
+        
+        Partitions are visited newest first and the walk stops as soon as the
+        page is full of trips newer than the next partition, so a page costs a
+        few index range scans however deep the history goes.
+        """
+        rows = list(self.db.execute(self._history_statement(TripModel.__table__, query)))
+        newest = min(
+            (moment for moment in (query.end, query.before and query.before.created_at) if moment is not None),
+            default=None
+        )
+        for name in existing_partitions(self.db):
+            month_start, month_end = partition_bounds(name)
+            if newest is not None and month_start > newest:
+                continue
+            if query.start is not None and month_end <= query.start:
+                break
+            if len(rows) >= query.limit and rows[query.limit - 1].created_at >= month_end:
+                break
+            rows.extend(self.db.execute(self._history_statement(partition_table(name), query)))
+            rows.sort(key=lambda row: (row.created_at, row.id), reverse=True)
+            del rows[query.limit:]
+        return [self._to_entity(row) for row in rows]
 
 
 class SQLInvoiceRepository(InvoiceRepository):
@@ -209,6 +446,33 @@ class SQLInvoiceRepository(InvoiceRepository):
             total_amount=invoice.total_amount
         )
         self.db.add(model)
-        self.db.commit()
-        self.db.refresh(model)
-        return self._to_entity(model)
\ No newline at end of file
+        self.db.flush()
+        created = self._to_entity(model)
+        commit(self.db)
+        return created
+    
+    def iter_stored(self, batch_size: int) -> Iterator[List[StoredInvoice]]:
+        # Read as text: the Numeric type would round to the column scale and hide unrounded values
+        query = (
+            select(
+                InvoiceModel.id, InvoiceModel.trip_id, cast(TripModel.fare, String),
+                cast(InvoiceModel.amount, String), cast(InvoiceModel.tax_amount, String),
+                cast(InvoiceModel.total_amount, String)
+            )
+            .outerjoin(TripModel, TripModel.id == InvoiceModel.trip_id)
+            .order_by(InvoiceModel.id)
+            .limit(batch_size)
+        )
+        last_id = 0
+        while True:
+            rows = self.db.execute(query.where(InvoiceModel.id > last_id)).all()
+            if not rows:
+                return
+            yield [
+                StoredInvoice(
+                    invoice_id, trip_id, None if fare is None else Decimal(fare),
+                    Decimal(amount), Decimal(tax_amount), Decimal(total_amount)
+                )
+                for invoice_id, trip_id, fare, amount, tax_amount, total_amount in rows
+            ]
+            last_id = rows[-1][0]
\ No newline at end of file
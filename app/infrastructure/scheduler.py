@@ -0,0 +1,121 @@
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional
+
+from ..domain.trip_state import TripTimeouts
+
+logger = logging.getLogger(__name__)
+
+
+class TimingWheel:
+    """Hashed timing wheel.
+
+    Timers hash into one of wheel_size slots by their deadline tick. Within a
+    slot they are bucketed by revolution, so scheduling and cancelling are
+    O(1) and a tick pops only the bucket due now: timers one or more
+    revolutions away are never visited before their deadline.
+    """
+
+    def __init__(self, tick_seconds: float, wheel_size: int, start: Optional[float] = None):
+        self.tick_seconds = tick_seconds
+        self.wheel_size = wheel_size
+        # slot -> revolution -> keys (a dict keeps them in scheduling order)
+        self.slots: List[Dict[int, Dict[Hashable, None]]] = [{} for _ in range(wheel_size)]
+        self._deadline_of: Dict[Hashable, int] = {}
+        self._start = time.monotonic() if start is None else start
+        self.current_tick = 0
+
+    def __len__(self) -> int:
+        return len(self._deadline_of)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadline_of
+
+    def schedule(self, key: Hashable, delay_seconds: float) -> None:
+        """Schedule key to expire after delay_seconds, replacing any existing timer"""
+        self.cancel(key)
+        deadline_tick = self.current_tick + max(1, math.ceil(delay_seconds / self.tick_seconds))
+        revolution, slot = divmod(deadline_tick, self.wheel_size)
+        self.slots[slot].setdefault(revolution, {})[key] = None
+        self._deadline_of[key] = deadline_tick
+
+    def cancel(self, key: Hashable) -> bool:
+        deadline_tick = self._deadline_of.pop(key, None)
+        if deadline_tick is None:
+            return False
+        revolution, slot = divmod(deadline_tick, self.wheel_size)
+        bucket = self.slots[slot][revolution]
+        del bucket[key]
+        if not bucket:
+            del self.slots[slot][revolution]
+        return True
+
+    def advance(self, now: Optional[float] = None) -> List[Hashable]:
+        """Advance the wheel to now and return the keys that expired"""
+        now = time.monotonic() if now is None else now
+        target_tick = int((now - self._start) / self.tick_seconds)
+        expired = []
+        while self.current_tick < target_tick:
+            self.current_tick += 1
+            revolution, slot = divmod(self.current_tick, self.wheel_size)
+            due = self.slots[slot].pop(revolution, None)
+            if due:
+                for key in due:
+                    del self._deadline_of[key]
+                expired.extend(due)
+        return expired
+
+
+class TripTimeoutScheduler(TripTimeouts):
+    """Drives a TimingWheel from a background thread and fires acceptance timeouts"""
+
+    def __init__(
+        self,
+        timeout_seconds: float,
+        tick_seconds: float,
+        wheel_size: int,
+        on_timeout: Callable[[int], None]
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.on_timeout = on_timeout
+        self.wheel = TimingWheel(tick_seconds, wheel_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, trip_id: int) -> None:
+        with self._lock:
+            self.wheel.schedule(trip_id, self.timeout_seconds)
+
+    def cancel(self, trip_id: int) -> None:
+        with self._lock:
+            self.wheel.cancel(trip_id)
+
+    def run_pending(self, now: Optional[float] = None) -> List[int]:
+        with self._lock:
+            expired = self.wheel.advance(now)
+        # Callbacks run outside the lock; they typically reschedule or cancel
+        for trip_id in expired:
+            try:
+                self.on_timeout(trip_id)
+            except Exception:
+                logger.exception("Acceptance timeout handling failed for trip %s", trip_id)
+        return expired
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="trip-timeouts", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.wheel.tick_seconds):
+            self.run_pending()
@@ -1,15 +1,15 @@
+from sqlalchemy import or_, select
 from sqlalchemy.orm import Session
-from .database import SessionLocal, create_tables
+from .database import create_tables, current_session_factory
 from .models import DriverModel, PassengerModel, DriverStatusEnum
 
 
 def create_sample_data():
-    create_tables()
-    
-    db = SessionLocal()
+    """Load sample drivers and passengers; expects the schema to exist (see create_tables)"""
+    db = current_session_factory()()
     try:
-        # Check if data already exists
-        if db.query(DriverModel).first() or db.query(PassengerModel).first():
+        # Check if data already exists, in a single round trip
+        if db.scalar(select(or_(select(DriverModel.id).exists(), select(PassengerModel.id).exists()))):
             return
         
         # Create sample drivers
@@ -103,4 +103,5 @@ def create_sample_data():
 
 
 if __name__ == "__main__":
+    create_tables()
     create_sample_data()
\ No newline at end of file
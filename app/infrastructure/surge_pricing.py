@@ -0,0 +1,56 @@
+import logging
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from ..domain.pricing import SurgePricingEngine
+from .repositories import SQLDriverRepository
+
+logger = logging.getLogger(__name__)
+
+
+class SurgePricingRefresher:
+    """Background thread ticking the surge tables, so quotes never load drivers.
+
+    Every tick interval the available drivers are loaded once and the
+    multiplier table is rebuilt; quotes only read the current table.
+    """
+
+    def __init__(self, pricing_engine: SurgePricingEngine, session_factory: Callable[[], Session]):
+        self.pricing_engine = pricing_engine
+        self.session_factory = session_factory
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def run_once(self) -> bool:
+        db = self.session_factory()
+        try:
+            return self.pricing_engine.refresh_if_due(SQLDriverRepository(db).get_available)
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="surge-pricing-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Surge pricing refresh failed")
+            if self._stop.wait(self.pricing_engine.tick_seconds):
+                return
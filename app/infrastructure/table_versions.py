@@ -0,0 +1,74 @@
+import random
+from typing import Dict, Iterable, Set
+
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .models import Base, ChangeEventModel, LocationTrailChunkModel, TableVersionModel
+
+# Written on every change already, append-only, or bookkeeping only
+UNVERSIONED_TABLES = {
+    ChangeEventModel.__tablename__, LocationTrailChunkModel.__tablename__, TableVersionModel.__tablename__
+}
+
+# Each commit bumps one random shard of its tables' counters, so concurrent writers to the
+# same table rarely wait on the same counter row; a counter only grows, so its sum does too
+COUNTER_SHARDS = 16
+
+_DIRTY_TABLES = "dirty_tables"
+
+
+def table_versions(db: Session, tables: Iterable[str]) -> Dict[str, int]:
+    """Current change counters of the given tables: one Core query, no ORM loading"""
+    rows = db.execute(
+        select(TableVersionModel.name, func.sum(TableVersionModel.version))
+        .where(TableVersionModel.name.in_(tables))
+        .group_by(TableVersionModel.name)
+    )
+    return {name: version for name, version in rows}
+
+
+def _mark_dirty(session: Session, tables: Iterable[str]) -> None:
+    dirty: Set[str] = session.info.setdefault(_DIRTY_TABLES, set())
+    dirty.update(table for table in tables if table not in UNVERSIONED_TABLES)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context) -> None:
+    _mark_dirty(session, (
+        obj.__table__.name for obj in (*session.new, *session.dirty, *session.deleted) if hasattr(obj, "__table__")
+    ))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_orm_execute(orm_execute_state: ORMExecuteState) -> None:
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    # Writes that do not change any API representation (e.g. heartbeats) opt out
+    if orm_execute_state.execution_options.get("bump_table_version", True):
+        _mark_dirty(orm_execute_state.session, (orm_execute_state.statement.table.name,))
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session: Session) -> None:
+    session.flush()
+    tables = session.info.pop(_DIRTY_TABLES, None)
+    if tables:
+        session.execute(
+            update(TableVersionModel)
+            .where(TableVersionModel.name.in_(sorted(tables)), TableVersionModel.shard == random.randrange(COUNTER_SHARDS))
+            .values(version=TableVersionModel.version + 1)
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_TABLES, None)
+
+
+@event.listens_for(TableVersionModel.__table__, "after_create")
+def _create_counters(target, connection, **kw) -> None:
+    names = sorted(set(Base.metadata.tables) - UNVERSIONED_TABLES)
+    connection.execute(insert(TableVersionModel), [
+        {"name": name, "shard": shard, "version": 0} for name in names for shard in range(COUNTER_SHARDS)
+    ])
@@ -0,0 +1,355 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..application.services import TripService
+from ..core.config import Settings, use_city_settings
+from ..domain.pricing import SurgePricingEngine
+from ..domain.zones import ZoneIndex, parse_geojson_zones
+from .change_feed import ChangeFeedPoller
+from .database import DatabaseBinding, ReplicaPool, SessionLocal, bind_database, open_database, replica_pool
+from .degradation import DriverSnapshotRefresher, LatencySLOController
+from .demand_forecast import DemandForecastFile
+from .fleet_state import FleetState
+from .fleet_state_file import FleetStateWriter, restore_fleet_state
+from .heartbeats import HeartbeatMonitor, HeartbeatTracker
+from .idempotency import IdempotencyStore
+from .location_trail import LocationTrailFlusher, LocationTrailStore
+from .models import Base
+from .scheduler import TripTimeoutScheduler
+from .surge_pricing import SurgePricingRefresher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ZONES_PATH = Path(__file__).resolve().parent.parent / "data" / "zones.geojson"
+
+
+def load_zone_index(path: str) -> ZoneIndex:
+    with open(path, encoding="utf-8") as f:
+        return ZoneIndex(parse_geojson_zones(json.load(f)))
+
+
+_active_tenant: ContextVar[Optional["Tenant"]] = ContextVar("tenant", default=None)
+
+
+def active_tenant() -> Optional["Tenant"]:
+    return _active_tenant.get()
+
+
+class Tenant:
+    """One city's settings, database and in-memory dispatch state.
+
+    The process default (city None) uses the process settings and the primary
+    database; every configured city gets its own engine and connection pool,
+    pricing, timeouts, fleet view, heartbeats, trails, idempotency records and
+    degraded-search snapshot, so cities never share a pool or a cache.
+    """
+
+    def __init__(
+        self,
+        city: Optional[str],
+        settings: Settings,
+        build_trip_service: Callable[[Session], TripService],
+        database: Optional[DatabaseBinding] = None
+    ):
+        self.city = city
+        self.settings = settings
+        self.database = database
+        self.session_factory: sessionmaker = database.session_factory if database else SessionLocal
+        self.replicas: ReplicaPool = database.replicas if database else replica_pool
+        self.build_trip_service = build_trip_service
+        self.last_used = time.monotonic()
+        self.active_requests = 0
+        self._zone_index: Optional[ZoneIndex] = None
+
+        # Pricing state shared by trip creation (demand) and quotes
+        self.pricing_engine = SurgePricingEngine(
+            cell_size_km=settings.surge_cell_size_km,
+            window_seconds=settings.surge_window_seconds,
+            tick_seconds=settings.surge_tick_seconds,
+            sensitivity=settings.surge_sensitivity,
+            max_multiplier=settings.surge_max_multiplier
+        )
+        self.surge_pricing_refresher = SurgePricingRefresher(self.pricing_engine, self.session_factory)
+        # Responses recorded for Idempotency-Key retries of trip writes
+        self.idempotency_store = IdempotencyStore(
+            ttl_seconds=settings.idempotency_ttl_seconds,
+            max_entries=settings.idempotency_max_keys,
+            wait_timeout_seconds=settings.idempotency_wait_timeout_seconds
+        )
+        # Acceptance deadlines of REQUESTED trips, driven by a timing wheel
+        self.trip_timeouts = TripTimeoutScheduler(
+            timeout_seconds=settings.trip_acceptance_timeout_seconds,
+            tick_seconds=settings.trip_scheduler_tick_seconds,
+            wheel_size=settings.trip_scheduler_wheel_size,
+            on_timeout=self._expire_trip
+        )
+        # This worker's in-memory view of the fleet, kept current from the change feed
+        self.fleet_state = FleetState()
+        self.change_feed = ChangeFeedPoller(
+            session_factory=self.session_factory,
+            apply=self.fleet_state.apply,
+            poll_interval_seconds=settings.change_feed_poll_interval_seconds,
+            batch_size=settings.change_feed_batch_size,
+            retention_seconds=settings.change_feed_retention_seconds,
+            gap_grace_seconds=settings.change_feed_gap_grace_seconds
+        )
+        self.fleet_state_writer = FleetStateWriter(
+            self.fleet_state, settings.fleet_snapshot_path, settings.fleet_snapshot_interval_seconds,
+            source=settings.database_url
+        )
+        # Driver liveness from app heartbeats; the monitor flushes them and sweeps stale drivers
+        self.heartbeats = HeartbeatTracker(settings.heartbeat_ttl_seconds)
+        self.heartbeat_monitor = HeartbeatMonitor(
+            self.heartbeats, self.session_factory, settings.heartbeat_sweep_interval_seconds
+        )
+        # Driver location pings, appended in memory and flushed as compressed chunks
+        self.location_trail_store = LocationTrailStore(settings.trail_chunk_points, settings.trail_chunk_span_seconds)
+        self.location_trail_flusher = LocationTrailFlusher(
+            self.location_trail_store, self.session_factory, settings.trail_flush_interval_seconds
+        )
+        # Demand forecast fitted offline; workers pick up a new fit when the file is replaced
+        self.demand_forecast_file = DemandForecastFile(settings.demand_forecast_path)
+        # Degraded mode for nearby searches, fed by a periodically refreshed driver snapshot
+        self.nearby_degradation = LatencySLOController(
+            slo_seconds=settings.nearby_latency_slo_seconds,
+            quantile=settings.nearby_latency_quantile,
+            window_seconds=settings.nearby_latency_window_seconds,
+            min_samples=settings.nearby_latency_min_samples,
+            recover_ratio=settings.nearby_recover_ratio,
+            probe_every=settings.nearby_probe_every
+        )
+        self.driver_snapshot_refresher = DriverSnapshotRefresher(
+            self.nearby_degradation, self.session_factory,
+            settings.nearby_snapshot_refresh_seconds, settings.default_search_radius_km,
+            fleet_state=self.fleet_state if settings.change_feed_enabled else None
+        )
+
+    @contextmanager
+    def activate(self) -> Iterator["Tenant"]:
+        """Resolve settings, sessions and dependencies to this tenant in the current context"""
+        with ExitStack() as stack:
+            if self.city is not None:
+                stack.enter_context(use_city_settings(self.settings))
+                stack.enter_context(bind_database(self.database))
+            token = _active_tenant.set(self)
+            try:
+                yield self
+            finally:
+                _active_tenant.reset(token)
+
+    def zone_index(self) -> ZoneIndex:
+        """Service zones, loaded from GeoJSON on first use"""
+        if self._zone_index is None:
+            self._zone_index = load_zone_index(self.settings.zones_geojson_path or str(DEFAULT_ZONES_PATH))
+        return self._zone_index
+
+    def _expire_trip(self, trip_id: int) -> None:
+        with self.activate():
+            db = self.session_factory()
+            try:
+                self.build_trip_service(db).expire_trip(trip_id)
+            finally:
+                db.close()
+
+    def start(self) -> None:
+        """Start the background work this tenant's settings enable"""
+        settings = self.settings
+        self.replicas.start()
+        with self.activate():
+            if settings.trip_scheduler_enabled:
+                db = self.session_factory()
+                try:
+                    self.build_trip_service(db).schedule_pending_timeouts()
+                finally:
+                    db.close()
+                self.trip_timeouts.start()
+            if settings.change_feed_enabled:
+                self.start_change_feed()
+        if settings.heartbeat_enabled:
+            self.heartbeat_monitor.start()
+        if settings.trail_enabled:
+            self.location_trail_flusher.start()
+        if settings.nearby_degradation_enabled:
+            self.driver_snapshot_refresher.start()
+        if settings.surge_refresh_enabled:
+            self.surge_pricing_refresher.start()
+
+    def start_change_feed(self) -> None:
+        """Restore the fleet state (from the snapshot when usable), catch up and tail the change feed."""
+        settings = self.settings
+        db = self.session_factory()
+        try:
+            restored = settings.fleet_snapshot_enabled and restore_fleet_state(
+                self.fleet_state, settings.fleet_snapshot_path, settings.database_url, db
+            )
+            if not restored:
+                self.fleet_state.load(db)
+        finally:
+            db.close()
+        self.change_feed.cursor = self.fleet_state.cursor
+        self.change_feed.poll_once()  # ready only once the deltas since the snapshot are applied
+        self.change_feed.start()
+        if settings.fleet_snapshot_enabled:
+            self.fleet_state_writer.start()
+
+    def stop(self) -> None:
+        """Stop background work, flushing what is buffered, and release the city's connections"""
+        self.surge_pricing_refresher.stop()
+        self.driver_snapshot_refresher.stop()
+        self.location_trail_flusher.stop()
+        self.heartbeat_monitor.stop()
+        self.change_feed.stop()
+        self.fleet_state_writer.stop()
+        self.trip_timeouts.stop()
+        self.replicas.stop()
+        if self.database is not None:
+            self.database.dispose()
+
+
+class UnknownCityError(LookupError):
+    pass
+
+
+class TenantRegistry:
+    """The cities loaded in this process, loaded on first request and unloaded when idle.
+
+    A city unused for idle_ttl_seconds, or the least recently used one beyond
+    max_loaded, is stopped and dropped (its engine disposed), but never while
+    it is serving a request. The default tenant is not managed here.
+
+    A city loads outside the registry lock: concurrent requests for it wait on
+    its loading future, and requests for other cities are not held up.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str], Tenant],
+        idle_ttl_seconds: float,
+        max_loaded: int,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._load = load
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_loaded = max_loaded
+        self._clock = clock
+        self._tenants: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return list(self._tenants)
+
+    def acquire(self, city: str, load: bool = True) -> Optional[Tenant]:
+        """The city's tenant, marked busy until release(); None when not loaded and load is False"""
+        while True:
+            with self._lock:
+                tenant = self._tenants.get(city)
+                if tenant is not None:
+                    return self._check_out(tenant)
+                if not load:
+                    return None
+                loading = self._loading.get(city)
+                if loading is None:
+                    loading = self._loading[city] = Future()
+                    break
+            loading.result()  # another request is loading the city; re-raises its error
+        try:
+            tenant = self._load(city)
+            try:
+                tenant.start()
+            except Exception:
+                tenant.stop()
+                raise
+        except BaseException as error:
+            with self._lock:
+                del self._loading[city]
+            loading.set_exception(error)
+            raise
+        with self._lock:
+            del self._loading[city]
+            self._tenants[city] = tenant
+            tenant = self._check_out(tenant)
+        loading.set_result(tenant)
+        logger.info("Loaded city %s", city)
+        return tenant
+
+    def _check_out(self, tenant: Tenant) -> Tenant:
+        """Mark a loaded tenant busy (lock held) and unload what is now idle or in excess"""
+        self._tenants.move_to_end(tenant.city)
+        tenant.active_requests += 1
+        tenant.last_used = self._clock()
+        evicted = self._evict(tenant.last_used)
+        if evicted:
+            threading.Thread(target=self._stop, args=(evicted,), name="tenant-eviction", daemon=True).start()
+        return tenant
+
+    def release(self, tenant: Tenant) -> None:
+        with self._lock:
+            tenant.active_requests -= 1
+            tenant.last_used = self._clock()
+
+    @contextmanager
+    def use(self, city: str) -> Iterator[Tenant]:
+        tenant = self.acquire(city)
+        try:
+            with tenant.activate():
+                yield tenant
+        finally:
+            self.release(tenant)
+
+    def evict_idle(self) -> List[str]:
+        """Unload idle cities now; returns their names"""
+        with self._lock:
+            evicted = self._evict(self._clock())
+        self._stop(evicted)
+        return [tenant.city for tenant in evicted]
+
+    def stop_all(self) -> None:
+        with self._lock:
+            tenants = list(self._tenants.values())
+            self._tenants.clear()
+        self._stop(tenants)
+
+    def _evict(self, now: float) -> List[Tenant]:
+        excess = len(self._tenants) - self.max_loaded
+        evicted = []
+        for city, tenant in list(self._tenants.items()):  # least recently used first
+            if tenant.active_requests:
+                continue
+            if excess > 0 or now - tenant.last_used >= self.idle_ttl_seconds:
+                del self._tenants[city]
+                evicted.append(tenant)
+                excess -= 1
+        return evicted
+
+    @staticmethod
+    def _stop(tenants: List[Tenant]) -> None:
+        for tenant in tenants:
+            try:
+                tenant.stop()
+            except Exception:
+                logger.exception("Stopping city %s failed", tenant.city)
+            else:
+                logger.info("Unloaded city %s", tenant.city)
+
+
+def load_city(settings: Settings, build_trip_service: Callable[[Session], TripService], city: str) -> Tenant:
+    """Tenant for a configured city, with its own engine; UnknownCityError otherwise"""
+    if city not in settings.cities:
+        raise UnknownCityError(city)
+    config = settings.for_city(city)
+    database = open_database(config)
+    if not config.fast_boot:
+        Base.metadata.create_all(bind=database.engine)
+    return Tenant(city, config, build_trip_service, database)
@@ -0,0 +1,84 @@
+import re
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Column, Index, MetaData, Table, delete, inspect, insert, select
+from sqlalchemy.orm import Session
+
+from .models import TripModel, TripStatusEnum
+
+# Monthly partitions live outside Base.metadata: they are created on demand by the archiver
+archive_metadata = MetaData()
+
+SETTLED_STATUSES = (TripStatusEnum.COMPLETED, TripStatusEnum.CANCELLED)
+_PARTITION_NAME = re.compile(r"^trips_(\d{4})(\d{2})$")
+
+
+def partition_name(moment: datetime) -> str:
+    return f"trips_{moment:%Y%m}"
+
+
+def partition_bounds(name: str) -> Tuple[datetime, datetime]:
+    """[start, end) of the month a partition holds, by created_at"""
+    year, month = (int(part) for part in _PARTITION_NAME.match(name).groups())
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def partition_table(name: str) -> Table:
+    """Table object for one monthly partition; same columns as `trips`, without foreign keys.
+
+    The (passenger_id, created_at) and (driver_id, created_at) indexes also hold
+    the rowid (the trip id), so keyset pages are read straight off the index.
+    """
+    table = archive_metadata.tables.get(name)
+    if table is None:
+        columns = [
+            Column(column.name, column.type, primary_key=column.primary_key, autoincrement=False)
+            for column in TripModel.__table__.columns
+        ]
+        table = Table(
+            name, archive_metadata, *columns,
+            Index(f"ix_{name}_passenger_created", "passenger_id", "created_at"),
+            Index(f"ix_{name}_driver_created", "driver_id", "created_at"),
+            Index(f"ix_{name}_created", "created_at")
+        )
+    return table
+
+
+def existing_partitions(db: Session) -> List[str]:
+    """Names of the monthly partitions in the database, newest first"""
+    names = inspect(db.connection()).get_table_names()
+    return sorted((name for name in names if _PARTITION_NAME.match(name)), reverse=True)
+
+
+def archive_settled_trips(db: Session, created_before: datetime, batch_size: int = 1000) -> int:
+    """Move completed/cancelled trips created before the cutoff into their monthly partitions.
+
+    Each batch is copied and deleted from `trips` in one transaction and keeps
+    its trip ids, so invoices (whose `trip_id` carries no foreign key for this
+    reason) still point at the right trip. Returns the number of trips moved.
+    """
+    trips = TripModel.__table__
+    moved = 0
+    while True:
+        rows = db.execute(
+            select(trips)
+            .where(trips.c.status.in_(SETTLED_STATUSES), trips.c.created_at < created_before)
+            .order_by(trips.c.id)
+            .limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            return moved
+
+        by_partition: Dict[str, List[dict]] = {}
+        for row in rows:
+            by_partition.setdefault(partition_name(row["created_at"]), []).append(dict(row))
+        for name, partition_rows in by_partition.items():
+            table = partition_table(name)
+            table.create(bind=db.connection(), checkfirst=True)
+            db.execute(insert(table), partition_rows)
+        db.execute(delete(trips).where(trips.c.id.in_([row["id"] for row in rows])))
+        db.commit()
+        moved += len(rows)
@@ -0,0 +1,151 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.orm import Session
+
+from ..domain.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DEPTH = "unit_of_work_depth"
+
+
+def in_unit_of_work(db: Session) -> bool:
+    return db.info.get(_DEPTH, 0) > 0
+
+
+def commit(db: Session) -> None:
+    """Repository commit: immediate on its own, deferred to the enclosing unit of work otherwise"""
+    if in_unit_of_work(db):
+        db.flush()
+    else:
+        db.commit()
+
+
+def rollback(db: Session) -> None:
+    """Repository rollback after a write that matched nothing; inside a unit of work the unit decides"""
+    if not in_unit_of_work(db):
+        db.rollback()
+
+
+class SQLUnitOfWork(UnitOfWork):
+    """Unit of work over one session; nested blocks are savepoints"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._savepoints: List = []
+
+    def __enter__(self) -> "SQLUnitOfWork":
+        depth = self.db.info.get(_DEPTH, 0)
+        self._savepoints.append(self.db.begin_nested() if depth else None)
+        self.db.info[_DEPTH] = depth + 1
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        savepoint = self._savepoints.pop()
+        self.db.info[_DEPTH] -= 1
+        if savepoint is None:
+            if exc_type is None:
+                self.db.commit()
+            else:
+                self.db.rollback()
+        elif exc_type is None:
+            savepoint.commit()
+        else:
+            # Also clears a savepoint a failed flush already deactivated
+            savepoint.rollback()
+        return False
+
+
+class GroupCommitter:
+    """Runs write work from concurrent callers on one session and commits it together.
+
+    Callers block in run() until the transaction holding their work has
+    committed, so commit semantics are unchanged; one fsync covers the whole
+    group. Each work item runs in its own savepoint, so a failing item is
+    rolled back alone and its exception is re-raised in its caller.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], max_batch: int = 64, max_wait_seconds: float = 0.002):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_wait_seconds = max_wait_seconds
+        self._queue: "queue.Queue[Optional[Tuple[Callable[[Session], object], Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def run(self, work: Callable[[Session], T]) -> T:
+        self.start()
+        future: Future = Future()
+        self._queue.put((work, future))
+        return future.result()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="group-committer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            if not self._thread:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _next_batch(self) -> Tuple[List[Tuple[Callable[[Session], object], Future]], bool]:
+        """Block for one item, then take whatever else arrives within max_wait_seconds"""
+        item = self._queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=self.max_wait_seconds)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _commit_batch(self, batch: List[Tuple[Callable[[Session], object], Future]]) -> None:
+        db = self.session_factory()
+        outcomes = []
+        try:
+            with SQLUnitOfWork(db) as unit:
+                for work, future in batch:
+                    try:
+                        with unit:
+                            outcomes.append((future, work(db), None))
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+        except Exception as error:
+            # The group's commit failed, so none of its work was kept
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        finally:
+            db.close()
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                try:
+                    self._commit_batch(batch)
+                except Exception:
+                    logger.exception("Group commit failed")
@@ -1,26 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
+from typing import List, Optional
 
-from ..domain.entities import Location
-from ..application.services import DriverService, PassengerService, TripService, InvoiceService
+from ..domain.entities import Location, NearbyDrivers, NearbyQuery, TripHistoryQuery
+from ..domain.exceptions import OutOfServiceAreaError
+from ..domain.zones import ZoneIndex
+from ..application.services import (
+    DriverService, PassengerService, TripService, InvoiceService, PricingService, RepositionService
+)
 from ..infrastructure.mappers import EntityMapper
-from ..infrastructure.dependencies import get_driver_service, get_passenger_service, get_trip_service, get_invoice_service
+from ..infrastructure.dependencies import (
+    get_driver_service, get_passenger_service, get_trip_service, get_read_trip_service, get_invoice_service,
+    get_pricing_service, get_fleet_state, get_zone_index, get_heartbeats, get_location_trail_store,
+    get_reposition_service, get_nearby_degradation
+)
+from ..infrastructure.degradation import LatencySLOController
+from ..infrastructure.fleet_state import FleetState
+from ..infrastructure.heartbeats import HeartbeatTracker
+from ..infrastructure.location_trail import LocationTrailStore
 from .schemas import (
     DriverSchema, PassengerSchema, TripSchema, InvoiceSchema,
-    TripRequestSchema, CompleteTripSchema, LocationSchema
+    TripRequestSchema, CompleteTripSchema, LocationSchema,
+    QuoteRequestSchema, FareQuoteSchema, FleetStateSchema,
+    ZoneSchema, ZoneClassifyRequestSchema, ZoneClassifyResponseSchema,
+    NearbyBatchRequestSchema, NearbyBatchResultSchema, NearbyDriverSchema,
+    HeartbeatBatchSchema, HeartbeatBatchResultSchema, TripHistoryPageSchema,
+    LocationPingBatchSchema, LocationPingBatchResultSchema, TrailPointSchema, RepositionSuggestionSchema,
+    NearbyDegradationMetricsSchema
 )
+from .idempotency import run_idempotent
+from .caching import cached
+from .encoding import NegotiatedResponse
+from .pagination import decode_cursor, encode_cursor
+
+# main.py attaches these routes to the app as built and shares this dict as app.dependency_overrides
+overrides = SimpleNamespace(dependency_overrides={})
+router = APIRouter(prefix="/api/v1", default_response_class=NegotiatedResponse, dependency_overrides_provider=overrides)
 
-router = APIRouter()
+# Polled read endpoints: ETags from table change counters, max-age sized to how fast each resource changes
+drivers_cache = Depends(cached("drivers", max_age=5))
+passengers_cache = Depends(cached("passengers", max_age=60))
+trips_cache = Depends(cached("trips", max_age=2))
+
+
+def _nearby_response(result: NearbyDrivers, response: Response) -> List[DriverSchema]:
+    """Driver list of a nearby search; degraded-mode answers are flagged with their snapshot's age"""
+    if result.approximate:
+        response.headers["X-Results-Approximate"] = "true"
+        response.headers["X-Results-Staleness-Seconds"] = f"{result.staleness_seconds:.1f}"
+    return [DriverSchema(**EntityMapper.driver_to_dict(driver)) for driver in result.drivers]
 
 
 # Driver Endpoints
-@router.get("/drivers", response_model=List[DriverSchema])
+@router.get("/drivers", response_model=List[DriverSchema], dependencies=[drivers_cache])
 def get_all_drivers(service: DriverService = Depends(get_driver_service)):
     drivers = service.get_all_drivers()
     return [DriverSchema(**EntityMapper.driver_to_dict(driver)) for driver in drivers]
 
 
-@router.get("/drivers/available", response_model=List[DriverSchema])
+@router.get("/drivers/available", response_model=List[DriverSchema], dependencies=[drivers_cache])
 def get_available_drivers(service: DriverService = Depends(get_driver_service)):
     drivers = service.get_available_drivers()
     return [DriverSchema(**EntityMapper.driver_to_dict(driver)) for driver in drivers]
@@ -30,15 +69,94 @@ def get_available_drivers(service: DriverService = Depends(get_driver_service)):
 def get_available_drivers_nearby(
     latitude: float,
     longitude: float,
+    response: Response,
     radius: float = None,
     service: DriverService = Depends(get_driver_service)
 ):
     location = Location(latitude=latitude, longitude=longitude)
-    drivers = service.get_available_drivers_within_radius(location, radius)
-    return [DriverSchema(**EntityMapper.driver_to_dict(driver)) for driver in drivers]
+    return _nearby_response(service.get_available_drivers_within_radius(location, radius), response)
+
+
+@router.post("/drivers/available/nearby/batch", response_model=List[NearbyBatchResultSchema])
+def get_available_drivers_nearby_batch(request: NearbyBatchRequestSchema, service: DriverService = Depends(get_driver_service)):
+    """Nearby available drivers for many pickup points, grouped per point in request order"""
+    queries = [
+        NearbyQuery(Location(latitude=query.latitude, longitude=query.longitude), query.radius, query.limit)
+        for query in request.queries
+    ]
+    results = service.get_available_drivers_nearby_batch(queries)
+    return [
+        NearbyBatchResultSchema(
+            location=LocationSchema(latitude=query.latitude, longitude=query.longitude),
+            drivers=[
+                NearbyDriverSchema(**EntityMapper.driver_to_dict(driver), distance_km=distance)
+                for driver, distance in matches
+            ]
+        )
+        for query, matches in zip(request.queries, results)
+    ]
+
+
+@router.post("/drivers/heartbeats", response_model=HeartbeatBatchResultSchema)
+async def record_heartbeats(request: HeartbeatBatchSchema, heartbeats: HeartbeatTracker = Depends(get_heartbeats)):
+    """Heartbeats relayed in bulk (e.g. by a connection gateway); in-memory only, flushed in batches"""
+    return HeartbeatBatchResultSchema(accepted=heartbeats.beat_many(request.driver_ids))
+
+
+@router.post("/drivers/{driver_id}/heartbeat", status_code=204)
+async def record_heartbeat(driver_id: int, heartbeats: HeartbeatTracker = Depends(get_heartbeats)):
+    heartbeats.beat(driver_id)
+    return Response(status_code=204)
+
+
+@router.post("/drivers/{driver_id}/locations", response_model=LocationPingBatchResultSchema)
+async def record_locations(
+    driver_id: int,
+    request: LocationPingBatchSchema,
+    store: Optional[LocationTrailStore] = Depends(get_location_trail_store)
+):
+    """Append position pings to the driver's trail; in-memory only, flushed in compressed chunks"""
+    if store is None:
+        raise HTTPException(status_code=503, detail="Location trail recording is disabled.")
+    accepted = store.append_many(driver_id, ((ping.latitude, ping.longitude, ping.timestamp) for ping in request.pings))
+    return LocationPingBatchResultSchema(accepted=accepted)
+
+
+def _as_naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Query bounds may carry an offset; the database and the trail store work in naive UTC"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get("/drivers/{driver_id}/trail", response_model=List[TrailPointSchema])
+def get_driver_trail(
+    driver_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    service: DriverService = Depends(get_driver_service)
+):
+    """Recorded positions in [start, end]; defaults to the last hour, at most one day per request"""
+    end = _as_naive_utc(end) or datetime.utcnow()
+    start = _as_naive_utc(start) or end - timedelta(hours=1)
+    if not timedelta(0) <= end - start <= timedelta(days=1):
+        raise HTTPException(status_code=400, detail="The trail range must be between 0 and 24 hours.")
+    points = service.get_location_trail(driver_id, start, end)
+    return [TrailPointSchema(**EntityMapper.trail_point_to_dict(point)) for point in points]
+
+
+@router.get("/drivers/{driver_id}/reposition", response_model=List[RepositionSuggestionSchema])
+def get_reposition_suggestions(driver_id: int, service: RepositionService = Depends(get_reposition_service)):
+    """Where an idle driver is expected to find more pickups this hour, best first; empty means stay"""
+    if service.forecast is None:
+        raise HTTPException(status_code=503, detail="No demand forecast has been fitted yet.")
+    suggestions = service.suggest_for_driver(driver_id)
+    if suggestions is None:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    return [RepositionSuggestionSchema(**EntityMapper.reposition_suggestion_to_dict(suggestion)) for suggestion in suggestions]
 
 
-@router.get("/drivers/{driver_id}", response_model=DriverSchema)
+@router.get("/drivers/{driver_id}", response_model=DriverSchema, dependencies=[drivers_cache])
 def get_driver_by_id(driver_id: int, service: DriverService = Depends(get_driver_service)):
     driver = service.get_driver_by_id(driver_id)
     if not driver:
@@ -46,14 +164,27 @@ def get_driver_by_id(driver_id: int, service: DriverService = Depends(get_driver
     return DriverSchema(**EntityMapper.driver_to_dict(driver))
 
 
+@router.get("/drivers/{driver_id}/trips", response_model=TripHistoryPageSchema)
+def get_driver_trip_history(
+    driver_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    service: TripService = Depends(get_read_trip_service)
+):
+    query = TripHistoryQuery(driver_id=driver_id, start=start, end=end, before=decode_cursor(cursor), limit=limit)
+    return _trip_history_page(query, service)
+
+
 # Passenger Endpoints
-@router.get("/passengers", response_model=List[PassengerSchema])
+@router.get("/passengers", response_model=List[PassengerSchema], dependencies=[passengers_cache])
 def get_all_passengers(service: PassengerService = Depends(get_passenger_service)):
     passengers = service.get_all_passengers()
     return [PassengerSchema(**EntityMapper.passenger_to_dict(passenger)) for passenger in passengers]
 
 
-@router.get("/passengers/{passenger_id}", response_model=PassengerSchema)
+@router.get("/passengers/{passenger_id}", response_model=PassengerSchema, dependencies=[passengers_cache])
 def get_passenger_by_id(passenger_id: int, service: PassengerService = Depends(get_passenger_service)):
     passenger = service.get_passenger_by_id(passenger_id)
     if not passenger:
@@ -61,26 +192,73 @@ def get_passenger_by_id(passenger_id: int, service: PassengerService = Depends(g
     return PassengerSchema(**EntityMapper.passenger_to_dict(passenger))
 
 
+@router.get("/passengers/{passenger_id}/trips", response_model=TripHistoryPageSchema)
+def get_passenger_trip_history(
+    passenger_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    service: TripService = Depends(get_read_trip_service)
+):
+    query = TripHistoryQuery(passenger_id=passenger_id, start=start, end=end, before=decode_cursor(cursor), limit=limit)
+    return _trip_history_page(query, service)
+
+
 @router.post("/passengers/{passenger_id}/nearby-drivers", response_model=List[DriverSchema])
 def get_nearby_drivers_for_passenger(
     passenger_id: int,
     request: LocationSchema,
+    response: Response,
     service: PassengerService = Depends(get_passenger_service)
 ):
     location = Location(latitude=request.latitude, longitude=request.longitude)
-    drivers = service.get_closest_drivers_for_passenger(passenger_id, location)
-    return [DriverSchema(**EntityMapper.driver_to_dict(driver)) for driver in drivers]
+    return _nearby_response(service.get_closest_drivers_for_passenger(passenger_id, location), response)
 
 
 # Trip Endpoints
-@router.get("/trips/active", response_model=List[TripSchema])
-def get_active_trips(service: TripService = Depends(get_trip_service)):
+@router.get("/trips/active", response_model=List[TripSchema], dependencies=[trips_cache])
+def get_active_trips(service: TripService = Depends(get_read_trip_service)):
     trips = service.get_all_active_trips()
     return [TripSchema(**EntityMapper.trip_to_dict(trip)) for trip in trips]
 
 
+@router.get("/trips", response_model=TripHistoryPageSchema)
+def get_trip_history(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    service: TripService = Depends(get_read_trip_service)
+):
+    """All trips created in [start, end), newest first, one keyset page at a time"""
+    query = TripHistoryQuery(start=start, end=end, before=decode_cursor(cursor), limit=limit)
+    return _trip_history_page(query, service)
+
+
+def _trip_history_page(query: TripHistoryQuery, service: TripService) -> TripHistoryPageSchema:
+    trips, next_cursor = service.get_trip_history(query)
+    return TripHistoryPageSchema(
+        trips=[TripSchema(**EntityMapper.trip_to_dict(trip)) for trip in trips],
+        next_cursor=encode_cursor(next_cursor)
+    )
+
+
 @router.post("/trips", response_model=TripSchema)
-def create_trip(request: TripRequestSchema, service: TripService = Depends(get_trip_service)):
+def create_trip(
+    request: TripRequestSchema,
+    service: TripService = Depends(get_trip_service),
+    idempotency_key: Optional[str] = Header(None)
+):
+    if idempotency_key:
+        # Scoped to the passenger, so two passengers picking the same key never see each other's trip
+        return run_idempotent(
+            f"create_trip:{request.passenger_id}", idempotency_key, request, lambda: _create_trip(request, service)
+        )
+    return _create_trip(request, service)
+
+
+def _create_trip(request: TripRequestSchema, service: TripService) -> TripSchema:
     pickup_location = Location(
         latitude=request.pickup_location.latitude,
         longitude=request.pickup_location.longitude
@@ -92,11 +270,14 @@ def create_trip(request: TripRequestSchema, service: TripService = Depends(get_t
             longitude=request.destination_location.longitude
         )
     
-    trip = service.create_trip_request(
-        passenger_id=request.passenger_id,
-        pickup_location=pickup_location,
-        destination_location=destination_location
-    )
+    try:
+        trip = service.create_trip_request(
+            passenger_id=request.passenger_id,
+            pickup_location=pickup_location,
+            destination_location=destination_location
+        )
+    except OutOfServiceAreaError:
+        raise HTTPException(status_code=422, detail="Pickup location is outside the service area.")
     
     if not trip:
         raise HTTPException(status_code=400, detail="Unable to create trip. No available drivers or passenger not found.")
@@ -108,8 +289,17 @@ def create_trip(request: TripRequestSchema, service: TripService = Depends(get_t
 def complete_trip(
     trip_id: int,
     request: CompleteTripSchema,
-    service: TripService = Depends(get_trip_service)
+    service: TripService = Depends(get_trip_service),
+    idempotency_key: Optional[str] = Header(None)
 ):
+    if idempotency_key:
+        return run_idempotent(
+            f"complete_trip:{trip_id}", idempotency_key, request, lambda: _complete_trip(trip_id, request, service)
+        )
+    return _complete_trip(trip_id, request, service)
+
+
+def _complete_trip(trip_id: int, request: CompleteTripSchema, service: TripService) -> TripSchema:
     destination_location = Location(
         latitude=request.destination_location.latitude,
         longitude=request.destination_location.longitude
@@ -122,6 +312,38 @@ def complete_trip(
     return TripSchema(**EntityMapper.trip_to_dict(trip))
 
 
+@router.put("/trips/{trip_id}/accept", response_model=TripSchema)
+def accept_trip(trip_id: int, service: TripService = Depends(get_trip_service)):
+    trip = service.accept_trip(trip_id)
+    if not trip:
+        raise HTTPException(status_code=400, detail="Unable to accept trip. Trip not found or not in correct status.")
+    return TripSchema(**EntityMapper.trip_to_dict(trip))
+
+
+@router.put("/trips/{trip_id}/start", response_model=TripSchema)
+def start_trip(trip_id: int, service: TripService = Depends(get_trip_service)):
+    trip = service.start_trip(trip_id)
+    if not trip:
+        raise HTTPException(status_code=400, detail="Unable to start trip. Trip not found or not in correct status.")
+    return TripSchema(**EntityMapper.trip_to_dict(trip))
+
+
+@router.get("/trips/{trip_id}/trail", response_model=List[TrailPointSchema])
+def get_trip_trail(trip_id: int, service: TripService = Depends(get_read_trip_service)):
+    points = service.get_trip_trail(trip_id)
+    if points is None:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    return [TrailPointSchema(**EntityMapper.trail_point_to_dict(point)) for point in points]
+
+
+@router.put("/trips/{trip_id}/cancel", response_model=TripSchema)
+def cancel_trip(trip_id: int, service: TripService = Depends(get_trip_service)):
+    trip = service.cancel_trip(trip_id)
+    if not trip:
+        raise HTTPException(status_code=400, detail="Unable to cancel trip. Trip not found or not in correct status.")
+    return TripSchema(**EntityMapper.trip_to_dict(trip))
+
+
 # Invoice Endpoints
 @router.post("/trips/{trip_id}/invoice", response_model=InvoiceSchema)
 def generate_invoice(trip_id: int, service: InvoiceService = Depends(get_invoice_service)):
@@ -129,4 +351,52 @@ def generate_invoice(trip_id: int, service: InvoiceService = Depends(get_invoice
     if not invoice:
         raise HTTPException(status_code=400, detail="Unable to generate invoice. Trip not completed or invoice already exists.")
     
-    return InvoiceSchema(**EntityMapper.invoice_to_dict(invoice))
\ No newline at end of file
+    return InvoiceSchema(**EntityMapper.invoice_to_dict(invoice))
+
+
+# Pricing Endpoints
+@router.post("/pricing/quote", response_model=FareQuoteSchema)
+def get_fare_quote(request: QuoteRequestSchema, service: PricingService = Depends(get_pricing_service)):
+    pickup_location = Location(
+        latitude=request.pickup_location.latitude,
+        longitude=request.pickup_location.longitude
+    )
+    destination_location = None
+    if request.destination_location:
+        destination_location = Location(
+            latitude=request.destination_location.latitude,
+            longitude=request.destination_location.longitude
+        )
+    
+    quote = service.quote(pickup_location, destination_location)
+    return FareQuoteSchema(**EntityMapper.quote_to_dict(quote))
+
+
+# Fleet Endpoints
+@router.get("/fleet/state", response_model=FleetStateSchema)
+def get_fleet_state_summary(fleet_state: FleetState = Depends(get_fleet_state)):
+    """This worker's in-memory fleet view and the change-feed cursor it has applied"""
+    return FleetStateSchema(**fleet_state.summary())
+
+
+# Metrics Endpoints
+@router.get("/metrics/nearby", response_model=NearbyDegradationMetricsSchema)
+def get_nearby_degradation_metrics(degradation: Optional[LatencySLOController] = Depends(get_nearby_degradation)):
+    """This worker's nearby-search latency against its SLO and its degraded-mode transitions"""
+    if degradation is None:
+        raise HTTPException(status_code=404, detail="Nearby search degradation is disabled.")
+    return NearbyDegradationMetricsSchema(**degradation.metrics())
+
+
+# Zone Endpoints
+@router.get("/zones", response_model=List[ZoneSchema])
+def get_zones(zone_index: ZoneIndex = Depends(get_zone_index)):
+    return [ZoneSchema(**EntityMapper.zone_to_dict(zone)) for zone in zone_index.zones]
+
+
+@router.post("/zones/classify", response_model=ZoneClassifyResponseSchema)
+def classify_points(request: ZoneClassifyRequestSchema, zone_index: ZoneIndex = Depends(get_zone_index)):
+    """Most specific zone of every point, in request order; null when out of area"""
+    classify = zone_index.classify
+    zones = [classify(point.latitude, point.longitude) for point in request.points]
+    return ZoneClassifyResponseSchema(zones=[EntityMapper.zone_to_dict(zone) for zone in zones])
@@ -0,0 +1,51 @@
+from typing import Callable, Optional
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from ..infrastructure.database import get_read_db
+from ..infrastructure.table_versions import table_versions
+from .encoding import CODING_TAGS, FORMAT_TAGS, negotiate_format
+
+
+def _strip_coding(etag: str) -> str:
+    for coding in CODING_TAGS:
+        suffix = f'-{coding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def _matching_tag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """The If-None-Match entry validating etag, ignoring the suffix CompressionMiddleware adds"""
+    if not if_none_match:
+        return None
+    for candidate in (candidate.strip() for candidate in if_none_match.split(",")):
+        if candidate == "*" or _strip_coding(candidate) == etag:
+            return etag if candidate == "*" else candidate
+    return None
+
+
+def cached(*tables: str, max_age: int) -> Callable[..., None]:
+    """Route dependency adding a strong ETag and Cache-Control to a read endpoint.
+
+    The ETag is built from the change counters of the tables the response is
+    read from, so validating it costs one small query on the same session the
+    route reads from. A matching If-None-Match is answered with 304 before the
+    route runs any ORM query. Each negotiated body format gets its own tag.
+    """
+    cache_control = f"public, max-age={max_age}"
+
+    def dependency(request: Request, response: Response, db: Session = Depends(get_read_db)) -> None:
+        versions = table_versions(db, tables)
+        format_tag = FORMAT_TAGS[negotiate_format(request.headers.get("accept"))]
+        parts = [f"{table}.{versions.get(table, 0)}" for table in tables] + ([format_tag] if format_tag else [])
+        etag = '"' + "-".join(parts) + '"'
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept, X-City"}
+        matched = _matching_tag(request.headers.get("if-none-match"), etag)
+        if matched:
+            # Echo the client's tag so a 304 for a compressed copy keeps its coding suffix
+            raise HTTPException(status_code=304, headers={**headers, "ETag": matched})
+        response.headers.update(headers)
+
+    return dependency
@@ -0,0 +1,209 @@
+import gzip
+import importlib
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi.responses import JSONResponse
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+COLUMNAR = "application/vnd.taxi24.columnar+json"
+
+# Representation suffixes appended to ETags, so each format/coding gets its own validator
+FORMAT_TAGS = {JSON: "", MSGPACK: "msgpack", COLUMNAR: "columnar"}
+CODING_TAGS = ("gzip", "br")
+
+_response_format: ContextVar[str] = ContextVar("response_format", default=JSON)
+
+
+@lru_cache(maxsize=None)
+def _optional_module(name: str):
+    """Import an optional dependency on first use; None when it is not installed"""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+def _parse_quality_list(header: Optional[str]) -> Tuple[List[str], Set[str]]:
+    """Accept/Accept-Encoding values ordered by preference (q-value, then header order), and those refused with q=0"""
+    items = []
+    for position, part in enumerate((header or "").split(",")):
+        value, *params = [piece.strip() for piece in part.split(";")]
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        items.append((value.lower(), quality, position))
+    items.sort(key=lambda item: (-item[1], item[2]))
+    return [value for value, quality, _ in items if quality > 0], {value for value, quality, _ in items if quality <= 0}
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Pick the response media type; JSON unless the client prefers a supported alternative"""
+    accepted, refused = _parse_quality_list(accept)
+    for media_type in accepted:
+        if media_type in (JSON, "application/*", "*/*") and JSON not in refused:
+            return JSON
+        if media_type in (MSGPACK, "application/x-msgpack") and _optional_module("msgpack"):
+            return MSGPACK
+        if media_type == COLUMNAR:
+            return COLUMNAR
+    return JSON
+
+
+def negotiate_coding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick a content coding; one refused with q=0 is never used, even when `*` is accepted"""
+    accepted, refused = _parse_quality_list(accept_encoding)
+    for coding in accepted:
+        if coding == "br" and _optional_module("brotli"):
+            return "br"
+        if coding == "gzip":
+            return "gzip"
+        if coding == "*":
+            if "gzip" not in refused:
+                return "gzip"
+            if "br" not in refused and _optional_module("brotli"):
+                return "br"
+    return None
+
+
+def add_vary(headers: List[Tuple[bytes, bytes]], field: str) -> List[Tuple[bytes, bytes]]:
+    """Raw ASGI headers with field added to their single Vary header"""
+    fields = []
+    for name, value in headers:
+        if name == b"vary":
+            fields += [item.strip() for item in value.decode("latin-1").split(",") if item.strip()]
+    if field.lower() not in (item.lower() for item in fields):
+        fields.append(field)
+    return [(name, value) for name, value in headers if name != b"vary"] + [(b"vary", ", ".join(fields).encode("latin-1"))]
+
+
+def to_columnar(content: Any) -> Any:
+    """Turn a list of objects into one array per field; other content is returned unchanged"""
+    if not isinstance(content, list) or not all(isinstance(item, dict) for item in content):
+        return content
+    fields: Dict[str, None] = {}
+    for item in content:
+        fields.update(dict.fromkeys(item))
+    return {field: [item.get(field) for item in content] for field in fields}
+
+
+def from_columnar(columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Inverse of to_columnar, e.g. to validate the rows with the API schemas"""
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+class NegotiatedResponse(JSONResponse):
+    """Default response class rendering the format chosen by ResponseFormatMiddleware"""
+
+    def render(self, content: Any) -> bytes:
+        response_format = _response_format.get()
+        if response_format == MSGPACK:
+            self.media_type = MSGPACK
+            return _optional_module("msgpack").packb(content)
+        if response_format == COLUMNAR:
+            self.media_type = COLUMNAR
+            content = to_columnar(content)
+        return super().render(content)
+
+
+class ResponseFormatMiddleware:
+    """ASGI middleware selecting the body format of API responses from the Accept header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = next((value.decode("latin-1") for name, value in scope["headers"] if name == b"accept"), None)
+
+        async def send_varying(message):
+            # Every API body is rendered in the negotiated format, so every response depends on Accept
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": add_vary(list(message.get("headers", [])), "Accept")}
+            await send(message)
+
+        token = _response_format.set(negotiate_format(accept))
+        try:
+            await self.app(scope, receive, send_varying)
+        finally:
+            _response_format.reset(token)
+
+
+def _tag_etag(etag: bytes, coding: str) -> bytes:
+    return etag[:-1] + b"-" + coding.encode() + b'"' if etag.endswith(b'"') else etag
+
+
+def _compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return _optional_module("brotli").compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing response bodies above a size threshold.
+
+    Brotli is offered when the optional `brotli` package is installed,
+    otherwise gzip. The ETag of a compressed body gets a coding suffix so
+    caches never mix representations.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = next(
+            (value.decode("latin-1") for name, value in scope["headers"] if name == b"accept-encoding"), None
+        )
+        coding = negotiate_coding(accept_encoding)
+        if coding is None:
+            # Another Accept-Encoding would have got a compressed body, so this one still varies on it
+            async def send_varying(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": add_vary(list(message.get("headers", [])), "Accept-Encoding")}
+                await send(message)
+
+            await self.app(scope, receive, send_varying)
+            return
+
+        start_message = None
+        chunks = []
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            headers = list(start_message["headers"])
+            already_encoded = any(name == b"content-encoding" for name, _ in headers)
+            if len(body) >= self.minimum_size and not already_encoded:
+                body = _compress(body, coding)
+                headers = [
+                    (name, _tag_etag(value, coding) if name == b"etag" else value)
+                    for name, value in headers if name != b"content-length"
+                ]
+                headers += [(b"content-encoding", coding.encode()), (b"content-length", str(len(body)).encode())]
+            await send({**start_message, "headers": add_vary(headers, "Accept-Encoding")})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,35 @@
+import hashlib
+import json
+from typing import Callable
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from ..infrastructure.dependencies import current_tenant
+from ..infrastructure.idempotency import StoredResponse, IdempotencyKeyReusedError, IdempotencyTimeoutError
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def _capture(handler: Callable[[], BaseModel]) -> StoredResponse:
+    try:
+        result = handler()
+    except HTTPException as exc:
+        # Business rejections are outcomes too and must replay identically
+        return StoredResponse(exc.status_code, json.dumps({"detail": exc.detail}).encode())
+    return StoredResponse(200, result.model_dump_json().encode())
+
+
+def run_idempotent(scope: str, key: str, payload: BaseModel, handler: Callable[[], BaseModel]) -> Response:
+    """Execute handler at most once per (scope, key) and replay its response"""
+    fingerprint = hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+    try:
+        stored, replayed = current_tenant().idempotency_store.execute(f"{scope}:{key}", fingerprint, lambda: _capture(handler))
+    except IdempotencyKeyReusedError:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request payload.")
+    except IdempotencyTimeoutError:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress.")
+    
+    headers = {REPLAYED_HEADER: "true"} if replayed else None
+    return Response(content=stored.body, status_code=stored.status_code, media_type="application/json", headers=headers)
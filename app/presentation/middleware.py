@@ -0,0 +1,304 @@
+import json
+import logging
+import math
+import re
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from ..core.config import settings
+from ..infrastructure.database import READ_PRIMARY_COOKIE, track_primary_writes
+from ..infrastructure.dependencies import tenants
+from ..infrastructure.tenants import TenantRegistry, UnknownCityError
+from ..infrastructure.rate_limit import (
+    RateLimitBackend, InMemoryRateLimitBackend, SQLiteRateLimitBackend, AdaptiveConcurrencyLimiter
+)
+from ..infrastructure.query_tracking import QueryStats, track_queries
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    name: str
+    method: str
+    pattern: "re.Pattern[str]"
+    rate_per_second: Optional[float] = None
+    burst: Optional[int] = None
+    high_priority: bool = False
+
+
+def default_route_policies() -> List[RoutePolicy]:
+    prefix = "/api/v1"
+    return [
+        RoutePolicy(
+            "nearby_drivers", "GET", re.compile(rf"^{prefix}/drivers/available/nearby$"),
+            rate_per_second=settings.nearby_rate_per_second, burst=settings.nearby_burst
+        ),
+        RoutePolicy(
+            "nearby_drivers_batch", "POST", re.compile(rf"^{prefix}/drivers/available/nearby/batch$"),
+            rate_per_second=settings.nearby_rate_per_second, burst=settings.nearby_burst
+        ),
+        RoutePolicy(
+            "passenger_nearby_drivers", "POST", re.compile(rf"^{prefix}/passengers/\d+/nearby-drivers$"),
+            rate_per_second=settings.nearby_rate_per_second, burst=settings.nearby_burst
+        ),
+        RoutePolicy("create_trip", "POST", re.compile(rf"^{prefix}/trips$"), high_priority=True),
+        RoutePolicy("complete_trip", "PUT", re.compile(rf"^{prefix}/trips/\d+/complete$"), high_priority=True),
+    ]
+
+
+def default_rate_limit_backend() -> RateLimitBackend:
+    if settings.rate_limit_backend_path:
+        return SQLiteRateLimitBackend(settings.rate_limit_backend_path, settings.rate_limit_idle_ttl_seconds)
+    return InMemoryRateLimitBackend(settings.rate_limit_idle_ttl_seconds)
+
+
+def default_concurrency_limiter() -> AdaptiveConcurrencyLimiter:
+    return AdaptiveConcurrencyLimiter(
+        initial_limit=settings.concurrency_initial_limit,
+        min_limit=settings.concurrency_min_limit,
+        max_limit=settings.concurrency_max_limit,
+        high_priority_reserve=settings.concurrency_high_priority_reserve,
+        queue_delay_target_seconds=settings.concurrency_queue_delay_target_seconds,
+        max_queue_wait_seconds=settings.concurrency_max_queue_wait_seconds
+    )
+
+
+async def _reject(send, status_code: int, detail: str, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + (headers or [])
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying per-client rate limits and adaptive load shedding.
+
+    Rate-limited routes answer 429 once a client's token bucket is empty.
+    Requests over the concurrency limit wait briefly for a slot and answer 503
+    before reaching the threadpool if none frees up, except high-priority routes
+    which can use the reserved headroom.
+    """
+
+    def __init__(
+        self,
+        app,
+        rate_limiter: Optional[RateLimitBackend] = None,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        policies: Optional[List[RoutePolicy]] = None
+    ):
+        self.app = app
+        self.rate_limiter = rate_limiter or default_rate_limit_backend()
+        self.concurrency_limiter = concurrency_limiter or default_concurrency_limiter()
+        self.policies = default_route_policies() if policies is None else policies
+
+    def _policy_for(self, method: str, path: str) -> Optional[RoutePolicy]:
+        for policy in self.policies:
+            if policy.method == method and policy.pattern.match(path):
+                return policy
+        return None
+
+    @staticmethod
+    def _client_key(scope) -> str:
+        # Only issued API keys get their own bucket; any other key would let a client rotate into fresh ones
+        for name, value in scope.get("headers", ()):
+            if name == b"x-api-key":
+                api_key = value.decode("latin-1")
+                if api_key in settings.rate_limit_api_keys:
+                    return "key:" + api_key
+                break
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        policy = self._policy_for(scope["method"], scope["path"])
+        if policy and policy.rate_per_second:
+            key = f"{self._client_key(scope)}|{policy.name}"
+            if self.rate_limiter.blocking:
+                retry_after = await run_in_threadpool(self.rate_limiter.acquire, key, policy.rate_per_second, policy.burst)
+            else:
+                retry_after = self.rate_limiter.acquire(key, policy.rate_per_second, policy.burst)
+            if retry_after:
+                await _reject(
+                    send, 429, "Rate limit exceeded.", [(b"retry-after", str(max(1, round(retry_after))).encode())]
+                )
+                return
+
+        high_priority = bool(policy and policy.high_priority)
+        if not await self.concurrency_limiter.acquire(high_priority):
+            await _reject(send, 503, "Server is overloaded, please retry.", [(b"retry-after", b"1")])
+            return
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.concurrency_limiter.release(time.monotonic() - start)
+
+
+class TenantMiddleware:
+    """ASGI middleware serving each request as the city named in its X-City header.
+
+    The city's settings, database and in-memory state apply for the whole
+    request, and the city cannot be unloaded while it runs. Requests without
+    the header are served by the default tenant; unknown cities answer 404.
+    """
+
+    def __init__(self, app, registry: Optional[TenantRegistry] = None):
+        self.app = app
+        self.registry = registry or tenants
+
+    async def __call__(self, scope, receive, send):
+        city = None
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"x-city":
+                    city = value.decode("latin-1").strip().lower()
+                    break
+        if not city:
+            await self.app(scope, receive, send)
+            return
+
+        # The registry lock and a first load (which opens the city's database) stay off the event loop
+        try:
+            tenant = await run_in_threadpool(self.registry.acquire, city)
+        except UnknownCityError:
+            await _reject(send, 404, f"Unknown city: {city}")
+            return
+        try:
+            with tenant.activate():
+                await self.app(scope, receive, send)
+        finally:
+            await run_in_threadpool(self.registry.release, tenant)
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware keeping a client's reads on the primary for a short window after it writes.
+
+    A response to a request that committed to the primary sets the read_primary
+    cookie for REPLICA_READ_AFTER_WRITE_SECONDS; while the client sends it back,
+    replica-routed reads use the primary, so it never reads a replica that has
+    not caught up with its own write.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        window = math.ceil(settings.replica_read_after_write_seconds)
+        if scope["type"] != "http" or window <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        cookie = f"{READ_PRIMARY_COOKIE}=1; Max-Age={window}; Path=/; HttpOnly; SameSite=Lax".encode("latin-1")
+        with track_primary_writes() as writes:
+            async def send_with_cookie(message):
+                if message["type"] == "http.response.start" and writes.committed:
+                    message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie)]}
+                await send(message)
+
+            await self.app(scope, receive, send_with_cookie)
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    name: str
+    method: str
+    pattern: "re.Pattern[str]"
+    max_statements: int
+    max_rows: Optional[int] = None
+
+    def exceeded_by(self, stats: QueryStats) -> bool:
+        return stats.statements > self.max_statements or (self.max_rows is not None and stats.rows > self.max_rows)
+
+
+def default_query_budgets() -> List[QueryBudget]:
+    """SQL statements allowed per request; row budgets only on single-row routes.
+    
+    Every committed write also bumps its tables' change counters (one UPDATE
+    per commit), and cached reads first look up those counters for the ETag.
+    """
+    prefix = "/api/v1"
+    return [
+        QueryBudget("get_driver", "GET", re.compile(rf"^{prefix}/drivers/\d+$"), 2, max_rows=1),
+        QueryBudget("get_passenger", "GET", re.compile(rf"^{prefix}/passengers/\d+$"), 2, max_rows=1),
+        QueryBudget("list", "GET", re.compile(rf"^{prefix}/(drivers|drivers/available|drivers/available/nearby|passengers|trips/active)$"), 2),
+        QueryBudget("heartbeats", "POST", re.compile(rf"^{prefix}/drivers/(heartbeats|\d+/heartbeat|\d+/locations)$"), 0),
+        # trail chunks; the trip trail reads the trip first, which takes the partition list and
+        # one partition lookup more once the trip is archived
+        QueryBudget("driver_trail", "GET", re.compile(rf"^{prefix}/drivers/\d+/trail$"), 1),
+        QueryBudget("trip_trail", "GET", re.compile(rf"^{prefix}/trips/\d+/trail$"), 4),
+        # driver, then idle drivers around it; the forecast itself is in memory
+        QueryBudget("reposition", "GET", re.compile(rf"^{prefix}/drivers/\d+/reposition$"), 2),
+        QueryBudget("nearby_batch", "POST", re.compile(rf"^{prefix}/drivers/available/nearby/batch$"), 1),
+        QueryBudget("passenger_nearby_drivers", "POST", re.compile(rf"^{prefix}/passengers/\d+/nearby-drivers$"), 1),
+        # `trips`, the partition list, then only the monthly partitions a page reaches into
+        QueryBudget("trip_history", "GET", re.compile(rf"^{prefix}/(trips|drivers/\d+/trips|passengers/\d+/trips)$"), 6),
+        # available drivers, only when no background refresher is ticking the surge tables
+        QueryBudget("pricing_quote", "POST", re.compile(rf"^{prefix}/pricing/quote$"), 1),
+        # Every write commit ends with its buffered change events (one executemany INSERT) and one
+        # counter UPDATE, so no write goes below 2; the rest is listed per route.
+        # passenger (an unknown one is a 404 before any driver is claimed), drivers within the default
+        # radius, claim driver (compare-and-swap), insert trip, events, counters; one more driver query
+        # when the default radius is empty and dispatch widens to the cap
+        QueryBudget("create_trip", "POST", re.compile(rf"^{prefix}/trips$"), 7),
+        # conditional UPDATE ... RETURNING (the state machine check is in its WHERE clause), event, counters
+        QueryBudget("transition_trip", "PUT", re.compile(rf"^{prefix}/trips/\d+/(accept|start)$"), 3, max_rows=3),
+        # read trip (the transition depends on its status), trail chunks for the driven distance (complete),
+        # compare-and-swap trip, release driver, events, counters
+        QueryBudget("settle_trip", "PUT", re.compile(rf"^{prefix}/trips/\d+/(complete|cancel)$"), 6, max_rows=7),
+        # read trip (plus the partition list and lookup once archived), existing invoice (generation is
+        # idempotent), insert invoice, counters
+        QueryBudget("generate_invoice", "POST", re.compile(rf"^{prefix}/trips/\d+/invoice$"), 6, max_rows=4),
+    ]
+
+
+class QueryBudgetExceededError(Exception):
+    pass
+
+
+class QueryBudgetMiddleware:
+    """ASGI middleware counting the SQL each request issues against its route's budget.
+
+    Overruns are logged, or raised when QUERY_BUDGET_MODE=raise so that the
+    test suite fails on new N+1 patterns.
+    """
+
+    def __init__(self, app, budgets: Optional[List[QueryBudget]] = None):
+        self.app = app
+        self.budgets = default_query_budgets() if budgets is None else budgets
+
+    def _budget_for(self, method: str, path: str) -> Optional[QueryBudget]:
+        for budget in self.budgets:
+            if budget.method == method and budget.pattern.match(path):
+                return budget
+        return None
+
+    async def __call__(self, scope, receive, send):
+        budget = None
+        if scope["type"] == "http" and settings.query_budget_mode != "off":
+            budget = self._budget_for(scope["method"], scope["path"])
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            await self.app(scope, receive, send)
+        if budget.exceeded_by(stats):
+            message = (
+                f"{scope['method']} {scope['path']} exceeded query budget {budget.name!r}: {stats.statements} statements, "
+                f"{stats.rows} rows (budget {budget.max_statements} statements, {budget.max_rows} rows)"
+            )
+            if settings.query_budget_mode == "raise":
+                raise QueryBudgetExceededError(message)
+            logger.warning(message)
@@ -0,0 +1,27 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+
+from ..domain.entities import TripCursor
+
+
+def encode_cursor(cursor: Optional[TripCursor]) -> Optional[str]:
+    """Opaque, URL-safe form of a keyset position"""
+    if cursor is None:
+        return None
+    raw = f"{cursor.created_at.isoformat()}|{cursor.trip_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(value: Optional[str]) -> Optional[TripCursor]:
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        created_at, trip_id = raw.split("|")
+        return TripCursor(created_at=datetime.fromisoformat(created_at), trip_id=int(trip_id))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
 from datetime import datetime
 from decimal import Decimal
 from enum import Enum
@@ -13,6 +13,7 @@ class DriverStatusSchema(str, Enum):
 
 class TripStatusSchema(str, Enum):
     REQUESTED = "requested"
+    ACCEPTED = "accepted"
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
     CANCELLED = "cancelled"
@@ -60,7 +61,10 @@ class TripSchema(BaseModel):
     fare: Optional[Decimal] = None
     distance_km: Optional[float] = None
     created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
+    pickup_zone: Optional[str] = None
+    search_radius_km: Optional[float] = None  # radius dispatch searched to find the driver
 
     class Config:
         from_attributes = True
@@ -88,3 +92,104 @@ class CompleteTripSchema(BaseModel):
     destination_location: LocationSchema
     fare: Decimal
 
+
+class QuoteRequestSchema(BaseModel):
+    pickup_location: LocationSchema
+    destination_location: Optional[LocationSchema] = None
+
+
+class FareQuoteSchema(BaseModel):
+    zone: str
+    surge_multiplier: float
+    base_fare: Decimal
+    distance_km: Optional[float] = None
+    estimated_fare: Decimal
+
+
+class FleetStateSchema(BaseModel):
+    cursor: int
+    drivers: Dict[str, int]
+    active_trips: int
+
+
+class ZoneSchema(BaseModel):
+    id: str
+    name: str
+    kind: str
+
+
+class ZoneClassifyRequestSchema(BaseModel):
+    points: List[LocationSchema] = Field(max_length=10000)
+
+
+class ZoneClassifyResponseSchema(BaseModel):
+    zones: List[Optional[ZoneSchema]]  # None for points outside every zone
+
+
+class NearbyQuerySchema(LocationSchema):
+    radius: Optional[float] = Field(None, gt=0)
+    limit: Optional[int] = Field(None, gt=0)
+
+
+class NearbyBatchRequestSchema(BaseModel):
+    queries: List[NearbyQuerySchema] = Field(max_length=1000)
+
+
+class NearbyDriverSchema(DriverSchema):
+    distance_km: float
+
+
+class NearbyBatchResultSchema(BaseModel):
+    location: LocationSchema
+    drivers: List[NearbyDriverSchema]
+
+
+class HeartbeatBatchSchema(BaseModel):
+    driver_ids: List[int] = Field(max_length=50000)
+
+
+class HeartbeatBatchResultSchema(BaseModel):
+    accepted: int
+
+
+class TripHistoryPageSchema(BaseModel):
+    trips: List[TripSchema]
+    next_cursor: Optional[str] = None  # pass as `cursor` to fetch the next (older) page
+
+
+class LocationPingSchema(LocationSchema):
+    timestamp: Optional[datetime] = None  # when the position was taken; defaults to arrival time
+
+
+class LocationPingBatchSchema(BaseModel):
+    pings: List[LocationPingSchema] = Field(max_length=10000)
+
+
+class LocationPingBatchResultSchema(BaseModel):
+    accepted: int
+
+
+class TrailPointSchema(LocationSchema):
+    timestamp: datetime
+
+
+class RepositionSuggestionSchema(BaseModel):
+    location: LocationSchema  # center of the forecast cell
+    distance_km: float
+    expected_pickups: float  # this hour of the week
+    idle_drivers: int
+
+
+class NearbyDegradationMetricsSchema(BaseModel):
+    degraded: bool
+    entered_total: int
+    exited_total: int
+    degraded_seconds_total: float
+    exact_searches_total: int
+    approximate_searches_total: int
+    latency_quantile: float
+    latency_seconds: Optional[float] = None  # the quantile over the current window
+    latency_slo_seconds: float
+    window_samples: int
+    snapshot_drivers: Optional[int] = None
+    snapshot_age_seconds: Optional[float] = None
@@ -0,0 +1,55 @@
+"""
+Bulk re-billing: per-invoice Decimal arithmetic vs one integer pass over an array of cents.
+
+Run with: python -m benchmarks.bench_billing [invoices]
+"""
+
+import random
+import sys
+import time
+from array import array
+from decimal import Decimal, ROUND_HALF_UP
+
+from app.domain.billing import Rounding, TaxRate, bill
+
+TAX_RATE = 0.18
+
+
+def decimal_invoices(fares):
+    tax_rate = Decimal(str(TAX_RATE))
+    cents = Decimal("0.01")
+    lines = []
+    for fare in fares:
+        amount = fare.quantize(cents, rounding=ROUND_HALF_UP)
+        tax_amount = (amount * tax_rate).quantize(cents, rounding=ROUND_HALF_UP)
+        lines.append((amount, tax_amount, amount + tax_amount))
+    return lines
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(3)
+    amounts = array("q", (rng.randint(500, 15000) for _ in range(size)))
+    fares = [Decimal(amount).scaleb(-2) for amount in amounts]
+
+    start = time.perf_counter()
+    expected = decimal_invoices(fares)
+    decimal_seconds = time.perf_counter() - start
+
+    rate = TaxRate(TAX_RATE)
+    results = {}
+    for rounding in (Rounding.HALF_UP, Rounding.HALF_EVEN):
+        start = time.perf_counter()
+        lines = bill(amounts, rate, rounding)
+        results[rounding] = (time.perf_counter() - start, lines)
+
+    lines = results[Rounding.HALF_UP][1]
+    assert all(tax == int(line[1].scaleb(2)) for tax, line in zip(lines.taxes, expected))
+    print(f"{size:,} invoices")
+    print(f"{'Decimal per invoice':<24} {decimal_seconds * 1000:10.1f} ms")
+    for rounding, (seconds, _) in results.items():
+        print(f"{'bill(), ' + rounding.value:<24} {seconds * 1000:10.1f} ms  ({decimal_seconds / seconds:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
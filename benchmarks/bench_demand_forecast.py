@@ -0,0 +1,52 @@
+"""
+Demand forecast fit time and per-call cost of the lookups made for idle drivers.
+
+Run with: python -m benchmarks.bench_demand_forecast
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.domain.entities import Location
+from app.domain.forecast import fit_demand_forecast
+
+PICKUPS = 200_000
+WEEKS = 8
+LOOKUPS = 20_000
+
+
+def main():
+    random.seed(24)
+    start = datetime(2024, 1, 1)
+    span = timedelta(weeks=WEEKS).total_seconds()
+    # Lima-sized area, denser towards the center
+    pickups = [
+        (
+            start + timedelta(seconds=random.uniform(0, span)),
+            random.gauss(-12.07, 0.06),
+            random.gauss(-77.03, 0.06)
+        )
+        for _ in range(PICKUPS)
+    ]
+
+    begin = time.perf_counter()
+    forecast = fit_demand_forecast(pickups, start, WEEKS, cell_size_km=1.0, alpha=0.3)
+    elapsed = time.perf_counter() - begin
+    print(f"{'fit':<20} {PICKUPS / elapsed:12,.0f} pickups/s ({len(forecast.cells):,} cells, {len(forecast.rates) * 8 / 1e6:.1f} MB)")
+
+    now = start + timedelta(weeks=WEEKS, hours=18)
+    locations = [Location(latitude=random.gauss(-12.07, 0.06), longitude=random.gauss(-77.03, 0.06)) for _ in range(LOOKUPS)]
+    for label, lookup in (
+        ("expected_pickups", lambda location: forecast.expected_pickups(location, now)),
+        ("suggest (5 km)", lambda location: forecast.suggest(location, now, 5.0, 3)),
+    ):
+        begin = time.perf_counter()
+        for location in locations:
+            lookup(location)
+        elapsed = time.perf_counter() - begin
+        print(f"{label:<20} {elapsed / LOOKUPS * 1e6:12.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
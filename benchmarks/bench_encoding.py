@@ -0,0 +1,62 @@
+"""
+Payload size and encode time of the negotiable response formats for a large driver list.
+
+Run with: python -m benchmarks.bench_encoding
+"""
+
+import gzip
+import json
+import time
+from datetime import datetime
+
+from app.presentation.encoding import _optional_module, to_columnar
+
+DRIVERS = 5000
+ROUNDS = 5
+
+
+def driver_rows():
+    updated_at = datetime(2024, 1, 1).isoformat()
+    return [
+        {
+            "id": i, "name": f"Driver {i}", "email": f"driver{i}@taxi24.com", "phone": "+51900000000",
+            "license_number": f"LIC{i:06d}", "status": "available",
+            "current_location": {"latitude": -12.0464 + i * 1e-5, "longitude": -77.0428 - i * 1e-5},
+            "created_at": updated_at, "updated_at": updated_at,
+        }
+        for i in range(DRIVERS)
+    ]
+
+
+def measure(label, encode):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        body = encode()
+    elapsed = (time.perf_counter() - start) / ROUNDS
+    print(f"{label:<24} {len(body):>12,} bytes {elapsed * 1e3:10.2f} ms")
+
+
+def main():
+    rows = driver_rows()
+    as_json = json.dumps(rows, separators=(",", ":")).encode()
+    as_columnar = json.dumps(to_columnar(rows), separators=(",", ":")).encode()
+
+    measure("json", lambda: json.dumps(rows, separators=(",", ":")).encode())
+    measure("columnar json", lambda: json.dumps(to_columnar(rows), separators=(",", ":")).encode())
+    measure("json + gzip", lambda: gzip.compress(as_json, compresslevel=6))
+    measure("columnar + gzip", lambda: gzip.compress(as_columnar, compresslevel=6))
+
+    msgpack = _optional_module("msgpack")
+    if msgpack:
+        measure("msgpack", lambda: msgpack.packb(rows))
+    else:
+        print("msgpack not installed, skipped")
+    brotli = _optional_module("brotli")
+    if brotli:
+        measure("json + brotli", lambda: brotli.compress(as_json, quality=5))
+    else:
+        print("brotli not installed, skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Memory footprint of a driver fleet held as Driver entities vs a FleetSnapshot.
+
+Run with: python -m benchmarks.bench_fleet_memory [fleet_size]
+"""
+
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from app.domain.entities import Driver, DriverStatus, Location
+from app.domain.fleet import FleetSnapshot
+from app.domain.services import find_closest_drivers
+
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+
+
+def build_drivers(size):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    return [
+        Driver(
+            id=i,
+            name=f"Driver {i}",
+            email=f"driver{i}@taxi24.com",
+            phone=f"+51{900000000 + i}",
+            license_number=f"LIC{i:06d}",
+            status=rng.choice(list(DriverStatus)),
+            current_location=Location(
+                latitude=-12.05 + rng.uniform(-0.2, 0.2),
+                longitude=-77.04 + rng.uniform(-0.2, 0.2)
+            ),
+            created_at=now,
+            updated_at=now
+        )
+        for i in range(size)
+    ]
+
+
+def measure(label, factory):
+    gc.collect()
+    tracemalloc.start()
+    result = factory()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {current / 1024 / 1024:8.2f} MiB")
+    return result
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"fleet size: {size}")
+    drivers = measure("list[Driver]", lambda: build_drivers(size))
+    snapshot = measure("FleetSnapshot", lambda: FleetSnapshot.from_drivers(drivers))
+
+    for label, fleet in (("closest 3 (list)", drivers), ("closest 3 (snapshot)", snapshot)):
+        start = time.perf_counter()
+        find_closest_drivers(fleet, PICKUP, 3)
+        print(f"{label:<28} {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
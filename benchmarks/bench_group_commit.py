@@ -0,0 +1,80 @@
+"""
+Write throughput of per-write commits vs. unit-of-work and group commit on a file SQLite database.
+
+Run with: python -m benchmarks.bench_group_commit
+"""
+
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.domain.entities import Passenger
+from app.infrastructure.models import Base
+from app.infrastructure.repositories import SQLPassengerRepository
+from app.infrastructure.unit_of_work import GroupCommitter, SQLUnitOfWork
+
+WRITES = 800
+BATCH = 50
+THREADS = 16
+
+
+def passenger(label, i):
+    return Passenger(id=None, name="Passenger", email=f"{label}{i}@email.com", phone="+5191")
+
+
+def report(label, elapsed):
+    print(f"{label:<32} {WRITES / elapsed:10,.0f} writes/s")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{Path(directory) / 'bench.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        db = factory()
+        repo = SQLPassengerRepository(db)
+        start = time.perf_counter()
+        for i in range(WRITES):
+            repo.create(passenger("single", i))
+        report("commit per write", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for offset in range(0, WRITES, BATCH):
+            with SQLUnitOfWork(db):
+                for i in range(offset, offset + BATCH):
+                    repo.create(passenger("unit", i))
+        report(f"unit of work ({BATCH} per commit)", time.perf_counter() - start)
+        db.close()
+
+        def own_sessions(thread_index):
+            session = factory()
+            thread_repo = SQLPassengerRepository(session)
+            for i in range(thread_index, WRITES, THREADS):
+                thread_repo.create(passenger("threads", i))
+            session.close()
+
+        committer = GroupCommitter(factory)
+
+        def group_commit(thread_index):
+            for i in range(thread_index, WRITES, THREADS):
+                committer.run(lambda session, i=i: SQLPassengerRepository(session).create(passenger("group", i)))
+
+        for label, target in ((f"{THREADS} threads, own commits", own_sessions), (f"{THREADS} threads, group commit", group_commit)):
+            threads = [threading.Thread(target=target, args=(index,)) for index in range(THREADS)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            report(label, time.perf_counter() - start)
+        committer.stop()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Heartbeat ingestion and sweep cost for a large fleet.
+
+Run with: python -m benchmarks.bench_heartbeats
+"""
+
+import time
+
+from app.infrastructure.heartbeats import HeartbeatTracker
+
+DRIVERS = 50000
+BATCH = 1000
+
+
+def main():
+    tracker = HeartbeatTracker(ttl_seconds=60)
+
+    start = time.perf_counter()
+    for driver_id in range(DRIVERS):
+        tracker.beat(driver_id, now=0.0)
+    elapsed = time.perf_counter() - start
+    print(f"{'single beats':<24} {DRIVERS / elapsed:12,.0f} heartbeats/s")
+
+    ids = list(range(DRIVERS))
+    start = time.perf_counter()
+    for offset in range(0, DRIVERS, BATCH):
+        tracker.beat_many(ids[offset:offset + BATCH], now=30.0)
+    elapsed = time.perf_counter() - start
+    print(f"{f'batches of {BATCH}':<24} {DRIVERS / elapsed:12,.0f} heartbeats/s")
+
+    tracker.beat_many(ids[: DRIVERS // 2], now=90.0)
+    start = time.perf_counter()
+    expired = tracker.pop_expired(now=100.0)
+    elapsed = time.perf_counter() - start
+    print(f"{'sweep':<24} {len(expired):12,} expired in {elapsed * 1e3:.2f} ms ({len(tracker):,} still live)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Per-request overhead of the idempotency layer.
+
+Run with: python -m benchmarks.bench_idempotency
+"""
+
+import hashlib
+import time
+
+from app.infrastructure.idempotency import IdempotencyStore, StoredResponse
+from app.presentation.schemas import TripRequestSchema
+
+ITERATIONS = 100000
+
+PAYLOAD = TripRequestSchema(
+    passenger_id=1,
+    pickup_location={"latitude": -12.0464, "longitude": -77.0428},
+    destination_location={"latitude": -12.0500, "longitude": -77.0450}
+)
+RESPONSE = StoredResponse(200, b'{"id": 1, "status": "requested"}')
+
+
+def bench(label, fn):
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / ITERATIONS * 1e6:8.2f} us/request")
+
+
+def main():
+    store = IdempotencyStore(ttl_seconds=3600, max_entries=ITERATIONS * 2, wait_timeout_seconds=5)
+
+    def fingerprint(_):
+        return hashlib.sha256(PAYLOAD.model_dump_json().encode()).hexdigest()
+
+    fp = fingerprint(0)
+    bench("fingerprint payload", fingerprint)
+    bench("first request (miss)", lambda i: store.execute(f"key-{i}", fp, lambda: RESPONSE))
+    bench("duplicate (replay)", lambda i: store.execute(f"key-{i}", fp, lambda: RESPONSE))
+    print(f"keys stored: {len(store)}")
+
+
+if __name__ == "__main__":
+    main()
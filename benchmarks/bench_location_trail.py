@@ -0,0 +1,79 @@
+"""
+Location trail append rate and storage cost per ping, through the real flush path.
+
+Drivers send a batch of 1 Hz pings every 10 s while a simulated clock drives
+the flusher on its usual interval, so chunks are cut and aged exactly as in
+production and the stored rows are measured in the database.
+
+Run with: python -m benchmarks.bench_location_trail
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.infrastructure.location_trail import LocationTrailFlusher, LocationTrailStore
+from app.infrastructure.models import Base, LocationTrailChunkModel
+
+DRIVERS = 500
+SECONDS = 600  # ten minutes at 1 Hz
+BATCH = 10
+
+
+def main():
+    random.seed(24)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    start_time = datetime(2024, 3, 1, 12, 0, 0)
+    now = [start_time.timestamp()]
+    store = LocationTrailStore(settings.trail_chunk_points, settings.trail_chunk_span_seconds, clock=lambda: now[0])
+    flusher = LocationTrailFlusher(store, session_factory, settings.trail_flush_interval_seconds)
+    positions = {driver_id: [-12.05 + random.uniform(-0.1, 0.1), -77.04 + random.uniform(-0.1, 0.1)] for driver_id in range(DRIVERS)}
+
+    def batch_for(position, offset):
+        batch = []
+        for second in range(offset, offset + BATCH):
+            position[0] += random.uniform(-5e-5, 5e-5)
+            position[1] += random.uniform(-5e-5, 5e-5)
+            batch.append((position[0], position[1], start_time + timedelta(seconds=second, milliseconds=random.randint(-30, 30))))
+        return batch
+
+    append_elapsed = flush_elapsed = 0.0
+    interval = settings.trail_flush_interval_seconds
+    next_flush = interval
+    for offset in range(0, SECONDS, BATCH):
+        now[0] = start_time.timestamp() + offset + BATCH
+        batches = [(driver_id, batch_for(position, offset)) for driver_id, position in positions.items()]
+        started = time.perf_counter()
+        for driver_id, batch in batches:
+            store.append_many(driver_id, batch)
+        append_elapsed += time.perf_counter() - started
+        while next_flush <= offset + BATCH:
+            started = time.perf_counter()
+            flusher.run_once()
+            flush_elapsed += time.perf_counter() - started
+            next_flush += interval
+
+    total = DRIVERS * SECONDS
+    chunks = LocationTrailChunkModel.__table__.c
+    with engine.connect() as conn:
+        rows, points, size = conn.execute(
+            select(func.count(), func.sum(chunks.point_count), func.sum(func.length(chunks.data)))
+        ).one()
+    print(f"{'append':<16} {total / append_elapsed:12,.0f} pings/s")
+    print(f"{'flush':<16} {points / flush_elapsed:12,.0f} pings/s")
+    print(
+        f"{'storage':<16} {size / points:12.2f} bytes/ping ({rows:,} rows, {points / rows:.0f} pings/row, "
+        f"{total - points:,} pings still open; raw floats would be 24 bytes/ping)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Time for a worker to become ready: a full fleet load vs a snapshot restore plus change-feed replay.
+
+Run with: python -m benchmarks.bench_warm_restart [fleet_size]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import sessionmaker
+
+from app.infrastructure.change_feed import ChangeFeedPoller
+from app.infrastructure.database import make_engine
+from app.infrastructure.fleet_state import FleetState
+from app.infrastructure.fleet_state_file import restore_fleet_state, write_fleet_state
+from app.infrastructure.models import Base, ChangeEventModel, DriverModel, DriverStatusEnum, PassengerModel, TripModel, TripStatusEnum
+
+ACTIVE_TRIPS = 2000
+DELTAS = 5000  # driver updates committed between the snapshot and the restart
+
+
+def populate(session_factory, size):
+    rng = random.Random(7)
+    db = session_factory()
+    db.execute(insert(DriverModel), [
+        {
+            "name": f"Driver {i}", "email": f"driver{i}@taxi24.com", "phone": "+51900000000", "license_number": f"LIC{i:07d}",
+            "status": rng.choice(list(DriverStatusEnum)), "latitude": -12.05 + rng.uniform(-0.2, 0.2),
+            "longitude": -77.04 + rng.uniform(-0.2, 0.2), "version": 1
+        }
+        for i in range(1, size + 1)
+    ])
+    db.execute(insert(PassengerModel), [{"name": "Pedro", "email": "p@email.com", "phone": "+5191"}])
+    db.execute(insert(TripModel), [
+        {"passenger_id": 1, "driver_id": i, "pickup_latitude": -12.05, "pickup_longitude": -77.04,
+         "status": TripStatusEnum.ACCEPTED, "version": 2}
+        for i in range(1, ACTIVE_TRIPS + 1)
+    ])
+    db.commit()
+    db.close()
+
+
+def add_deltas(session_factory, size):
+    """Driver moves, each written to its row and to the outbox as the repositories do"""
+    rng = random.Random(11)
+    db = session_factory()
+    for i in range(DELTAS):
+        driver_id = rng.randint(1, size)
+        change = {
+            "status": "available", "latitude": -12.05 + rng.uniform(-0.2, 0.2),
+            "longitude": -77.04 + rng.uniform(-0.2, 0.2), "version": 2 + i
+        }
+        db.execute(update(DriverModel).where(DriverModel.id == driver_id).values(
+            status=DriverStatusEnum.AVAILABLE, latitude=change["latitude"], longitude=change["longitude"], version=change["version"]
+        ))
+        db.add(ChangeEventModel(entity="driver", entity_id=driver_id, payload=json.dumps(change)))
+    db.commit()
+    db.close()
+
+
+def ready(session_factory, restore):
+    """Seconds until a fresh worker's fleet state is current"""
+    start = time.perf_counter()
+    state = FleetState()
+    db = session_factory()
+    try:
+        if not restore(state, db):
+            state.load(db)
+    finally:
+        db.close()
+    ChangeFeedPoller(session_factory, state.apply, 1.0, 500, 3600, cursor=state.cursor).poll_once()
+    return time.perf_counter() - start, state
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{directory}/bench.db"
+        snapshot = os.path.join(directory, "fleet.snapshot")
+        engine = make_engine(url)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        populate(session_factory, size)
+
+        _, state = ready(session_factory, lambda state, db: False)
+        start = time.perf_counter()
+        write_fleet_state(state, snapshot, url)
+        write_seconds = time.perf_counter() - start
+        add_deltas(session_factory, size)
+
+        cold, cold_state = ready(session_factory, lambda state, db: False)
+        warm, warm_state = ready(session_factory, lambda state, db: restore_fleet_state(state, snapshot, url, db))
+        assert warm_state.drivers == cold_state.drivers and warm_state.active_trips == cold_state.active_trips
+        engine.dispose()
+
+        print(f"fleet: {size:,} drivers, {ACTIVE_TRIPS:,} active trips, {DELTAS:,} changes since the snapshot")
+        print(f"{'snapshot write':<24} {write_seconds * 1000:10.1f} ms  ({os.path.getsize(snapshot) / 1024 / 1024:.2f} MiB)")
+        print(f"{'ready, full load':<24} {cold * 1000:10.1f} ms")
+        print(f"{'ready, snapshot + replay':<24} {warm * 1000:10.1f} ms  ({cold / warm:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,68 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.core.config import settings
-from app.presentation.api import router
-from app.infrastructure.database import create_tables
-from app.infrastructure.seed_data import create_sample_data
+from app.domain.exceptions import ConcurrencyConflictError
+from app.presentation.api import overrides, router
+from app.presentation.encoding import CompressionMiddleware, NegotiatedResponse, ResponseFormatMiddleware
+from app.presentation.middleware import (
+    AdmissionControlMiddleware, QueryBudgetMiddleware, ReadYourWritesMiddleware, TenantMiddleware
+)
+from app.infrastructure.query_tracking import install_query_tracking
+
+
+def bootstrap_database():
+    """Create the schema and sample data; skipped in fast-boot mode (use `python -m app.cli init-db --seed`)"""
+    from app.infrastructure.database import create_tables
+    from app.infrastructure.seed_data import create_sample_data
+    create_tables()
+    create_sample_data()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from app.infrastructure.dependencies import default_tenant, tenants
+    if not settings.fast_boot:
+        bootstrap_database()
+    # Cities start on their first request
+    default_tenant.start()
+    yield
+    tenants.stop_all()
+    default_tenant.stop()
+
 
 app = FastAPI(
     title=settings.api_title,
     description=settings.api_description,
-    version=settings.api_version
+    version=settings.api_version,
+    lifespan=lifespan,
+    default_response_class=NegotiatedResponse
 )
 
-app.include_router(router, prefix="/api/v1")
+# The router carries its prefix already; include_router would build every route a second time.
+# Its routes look up dependency overrides on `overrides`, so the app uses the same dict.
+app.router.routes.extend(router.routes)
+app.dependency_overrides = overrides.dependency_overrides
 
-@app.on_event("startup")
-def startup_event():
-    create_tables()
-    create_sample_data()
+install_query_tracking()
+app.add_middleware(QueryBudgetMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(ResponseFormatMiddleware)
+# Wraps the middleware above, so query budgets and routes run as the request's city
+app.add_middleware(TenantMiddleware)
+
+if settings.compression_enabled:
+    # Outside everything that builds the response, so it sees the final body and ETag
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size_bytes)
+
+if settings.rate_limit_enabled:
+    # Added last so it is outermost: requests are limited or shed before a city is loaded or any work is done
+    app.add_middleware(AdmissionControlMiddleware)
+
+@app.exception_handler(ConcurrencyConflictError)
+def concurrency_conflict_handler(request: Request, exc: ConcurrencyConflictError):
+    return JSONResponse(status_code=409, content={"detail": "The resource was modified concurrently, please retry."})
 
 @app.get("/")
 def read_root():
@@ -23,4 +70,5 @@ def read_root():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host=settings.host, port=settings.port)
\ No newline at end of file
+    # An import string lets uvicorn fork WORKERS independent processes
+    uvicorn.run("main:app", host=settings.host, port=settings.port, workers=settings.workers)
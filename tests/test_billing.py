@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.application.services import InvoiceService
+from app.domain.billing import Rounding, TaxRate, bill, divide, exact_cents, to_cents
+from app.domain.entities import Location, Passenger, Trip, TripStatus
+from app.infrastructure.models import Base, InvoiceModel
+from app.infrastructure.repositories import SQLInvoiceRepository, SQLPassengerRepository, SQLTripRepository
+
+
+@pytest.mark.parametrize("rounding, expected", [
+    # 2.5, 3.5, -2.5, 2.4, 2.6 in order
+    (Rounding.HALF_UP, [3, 4, -3, 2, 3]),
+    (Rounding.HALF_EVEN, [2, 4, -2, 2, 3]),
+    (Rounding.HALF_DOWN, [2, 3, -2, 2, 3]),
+    (Rounding.UP, [3, 4, -3, 3, 3]),
+    (Rounding.DOWN, [2, 3, -2, 2, 2]),
+])
+def test_rounding_modes(rounding, expected):
+    assert [divide(n, 10, rounding) for n in (25, 35, -25, 24, 26)] == expected
+    assert [to_cents(Decimal(n) / 1000, rounding) for n in (25, 35, -25, 24, 26)] == expected
+    # The fast paths for non-negative amounts agree with divide()
+    rate = TaxRate("0.125")  # 1/8: ties every 4 cents
+    amounts = list(range(0, 400))
+    assert list(bill(amounts, rate, rounding).taxes) == [rate.tax(amount, rounding) for amount in amounts]
+
+
+def test_bill_totals_reconcile_exactly():
+    lines = bill([1999, 1, 250, 0], TaxRate(0.18))
+    assert list(lines.taxes) == [360, 0, 45, 0]
+    assert list(lines.totals) == [2359, 1, 295, 0]
+    sums = lines.sums()
+    assert (sums.amount, sums.tax, sums.total) == (2250, 405, 2655)
+    assert sums.amount + sums.tax == sums.total
+    assert exact_cents(Decimal("12.30")) == 1230 and exact_cents(Decimal("2.2356")) is None
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    SQLPassengerRepository(session).create(Passenger(id=None, name="Pedro", email="p@email.com", phone="+5191"))
+    yield session
+    session.close()
+
+
+def completed_trip(db, fare):
+    return SQLTripRepository(db).create(Trip(
+        id=None, passenger_id=1, driver_id=None, pickup_location=Location(latitude=-12.0, longitude=-77.0),
+        destination_location=None, status=TripStatus.COMPLETED, fare=Decimal(fare), distance_km=None
+    ))
+
+
+def test_invoices_are_billed_in_cents_and_reconciled(db):
+    service = InvoiceService(SQLInvoiceRepository(db), SQLTripRepository(db))
+    trips = [completed_trip(db, fare) for fare in ("19.99", "12.50", "7.25")]
+    invoice = service.generate_invoice_for_trip(trips[0].id)
+    assert (invoice.amount, invoice.tax_amount, invoice.total_amount) == (
+        Decimal("19.99"), Decimal("3.60"), Decimal("23.59")
+    )
+    for trip in trips[1:]:
+        service.generate_invoice_for_trip(trip.id)
+
+    report = service.reconcile(batch_size=2)
+    assert report.reconciled and report.invoices == 3
+    assert report.stored_total == Decimal("23.59") + Decimal("14.75") + Decimal("8.56")
+    assert report.expected.total == 2359 + 1475 + 856
+
+    # A pre-cents invoice stored with an unrounded tax, and one billed at another fare
+    db.execute(update(InvoiceModel).where(InvoiceModel.trip_id == trips[1].id).values(
+        amount=Decimal("12.00"), total_amount=Decimal("14.25")
+    ))
+    db.execute(update(InvoiceModel).where(InvoiceModel.trip_id == trips[2].id).values(
+        tax_amount=Decimal("1.3049"), total_amount=Decimal("8.5549")
+    ))
+    db.commit()
+    report = service.reconcile(batch_size=2, max_mismatches=3)
+    assert not report.reconciled and report.mismatched_invoices == 2
+    assert [(m.trip_id, m.column, m.stored, m.expected) for m in report.mismatches] == [
+        (trips[1].id, "amount", Decimal("12.00"), Decimal("12.50")),
+        (trips[1].id, "total_amount", Decimal("14.25"), Decimal("14.75")),
+        (trips[2].id, "tax_amount", Decimal("1.3049"), Decimal("1.31")),
+    ]
+    assert report.stored_tax == Decimal("3.60") + Decimal("2.25") + Decimal("1.3049")
@@ -0,0 +1,202 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.domain.entities import Driver, DriverStatus, Location, Passenger, Trip, TripStatus
+from app.infrastructure.change_feed import ChangeFeedPoller, latest_cursor, prune_changes, read_changes
+from app.infrastructure.database import make_engine
+from app.infrastructure.fleet_state import FleetState
+from app.infrastructure.models import Base, ChangeEventModel
+from app.infrastructure.repositories import SQLDriverRepository, SQLPassengerRepository, SQLTripRepository
+from app.infrastructure.unit_of_work import SQLUnitOfWork
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    url = f"sqlite:///{tmp_path}/feed.db"
+    engine = make_engine(url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    SQLDriverRepository(db).create(Driver(
+        id=None, name="Carlos", email="carlos@taxi24.com", phone="+51987654321", license_number="LIC001",
+        status=DriverStatus.AVAILABLE, current_location=Location(latitude=-12.0464, longitude=-77.0428)
+    ))
+    SQLPassengerRepository(db).create(Passenger(id=None, name="Pedro", email="p@email.com", phone="+5191"))
+    db.close()
+    return url
+
+
+def start_worker(session_factory):
+    state = FleetState()
+    db = session_factory()
+    state.load(db)
+    db.close()
+    poller = ChangeFeedPoller(
+        session_factory, state.apply, poll_interval_seconds=0.01, batch_size=2, retention_seconds=3600,
+        cursor=state.cursor
+    )
+    return state, poller
+
+
+def test_workers_converge_on_writes(database_url):
+    session_factory = sessionmaker(bind=make_engine(database_url))
+    state_a, poller_a = start_worker(session_factory)
+    state_b, poller_b = start_worker(session_factory)
+    assert state_a.drivers[1][0] == DriverStatus.AVAILABLE
+
+    db = session_factory()
+    driver_repo = SQLDriverRepository(db)
+    driver = driver_repo.get_by_id(1)
+    driver.status = DriverStatus.BUSY
+    driver_repo.update(driver)
+    trip = SQLTripRepository(db).create(Trip(
+        id=None, passenger_id=1, driver_id=1, pickup_location=Location(latitude=-12.0, longitude=-77.0),
+        destination_location=None, status=TripStatus.REQUESTED, fare=None, distance_km=None
+    ))
+    trip.status = TripStatus.CANCELLED
+    SQLTripRepository(db).update(trip)
+    db.close()
+
+    # batch_size=2 forces the poller to page through the three events
+    assert poller_a.poll_once() == 3
+    assert poller_b.poll_once() == 3
+    for state in (state_a, state_b):
+        assert state.drivers[1][0] == DriverStatus.BUSY
+        assert state.active_trips == {}
+        assert state.cursor == poller_a.cursor
+    assert poller_a.poll_once() == 0
+
+
+def test_replayed_events_are_ignored(database_url):
+    session_factory = sessionmaker(bind=make_engine(database_url))
+    db = session_factory()
+    events = read_changes(db, 0, 100)
+    state = FleetState()
+    state.load(db)
+    db.close()
+
+    before = dict(state.drivers)
+    state.apply(events)
+    state.apply(events)
+    assert state.drivers == before
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def driver_event(event_id, status, version):
+    payload = json.dumps({"status": status, "latitude": -12.0, "longitude": -77.0, "version": version})
+    return ChangeEventModel(id=event_id, entity="driver", entity_id=1, payload=payload)
+
+
+def test_events_committed_out_of_id_order_are_not_skipped(database_url):
+    # With concurrent writers (PostgreSQL) a lower id can become visible after a higher one
+    session_factory = sessionmaker(bind=make_engine(database_url))
+    state, _ = start_worker(session_factory)
+    clock = Clock()
+    poller = ChangeFeedPoller(
+        session_factory, state.apply, poll_interval_seconds=0.01, batch_size=10, retention_seconds=3600,
+        cursor=state.cursor, gap_grace_seconds=5, clock=clock
+    )
+    base = state.cursor
+    db = session_factory()
+    db.add(driver_event(base + 2, "offline", 3))
+    db.add(ChangeEventModel(id=base + 4, entity="trip", entity_id=9, payload=json.dumps(
+        {"status": "cancelled", "passenger_id": 1, "driver_id": 1, "version": 2}
+    )))
+    db.commit()
+    assert poller.poll_once() == 2
+    assert state.drivers[1][0] == DriverStatus.OFFLINE
+    assert poller.cursor == state.cursor == base  # base + 1 and base + 3 may still commit
+
+    db.add(driver_event(base + 1, "busy", 2))  # late, and older than what was applied
+    db.add(ChangeEventModel(id=base + 3, entity="trip", entity_id=9, payload=json.dumps(
+        {"status": "requested", "passenger_id": 1, "driver_id": 1, "version": 1}
+    )))
+    db.commit()
+    assert poller.poll_once() == 2
+    assert state.drivers[1][0] == DriverStatus.OFFLINE and state.active_trips == {}
+    assert poller.cursor == state.cursor == base + 4
+
+    db.add(driver_event(base + 6, "available", 4))
+    db.commit()
+    db.close()
+    poller.poll_once()
+    assert poller.cursor == base + 4  # base + 5 is missing
+    clock.now += 6  # it rolled back
+    poller.poll_once()
+    assert poller.cursor == state.cursor == base + 6
+
+
+def test_prune_drops_old_events(database_url):
+    db = sessionmaker(bind=make_engine(database_url))()
+    assert prune_changes(db, retention_seconds=3600) == 0
+    assert prune_changes(db, retention_seconds=-1) == 1
+    assert read_changes(db, 0, 100) == []
+    db.close()
+
+
+def test_changes_rolled_back_with_their_savepoint_are_not_published(database_url):
+    db = sessionmaker(bind=make_engine(database_url))()
+    cursor = latest_cursor(db)
+    repo = SQLDriverRepository(db)
+    with SQLUnitOfWork(db):
+        driver = repo.get_by_id(1)
+        driver.status = DriverStatus.BUSY
+        repo.update(driver)
+        with pytest.raises(RuntimeError), SQLUnitOfWork(db):
+            driver = repo.get_by_id(1)
+            driver.status = DriverStatus.OFFLINE
+            repo.update(driver)
+            raise RuntimeError("rolled back")
+    assert [event.payload["status"] for event in read_changes(db, cursor, 10)] == ["busy"]
+
+    driver.status = DriverStatus.AVAILABLE
+    repo.update(driver)
+    db.close()  # the commit inside update() published it; nothing is left pending
+    db = sessionmaker(bind=make_engine(database_url))()
+    assert [event.payload["status"] for event in read_changes(db, cursor, 10)] == ["busy", "available"]
+    db.close()
+
+
+def test_cross_process_propagation(database_url):
+    session_factory = sessionmaker(bind=make_engine(database_url))
+    state, poller = start_worker(session_factory)
+    poller.start()
+    try:
+        writer = (
+            "from sqlalchemy.orm import sessionmaker\n"
+            "from app.domain.entities import DriverStatus\n"
+            "from app.infrastructure.database import make_engine\n"
+            "from app.infrastructure.repositories import SQLDriverRepository\n"
+            f"repo = SQLDriverRepository(sessionmaker(bind=make_engine({database_url!r}))())\n"
+            "driver = repo.get_by_id(1)\n"
+            "driver.status = DriverStatus.OFFLINE\n"
+            "repo.update(driver)\n"
+        )
+        subprocess.run([sys.executable, "-c", writer], cwd=ROOT, env=dict(os.environ), check=True)
+        deadline = time.monotonic() + 5
+        while state.drivers[1][0] != DriverStatus.OFFLINE and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert state.drivers[1][0] == DriverStatus.OFFLINE
+    finally:
+        poller.stop()
+
+
+def test_fleet_state_endpoint(client):
+    response = client.get("/api/v1/fleet/state")
+    assert response.status_code == 200
+    assert set(response.json()) == {"cursor", "drivers", "active_trips"}
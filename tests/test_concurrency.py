@@ -0,0 +1,117 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.application.services import RetryPolicy, TripService
+from app.domain.entities import Driver, DriverStatus, Location, Passenger, TripStatus
+from app.domain.exceptions import ConcurrencyConflictError
+from app.infrastructure.models import Base
+from app.infrastructure.repositories import SQLDriverRepository, SQLPassengerRepository, SQLTripRepository
+
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def seed(db):
+    driver_repo = SQLDriverRepository(db)
+    for i in range(2):
+        driver_repo.create(Driver(
+            id=None, name=f"Driver {i}", email=f"d{i}@taxi24.com", phone="+51900000000",
+            license_number=f"LIC{i}", status=DriverStatus.AVAILABLE,
+            current_location=Location(latitude=PICKUP.latitude + i * 0.001, longitude=PICKUP.longitude)
+        ))
+    SQLPassengerRepository(db).create(Passenger(id=None, name="Pedro", email="p@email.com", phone="+51912345678"))
+
+
+def make_trip_service(db):
+    return TripService(
+        SQLTripRepository(db), SQLDriverRepository(db), SQLPassengerRepository(db),
+        retry_policy=RetryPolicy(attempts=3, backoff_seconds=0)
+    )
+
+
+def test_stale_update_raises_conflict(session_factory):
+    db = session_factory()
+    seed(db)
+    repo = SQLDriverRepository(db)
+    first = repo.get_by_id(1)
+    stale = repo.get_by_id(1)
+
+    first.status = DriverStatus.BUSY
+    updated = repo.update(first)
+    assert updated.version == first.version + 1
+
+    stale.status = DriverStatus.OFFLINE
+    with pytest.raises(ConcurrencyConflictError):
+        repo.update(stale)
+    assert repo.get_by_id(1).status == DriverStatus.BUSY
+
+
+def test_update_of_missing_row_returns_entity(session_factory):
+    repo = SQLDriverRepository(session_factory())
+    ghost = Driver(id=99, name="Ghost", email="g@taxi24.com", phone="0", license_number="X",
+                   status=DriverStatus.AVAILABLE, current_location=None, version=1)
+    assert repo.update(ghost) is ghost
+
+
+def test_retry_policy_gives_up_after_attempts():
+    calls = []
+
+    def always_conflicts():
+        calls.append(1)
+        raise ConcurrencyConflictError("conflict")
+
+    with pytest.raises(ConcurrencyConflictError):
+        RetryPolicy(attempts=3, backoff_seconds=0).run(always_conflicts)
+    assert len(calls) == 3
+
+
+def test_create_trip_retries_when_driver_is_claimed_concurrently(session_factory):
+    db = session_factory()
+    seed(db)
+    service = make_trip_service(db)
+    other_request = SQLDriverRepository(session_factory())
+    original_search = service.driver_repo.get_available_within_radius
+    raced = []
+
+    def racing_search(location, radius_km):
+        drivers = original_search(location, radius_km)
+        if not raced:
+            # Another request claims the closest driver between our read and our write
+            raced.append(1)
+            taken = other_request.get_by_id(drivers[0].id)
+            taken.status = DriverStatus.BUSY
+            other_request.update(taken)
+        return drivers
+
+    service.driver_repo.get_available_within_radius = racing_search
+    trip = service.create_trip_request(1, PICKUP)
+    assert trip is not None
+    assert trip.driver_id == 2
+    assert len(raced) == 1
+
+
+def test_complete_trip_does_not_resurrect_offline_driver(session_factory):
+    db = session_factory()
+    seed(db)
+    service = make_trip_service(db)
+    trip = service.create_trip_request(1, PICKUP)
+
+    driver_repo = SQLDriverRepository(session_factory())
+    driver = driver_repo.get_by_id(trip.driver_id)
+    driver.status = DriverStatus.OFFLINE
+    driver_repo.update(driver)
+
+    completed = service.complete_trip(trip.id, Location(latitude=-12.05, longitude=-77.045), Decimal("10.00"))
+    assert completed.status == TripStatus.COMPLETED
+    assert SQLDriverRepository(session_factory()).get_by_id(trip.driver_id).status == DriverStatus.OFFLINE
+    assert service.complete_trip(trip.id, Location(latitude=-12.05, longitude=-77.045), Decimal("10.00")) is None
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.domain.entities import Driver, DriverStatus, Location
+from app.domain.forecast import fit_demand_forecast, hour_of_week
+from app.infrastructure.demand_forecast import DemandForecastFile, fit_from_trips, load_forecast, save_forecast
+from app.infrastructure.dependencies import default_tenant
+from app.infrastructure.models import Base, TripModel, TripStatusEnum
+from app.infrastructure.repositories import SQLDriverRepository
+from app.infrastructure.trip_partitions import archive_settled_trips
+
+START = datetime(2024, 1, 1)  # a Monday
+MONDAY_9AM = START + timedelta(weeks=4, hours=9, minutes=30)
+HERE = Location(latitude=-12.0464, longitude=-77.0428)
+NORTH = Location(latitude=-12.0284, longitude=-77.0428)  # 2 km away
+FAR = Location(latitude=-11.9564, longitude=-77.0428)  # 10 km away
+
+
+def pickups(location, week, hour, count):
+    moment = START + timedelta(weeks=week, hours=hour, minutes=5)
+    return [(moment, location.latitude, location.longitude)] * count
+
+
+def test_fit_smooths_weekly_counts_per_cell_and_hour():
+    history = pickups(NORTH, 0, 9, 2) + pickups(NORTH, 3, 9, 10) + pickups(HERE, 3, 10, 4) + pickups(HERE, 4, 9, 50)
+    forecast = fit_demand_forecast(history, START, weeks=4, cell_size_km=1.0, alpha=0.5)
+
+    # level: 2 in week 0, halved through the empty weeks 1 and 2, then 0.5 * 10 + 0.5 * 0.5
+    assert forecast.expected_pickups(NORTH, MONDAY_9AM) == pytest.approx(5.25)
+    assert forecast.expected_pickups(HERE, MONDAY_9AM + timedelta(hours=1)) == pytest.approx(2.0)
+    assert forecast.expected_pickups(HERE, MONDAY_9AM) == 0.0  # week 4 is outside the fit
+    assert forecast.expected_pickups(FAR, MONDAY_9AM) == 0.0
+    assert hour_of_week(MONDAY_9AM + timedelta(days=6)) == 6 * 24 + 9
+
+
+def test_suggestions_rank_cells_by_pickups_per_idle_driver():
+    history = pickups(NORTH, 0, 9, 6) + pickups(HERE, 0, 9, 1) + pickups(FAR, 0, 9, 100)
+    east = Location(latitude=HERE.latitude, longitude=HERE.longitude + 0.0185)  # 2 km away
+    history += pickups(east, 0, 9, 4)
+    forecast = fit_demand_forecast(history, START, weeks=1, cell_size_km=1.0, alpha=0.5)
+    moment = START + timedelta(hours=9)
+
+    suggestions = forecast.suggest(HERE, moment, radius_km=5, limit=3)
+    assert [suggestion.expected_pickups for suggestion in suggestions] == [6, 4]  # FAR is out of range
+    assert suggestions[0].distance_km == pytest.approx(2.0, abs=0.8)
+
+    # Two drivers idle north already: 6 / 3 per driver loses to 4 / 1 east
+    supply = {forecast.zone_for(HERE): 1, forecast.zone_for(NORTH): 2}
+    assert [suggestion.idle_drivers for suggestion in forecast.suggest(HERE, moment, 5, 3, supply)] == [0, 2]
+    assert forecast.suggest(NORTH, moment, 5, 3) == []  # already in the best cell
+
+
+def test_forecast_file_round_trip_and_reload(tmp_path):
+    path = str(tmp_path / "forecast.json")
+    file = DemandForecastFile(path)
+    assert file.get() is None
+
+    save_forecast(fit_demand_forecast(pickups(NORTH, 0, 9, 3), START, 1, 1.0, 0.3, fitted_at=START), path)
+    loaded = file.get()
+    assert loaded.fitted_at == START
+    assert loaded.expected_pickups(NORTH, START + timedelta(hours=9)) == pytest.approx(3.0)
+    assert file.get() is loaded  # unchanged file, no reload
+
+    forecast = fit_demand_forecast(pickups(HERE, 0, 9, 1), START, 1, 1.0, 0.3)
+    save_forecast(forecast, path)
+    assert load_forecast(path).cells == forecast.cells
+
+
+def test_fit_reads_hot_and_archived_trips():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    for week, status in ((0, TripStatusEnum.COMPLETED), (1, TripStatusEnum.REQUESTED), (9, TripStatusEnum.CANCELLED)):
+        db.add(TripModel(
+            passenger_id=1, status=status, pickup_latitude=NORTH.latitude, pickup_longitude=NORTH.longitude,
+            created_at=START + timedelta(weeks=week, hours=9)
+        ))
+    db.commit()
+    assert archive_settled_trips(db, START + timedelta(weeks=1)) == 1
+
+    forecast = fit_from_trips(db, weeks=2, cell_size_km=1.0, alpha=0.5, now=START + timedelta(weeks=2))
+    assert forecast.expected_pickups(NORTH, START + timedelta(hours=9)) == pytest.approx(1.0)
+    db.close()
+
+
+def test_reposition_endpoint(client, db_session, tmp_path, monkeypatch):
+    driver = SQLDriverRepository(db_session).create(Driver(
+        id=None, name="Idle", email="idle.reposition@taxi24.com", phone="+51900000001", license_number="REPO1",
+        status=DriverStatus.AVAILABLE, current_location=Location(latitude=-13.5, longitude=-71.97)
+    ))
+    monkeypatch.setattr(default_tenant.demand_forecast_file, "path", str(tmp_path / "forecast.json"))
+    assert client.get(f"/api/v1/drivers/{driver.id}/reposition").status_code == 503
+
+    now = datetime.utcnow()
+    hotspot = Location(latitude=-13.52, longitude=-71.97)
+    history = [(now - timedelta(weeks=1), hotspot.latitude, hotspot.longitude)] * 5
+    save_forecast(fit_demand_forecast(history, now - timedelta(weeks=1), 1, 1.0, 0.3), default_tenant.demand_forecast_file.path)
+
+    suggestions = client.get(f"/api/v1/drivers/{driver.id}/reposition").json()
+    assert len(suggestions) == 1 and suggestions[0]["expected_pickups"] == pytest.approx(5.0)
+    assert suggestions[0]["distance_km"] < 3
+    assert client.get("/api/v1/drivers/999999/reposition").status_code == 404
@@ -0,0 +1,106 @@
+import math
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.application.services import TripService
+from app.domain.entities import Driver, DriverStatus, Location, Passenger
+from app.domain.services import EARTH_RADIUS_KM, calculate_distance
+from app.domain.spatial import GridIndex, bounding_box
+from app.infrastructure.models import Base
+from app.infrastructure.repositories import SQLDriverRepository, SQLPassengerRepository, SQLTripRepository
+
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+
+
+def north_of(location, km):
+    return Location(latitude=location.latitude + math.degrees(km / EARTH_RADIUS_KM), longitude=location.longitude)
+
+
+def index_of(distances_km):
+    points = [north_of(PICKUP, km) for km in distances_km]
+    return GridIndex([p.latitude for p in points], [p.longitude for p in points], cell_size_km=2.0)
+
+
+def test_nearest_widens_the_radius_until_enough_are_found():
+    index = index_of([1, 4, 9, 15])
+    matches, radius = index.nearest(PICKUP, 1, radius_km=3, step_km=2, max_radius_km=10)
+    assert [i for i, _ in matches] == [0] and radius == 3
+
+    matches, radius = index.nearest(PICKUP, 2, radius_km=3, step_km=2, max_radius_km=10)
+    assert [i for i, _ in matches] == [0, 1] and radius == 5
+    assert matches[1][1] == pytest.approx(4.0)
+
+    matches, radius = index_of([9.5, 15]).nearest(PICKUP, 1, radius_km=3, step_km=2, max_radius_km=10)
+    assert [i for i, _ in matches] == [0] and radius == 10  # the last step stops at the cap
+    assert index_of([15]).nearest(PICKUP, 1, radius_km=3, step_km=2, max_radius_km=10) == ([], 10)
+
+
+def test_bounding_box_holds_the_whole_circle():
+    radius = 5.0
+    min_lat, max_lat, min_lon, max_lon = bounding_box(PICKUP, radius)
+    lat0, lon0, angle = math.radians(PICKUP.latitude), math.radians(PICKUP.longitude), radius / EARTH_RADIUS_KM
+    for bearing in range(0, 360, 5):
+        theta = math.radians(bearing)
+        lat = math.asin(math.sin(lat0) * math.cos(angle) + math.cos(lat0) * math.sin(angle) * math.cos(theta))
+        lon = lon0 + math.atan2(
+            math.sin(theta) * math.sin(angle) * math.cos(lat0), math.cos(angle) - math.sin(lat0) * math.sin(lat)
+        )
+        point = (math.degrees(lat), math.degrees(lon))
+        assert calculate_distance(PICKUP.latitude, PICKUP.longitude, *point) == pytest.approx(radius)
+        assert min_lat - 1e-9 <= point[0] <= max_lat + 1e-9 and min_lon - 1e-9 <= point[1] <= max_lon + 1e-9
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    SQLPassengerRepository(session).create(Passenger(id=None, name="Pedro", email="p@email.com", phone="+5191"))
+    yield session
+    session.close()
+
+
+def add_driver(db, i, location):
+    SQLDriverRepository(db).create(Driver(
+        id=None, name=f"Driver {i}", email=f"d{i}@taxi24.com", phone="+51900000000", license_number=f"LIC{i}",
+        status=DriverStatus.AVAILABLE, current_location=location
+    ))
+
+
+def test_dispatch_reaches_past_the_default_radius_up_to_the_cap(db):
+    service = TripService(SQLTripRepository(db), SQLDriverRepository(db), SQLPassengerRepository(db))
+    add_driver(db, 1, north_of(PICKUP, 12))
+    assert service.create_trip_request(1, PICKUP) is None
+
+    add_driver(db, 2, north_of(PICKUP, 6))
+    trip = service.create_trip_request(1, PICKUP)
+    assert trip.driver_id == 2
+    assert trip.search_radius_km == 7  # 3 km, then 5 km, then 7 km
+    assert SQLTripRepository(db).get_by_id(trip.id).search_radius_km == 7
+
+
+class RecordingDriverRepository(SQLDriverRepository):
+    def __init__(self, db):
+        super().__init__(db)
+        self.radii = []
+
+    def get_available_within_radius(self, location, radius_km):
+        self.radii.append(radius_km)
+        return super().get_available_within_radius(location, radius_km)
+
+
+def test_dispatch_reads_the_default_radius_then_the_cap_at_most(db):
+    drivers = RecordingDriverRepository(db)
+    service = TripService(SQLTripRepository(db), drivers, SQLPassengerRepository(db))
+    add_driver(db, 1, north_of(PICKUP, 1))
+    add_driver(db, 2, north_of(PICKUP, 9))
+    assert service.create_trip_request(1, PICKUP).driver_id == 1
+    assert drivers.radii == [3]  # the farther driver is never read
+
+    drivers.radii.clear()
+    trip = service.create_trip_request(1, PICKUP)
+    assert (trip.driver_id, trip.search_radius_km) == (2, 9)
+    assert drivers.radii == [3, 10]  # the rings between are widened in memory
@@ -0,0 +1,126 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from main import app as api
+from app.domain.entities import Driver, DriverStatus, Location
+from app.infrastructure.database import get_db
+from app.infrastructure.models import Base
+from app.infrastructure.repositories import SQLDriverRepository
+from app.presentation.encoding import (
+    COLUMNAR, MSGPACK, CompressionMiddleware, NegotiatedResponse, ResponseFormatMiddleware,
+    _optional_module, from_columnar, negotiate_coding, negotiate_format, to_columnar
+)
+from app.presentation.schemas import DriverSchema
+
+
+def make_client(minimum_size=100):
+    app = FastAPI(default_response_class=NegotiatedResponse)
+
+    @app.get("/rows")
+    def rows(count: int):
+        return [{"id": i, "name": f"Driver {i}"} for i in range(count)]
+
+    app.add_middleware(ResponseFormatMiddleware)
+    app.add_middleware(CompressionMiddleware, minimum_size=minimum_size)
+    return TestClient(app)
+
+
+def test_negotiation_follows_quality_values():
+    assert negotiate_format(None) == "application/json"
+    assert negotiate_format(f"application/json;q=0.5, {COLUMNAR}") == COLUMNAR
+    assert negotiate_format(f"{COLUMNAR};q=0.5, */*") == "application/json"
+    assert negotiate_format("text/html") == "application/json"
+    assert negotiate_coding("gzip;q=0, identity") is None
+    assert negotiate_coding("deflate, gzip") == "gzip"
+    # q=0 refuses a coding even when the wildcard would allow it
+    assert negotiate_coding("gzip;q=0, *") in (None, "br")
+    assert negotiate_coding("*") == "gzip"
+    assert negotiate_format(f"application/json;q=0, {COLUMNAR};q=0.5, */*") == COLUMNAR
+
+
+def test_columnar_round_trip():
+    rows = [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+    assert to_columnar(rows) == {"id": [1, 2], "name": ["a", "b"]}
+    assert from_columnar(to_columnar(rows)) == rows
+    assert to_columnar({"id": 1}) == {"id": 1}
+
+
+def test_only_bodies_over_the_threshold_are_compressed():
+    client = make_client()
+    small = client.get("/rows?count=1", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.headers["vary"] == "Accept, Accept-Encoding"
+
+    large = client.get("/rows?count=50", headers={"Accept-Encoding": "gzip"})
+    assert large.headers["content-encoding"] == "gzip"
+    assert int(large.headers["content-length"]) < len(large.content)
+    assert len(large.json()) == 50
+
+    plain = client.get("/rows?count=50", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept, Accept-Encoding"
+    assert gzip.decompress(gzip.compress(plain.content)) == plain.content
+
+
+@pytest.mark.skipif(_optional_module("msgpack") is None, reason="msgpack is not installed")
+def test_msgpack_body():
+    response = make_client().get("/rows?count=3", headers={"Accept": MSGPACK})
+    assert response.headers["content-type"] == MSGPACK
+    assert _optional_module("msgpack").unpackb(response.content)[2] == {"id": 2, "name": "Driver 2"}
+
+
+@pytest.fixture
+def many_drivers():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    for i in range(20):
+        SQLDriverRepository(db).create(Driver(
+            id=None, name=f"Driver {i}", email=f"d{i}@taxi24.com", phone="+51900000000", license_number=f"LIC{i}",
+            status=DriverStatus.AVAILABLE, current_location=Location(latitude=-12.0464, longitude=-77.0428)
+        ))
+    db.close()
+
+    def override_get_db():
+        session = factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    previous = api.dependency_overrides[get_db]
+    api.dependency_overrides[get_db] = override_get_db
+    yield
+    api.dependency_overrides[get_db] = previous
+
+
+def test_api_lists_in_columnar_form_validate_with_the_schemas(client, many_drivers):
+    json_response = client.get("/api/v1/drivers")
+    response = client.get("/api/v1/drivers", headers={"Accept": COLUMNAR})
+    assert response.headers["content-type"] == COLUMNAR
+    drivers = [DriverSchema.model_validate(row) for row in from_columnar(response.json())]
+    assert [driver.id for driver in drivers] == [row["id"] for row in json_response.json()]
+    assert len(drivers) == 20
+    # Each representation has its own validator
+    assert response.headers["etag"] != json_response.headers["etag"]
+    assert "columnar" in response.headers["etag"]
+    assert response.headers["vary"] == "Accept, X-City, Accept-Encoding"
+    # Routes without caching headers are negotiated too
+    assert client.get("/", headers={"Accept": COLUMNAR}).headers["vary"] == "Accept, Accept-Encoding"
+
+
+def test_compressed_etag_revalidates(client, many_drivers):
+    first = client.get("/api/v1/drivers", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["content-encoding"] == "gzip"
+    etag = first.headers["etag"]
+    assert etag.endswith('-gzip"')
+    cached = client.get("/api/v1/drivers", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
@@ -0,0 +1,59 @@
+import math
+
+from app.domain.entities import Driver, DriverPosition, DriverStatus, Location
+from app.domain.fleet import FleetSnapshot
+from app.domain.services import (
+    calculate_distance, calculate_distances, find_closest_drivers, find_drivers_within_radius
+)
+
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+
+
+def make_drivers():
+    coords = [(-12.0464, -77.0428), (-12.0500, -77.0450), (-12.0520, -77.0480), (-12.2000, -77.2000), None]
+    statuses = [DriverStatus.AVAILABLE, DriverStatus.BUSY, DriverStatus.AVAILABLE, DriverStatus.AVAILABLE,
+                DriverStatus.OFFLINE]
+    return [
+        Driver(
+            id=i + 1, name=f"Driver {i}", email=f"d{i}@taxi24.com", phone="+51900000000",
+            license_number=f"LIC{i}", status=status,
+            current_location=Location(latitude=c[0], longitude=c[1]) if c else None
+        )
+        for i, (c, status) in enumerate(zip(coords, statuses))
+    ]
+
+
+def test_snapshot_round_trips_rows():
+    drivers = make_drivers()
+    snapshot = FleetSnapshot.from_drivers(drivers)
+    assert len(snapshot) == 5
+    assert snapshot.row(1) == DriverPosition(id=2, status=DriverStatus.BUSY, current_location=drivers[1].current_location)
+    assert snapshot.row(4).current_location is None
+    assert snapshot.index_of(3) == 2
+    assert snapshot.index_of(42) is None
+
+
+def test_with_status_filters_rows():
+    available = FleetSnapshot.from_drivers(make_drivers()).with_status(DriverStatus.AVAILABLE)
+    assert list(available.ids) == [1, 3, 4]
+
+
+def test_batch_distances_match_scalar_haversine():
+    snapshot = FleetSnapshot.from_drivers(make_drivers())
+    distances = calculate_distances(snapshot.latitudes, snapshot.longitudes, PICKUP)
+    for lat, lon, distance in zip(snapshot.latitudes[:4], snapshot.longitudes[:4], distances):
+        assert math.isclose(distance, calculate_distance(PICKUP.latitude, PICKUP.longitude, lat, lon), abs_tol=1e-9)
+    assert math.isnan(distances[4])
+
+
+def test_domain_functions_accept_snapshot():
+    drivers = make_drivers()
+    snapshot = FleetSnapshot.from_drivers(drivers)
+
+    from_list = [d.id for d in find_drivers_within_radius(drivers, PICKUP, 3.0)]
+    from_snapshot = [d.id for d in find_drivers_within_radius(snapshot, PICKUP, 3.0)]
+    assert from_list == from_snapshot == [1, 2, 3]
+
+    from_list = [d.id for d in find_closest_drivers(drivers, PICKUP, 4)]
+    from_snapshot = [d.id for d in find_closest_drivers(snapshot, PICKUP, 4)]
+    assert from_list == from_snapshot == [1, 2, 3, 4]
@@ -0,0 +1,96 @@
+import math
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.domain.entities import Driver, DriverStatus, Location, Passenger, Trip, TripStatus
+from app.infrastructure.change_feed import ChangeFeedPoller, prune_changes
+from app.infrastructure.database import make_engine
+from app.infrastructure.fleet_state import FleetState
+from app.infrastructure.fleet_state_file import FleetStateWriter, read_fleet_state, restore_fleet_state, write_fleet_state
+from app.infrastructure.models import Base
+from app.infrastructure.repositories import SQLDriverRepository, SQLPassengerRepository, SQLTripRepository
+
+SOURCE = "sqlite:///fleet.db"
+
+
+def test_round_trip_keeps_every_row(tmp_path):
+    state = FleetState()
+    state.restore(
+        42,
+        {1: (DriverStatus.AVAILABLE, -12.05, -77.04, 3), 2: (DriverStatus.OFFLINE, math.nan, math.nan, 1),
+         3: (DriverStatus.BUSY, -12.1, -77.0, 7)},
+        {10: (TripStatus.REQUESTED, 5, None, 1), 11: (TripStatus.IN_PROGRESS, 6, 3, 4)}
+    )
+    path = str(tmp_path / "fleet.snapshot")
+    assert write_fleet_state(state, path, SOURCE) == 42
+
+    stored = read_fleet_state(path, SOURCE)
+    assert stored.cursor == 42
+    assert stored.drivers[1] == (DriverStatus.AVAILABLE, -12.05, -77.04, 3)
+    assert stored.drivers[3] == (DriverStatus.BUSY, -12.1, -77.0, 7)
+    assert stored.drivers[2][0] == DriverStatus.OFFLINE and math.isnan(stored.drivers[2][1])
+    assert stored.active_trips == state.active_trips
+
+
+def test_unusable_files_are_ignored(tmp_path):
+    path = tmp_path / "fleet.snapshot"
+    assert read_fleet_state(str(path), SOURCE) is None
+    state = FleetState()
+    state.restore(1, {1: (DriverStatus.AVAILABLE, -12.05, -77.04, 1)}, {})
+    write_fleet_state(state, str(path), SOURCE)
+    assert read_fleet_state(str(path), "sqlite:///other.db") is None
+
+    data = bytearray(path.read_bytes())
+    data[-9] ^= 0xFF
+    path.write_bytes(bytes(data))
+    assert read_fleet_state(str(path), SOURCE) is None
+    path.write_bytes(bytes(data[:-8]))
+    assert read_fleet_state(str(path), SOURCE) is None
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path}/fleet.db")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    for i in range(3):
+        SQLDriverRepository(db).create(Driver(
+            id=None, name=f"Driver {i}", email=f"d{i}@taxi24.com", phone="+51900000000", license_number=f"LIC{i}",
+            status=DriverStatus.AVAILABLE, current_location=Location(latitude=-12.05, longitude=-77.04)
+        ))
+    SQLPassengerRepository(db).create(Passenger(id=None, name="Pedro", email="p@email.com", phone="+5191"))
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+def test_warm_restart_replays_only_the_changes_since_the_snapshot(tmp_path, session_factory):
+    path = str(tmp_path / "fleet.snapshot")
+    state = FleetState()
+    db = session_factory()
+    state.load(db)
+    writer = FleetStateWriter(state, path, interval_seconds=60, source=SOURCE)
+    assert writer.run_once() and not writer.run_once()  # nothing applied since
+
+    driver_repo = SQLDriverRepository(db)
+    driver = driver_repo.get_by_id(2)
+    driver.status = DriverStatus.BUSY
+    driver_repo.update(driver)
+    trip = SQLTripRepository(db).create(Trip(
+        id=None, passenger_id=1, driver_id=2, pickup_location=Location(latitude=-12.0, longitude=-77.0),
+        destination_location=None, status=TripStatus.REQUESTED, fare=None, distance_km=None
+    ))
+
+    restarted = FleetState()
+    assert restore_fleet_state(restarted, path, SOURCE, db)
+    assert restarted.drivers[2][0] == DriverStatus.AVAILABLE and restarted.active_trips == {}
+    poller = ChangeFeedPoller(session_factory, restarted.apply, 60, 100, 3600, cursor=restarted.cursor)
+    assert poller.poll_once() == 2
+    assert restarted.drivers[2][0] == DriverStatus.BUSY
+    assert restarted.active_trips[trip.id][0] == TripStatus.REQUESTED
+
+    prune_changes(db, retention_seconds=-60)  # the changes after the snapshot are gone
+    assert not restore_fleet_state(FleetState(), path, SOURCE, db)
+    db.close()
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.application.services import DriverService
+from app.domain.entities import Driver, DriverStatus, Location
+from app.infrastructure.heartbeats import HeartbeatMonitor, HeartbeatTracker
+from app.infrastructure.models import Base, DriverModel
+from app.infrastructure.repositories import SQLDriverRepository
+
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+
+
+def test_tracker_expires_in_last_seen_order():
+    tracker = HeartbeatTracker(ttl_seconds=10)
+    tracker.beat_many([1, 2, 3], now=100.0)
+    tracker.beat(1, now=105.0)
+    assert tracker.is_live(2, now=110.0)
+    assert not tracker.is_live(2, now=111.0)
+    assert tracker.is_live(42, now=111.0)  # never seen
+
+    assert tracker.pop_expired(now=111.0) == [2, 3]
+    assert tracker.pop_expired(now=111.0) == []
+    assert len(tracker) == 1
+    assert tracker.take_pending() == {1: 105.0, 2: 100.0, 3: 100.0}
+    assert tracker.take_pending() == {}
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    statuses = [DriverStatus.AVAILABLE, DriverStatus.AVAILABLE, DriverStatus.BUSY, DriverStatus.AVAILABLE]
+    for i, status in enumerate(statuses):
+        SQLDriverRepository(db).create(Driver(
+            id=None, name=f"Driver {i}", email=f"d{i}@taxi24.com", phone="+51900000000", license_number=f"LIC{i}",
+            status=status, current_location=Location(latitude=PICKUP.latitude + i * 0.001, longitude=PICKUP.longitude)
+        ))
+    db.close()
+    return factory
+
+
+def test_monitor_takes_silent_available_drivers_offline(session_factory):
+    tracker = HeartbeatTracker(ttl_seconds=30)
+    monitor = HeartbeatMonitor(tracker, session_factory, interval_seconds=1)
+    tracker.beat_many([1, 2, 3, 4], now=1000.0)
+    assert monitor.run_once(now=1010.0) == []
+
+    db = session_factory()
+    assert db.get(DriverModel, 1).last_seen_at == datetime.utcfromtimestamp(1000.0)
+    # Driver 4's heartbeats reached another worker, which flushed a recent time
+    SQLDriverRepository(db).record_heartbeats({4: datetime.utcfromtimestamp(1025.0)})
+    db.close()
+
+    tracker.beat(2, now=1020.0)
+    assert monitor.run_once(now=1040.0) == [1]  # 3 is BUSY and 4 was seen elsewhere
+
+    db = session_factory()
+    statuses = {model.id: model.status.value for model in db.query(DriverModel)}
+    db.close()
+    assert statuses == {1: "offline", 2: "available", 3: "busy", 4: "available"}
+
+    # 3 went silent mid-trip: still stale, and taken offline once the trip releases it
+    assert not tracker.is_live(3, now=1040.0) and tracker.is_live(4, now=1040.0)
+    db = session_factory()
+    repo = SQLDriverRepository(db)
+    repo.update_status_if(3, DriverStatus.BUSY, DriverStatus.AVAILABLE)
+    db.close()
+    assert monitor.run_once(now=1045.0) == [3]
+
+
+def test_searches_skip_stale_drivers(session_factory):
+    tracker = HeartbeatTracker(ttl_seconds=30)
+    tracker.beat(1, now=0.0)  # long silent; drivers 2 and 4 were never seen and count as live
+    db = session_factory()
+    service = DriverService(SQLDriverRepository(db), tracker)
+    assert [driver.id for driver in service.get_available_drivers_within_radius(PICKUP, 3.0).drivers] == [2, 4]
+    db.close()
+
+
+def test_heartbeat_endpoints(client):
+    assert client.post("/api/v1/drivers/1/heartbeat").status_code == 204
+    response = client.post("/api/v1/drivers/heartbeats", json={"driver_ids": [1, 2, 3]})
+    assert response.status_code == 200
+    assert response.json() == {"accepted": 3}
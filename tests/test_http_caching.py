@@ -0,0 +1,83 @@
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.domain.entities import Driver, DriverStatus, Location
+from app.infrastructure.models import Base, TableVersionModel
+from app.infrastructure.repositories import SQLDriverRepository
+from app.infrastructure.table_versions import table_versions
+
+
+def make_session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def make_driver(suffix):
+    return Driver(
+        id=None, name="Driver", email=f"d{suffix}@taxi24.com", phone="+51900000000", license_number=f"LIC{suffix}",
+        status=DriverStatus.AVAILABLE, current_location=Location(latitude=-12.0464, longitude=-77.0428)
+    )
+
+
+def test_counters_bump_once_per_committed_transaction():
+    db = make_session()()
+    assert table_versions(db, ["drivers", "trips"]) == {"drivers": 0, "trips": 0}
+
+    repo = SQLDriverRepository(db)
+    driver = repo.create(make_driver(1))
+    driver.status = DriverStatus.BUSY
+    repo.update(driver)
+    assert table_versions(db, ["drivers", "trips"]) == {"drivers": 2, "trips": 0}
+
+    # Heartbeat flushes do not change the API representation
+    repo.record_heartbeats({driver.id: driver.updated_at})
+    assert table_versions(db, ["drivers"]) == {"drivers": 2}
+
+    # The counter is spread over shard rows, so writers do not all update one row
+    for i in range(2, 40):
+        repo.create(make_driver(i))
+    assert table_versions(db, ["drivers"]) == {"drivers": 40}
+    bumped = db.execute(
+        select(func.count()).where(TableVersionModel.name == "drivers", TableVersionModel.version > 0)
+    ).scalar()
+    assert bumped > 1
+    db.close()
+
+
+def test_rolled_back_writes_do_not_bump():
+    db = make_session()()
+    SQLDriverRepository(db).create(make_driver(1))
+    try:
+        SQLDriverRepository(db).create(make_driver(1))  # duplicate email
+    except Exception:
+        db.rollback()
+    assert table_versions(db, ["drivers"]) == {"drivers": 1}
+    db.close()
+
+
+def test_conditional_get_returns_304_without_orm_queries(client):
+    first = client.get("/api/v1/drivers")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "public, max-age=5"
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, "after_cursor_execute", record)
+    try:
+        cached = client.get("/api/v1/drivers", headers={"If-None-Match": etag})
+    finally:
+        event.remove(Engine, "after_cursor_execute", record)
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+    assert len(statements) == 1 and "table_versions" in statements[0]
+
+    assert client.get("/api/v1/drivers", headers={"If-None-Match": '"stale"'}).status_code == 200
+    assert client.get("/api/v1/passengers").headers["cache-control"] == "public, max-age=60"
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from app.infrastructure.idempotency import (
+    IdempotencyStore, StoredResponse, IdempotencyKeyReusedError
+)
+
+
+def make_store(**overrides):
+    params = dict(ttl_seconds=60.0, max_entries=100, wait_timeout_seconds=5.0)
+    params.update(overrides)
+    return IdempotencyStore(**params)
+
+
+def test_duplicate_is_replayed_without_running_handler():
+    store = make_store()
+    calls = []
+
+    def handler():
+        calls.append(1)
+        return StoredResponse(200, b'{"id": 1}')
+
+    first, replayed_first = store.execute("k", "fp", handler)
+    second, replayed_second = store.execute("k", "fp", handler)
+    assert first == second
+    assert (replayed_first, replayed_second) == (False, True)
+    assert len(calls) == 1
+
+
+def test_key_reused_with_different_payload():
+    store = make_store()
+    store.execute("k", "fp-1", lambda: StoredResponse(200, b"{}"))
+    with pytest.raises(IdempotencyKeyReusedError):
+        store.execute("k", "fp-2", lambda: StoredResponse(200, b"{}"))
+
+
+def test_expired_keys_are_evicted():
+    store = make_store(ttl_seconds=0.01)
+    store.execute("k", "fp", lambda: StoredResponse(200, b"{}"))
+    time.sleep(0.02)
+    _, replayed = store.execute("k2", "fp", lambda: StoredResponse(200, b"{}"))
+    assert not replayed
+    assert len(store) == 1
+
+
+def test_failed_handler_is_not_recorded():
+    store = make_store()
+
+    def failing():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        store.execute("k", "fp", failing)
+    _, replayed = store.execute("k", "fp", lambda: StoredResponse(200, b"{}"))
+    assert not replayed
+
+
+def test_concurrent_duplicates_wait_for_original():
+    store = make_store()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_handler():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return StoredResponse(200, b'{"id": 7}')
+
+    results = []
+    original = threading.Thread(target=lambda: results.append(store.execute("k", "fp", slow_handler)))
+    original.start()
+    started.wait(5)
+    duplicates = [
+        threading.Thread(target=lambda: results.append(store.execute("k", "fp", slow_handler)))
+        for _ in range(3)
+    ]
+    for thread in duplicates:
+        thread.start()
+    release.set()
+    for thread in [original] + duplicates:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == 4
+    assert sorted(replayed for _, replayed in results) == [False, True, True, True]
+
+
+def test_create_trip_replays_response(client):
+    payload = {
+        "passenger_id": 999,
+        "pickup_location": {"latitude": -12.0464, "longitude": -77.0428}
+    }
+    headers = {"Idempotency-Key": "test-create-trip-replay"}
+    first = client.post("/api/v1/trips", json=payload, headers=headers)
+    second = client.post("/api/v1/trips", json=payload, headers=headers)
+    assert first.status_code == second.status_code == 400
+    assert first.json() == second.json()
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+    payload["pickup_location"]["latitude"] = -12.05
+    conflict = client.post("/api/v1/trips", json=payload, headers=headers)
+    assert conflict.status_code == 422
+
+    # Keys are scoped to the passenger: another one picking the same key gets its own request
+    payload["passenger_id"] = 998
+    other = client.post("/api/v1/trips", json=payload, headers=headers)
+    assert other.status_code == 400
+    assert "Idempotent-Replayed" not in other.headers
@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.application.services import TripService
+from app.domain.entities import Driver, DriverStatus, Location, Passenger
+from app.domain.services import calculate_distance
+from app.domain.trail import decode_pings, encode_pings, to_raw_ping
+from app.infrastructure.location_trail import (
+    LocationTrailFlusher, LocationTrailStore, SQLLocationTrail, to_epoch_ms
+)
+from app.infrastructure.models import Base, LocationTrailChunkModel
+from app.infrastructure.repositories import SQLDriverRepository, SQLPassengerRepository, SQLTripRepository
+
+START = datetime(2024, 3, 1, 12, 0, 0)
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+
+
+def test_codec_round_trip_is_compact():
+    base = to_epoch_ms(START)
+    pings = [to_raw_ping(base + i * 1000, -12.0464 + i * 2e-5, -77.0428 - i * 1e-5) for i in range(200)]
+    pings.append(to_raw_ping(base + 199_500, -12.05, -77.03))  # irregular interval, backwards jump
+    data = encode_pings(pings)
+    assert decode_pings(data) == pings
+    assert len(data) / len(pings) < 6
+
+
+def test_store_cuts_chunks_by_size_and_span():
+    store = LocationTrailStore(chunk_points=3, chunk_span_seconds=60)
+    store.append_many(1, [(-12.0, -77.0, START + timedelta(seconds=i)) for i in range(4)])
+    store.append(1, -12.0, -77.0, START + timedelta(minutes=5))
+    store.append(2, -12.0, -77.0, START)
+    chunks = store.take_chunks(max_age_seconds=3600)
+    assert [(driver_id, len(pings)) for driver_id, pings in chunks] == [(1, 3), (1, 1)]
+    assert sorted((driver_id, len(pings)) for driver_id, pings in store.take_chunks()) == [(1, 1), (2, 1)]
+
+
+def test_flusher_leaves_open_chunks_in_memory_for_the_chunk_span(session_factory):
+    now = [1000.0]
+    store = LocationTrailStore(chunk_points=256, chunk_span_seconds=60, clock=lambda: now[0])
+    flusher = LocationTrailFlusher(store, session_factory, interval_seconds=5)
+    store.append_many(1, [(-12.0, -77.0, START + timedelta(seconds=i)) for i in range(10)])
+    now[0] += 30
+    assert flusher.run_once() == 0  # still open, and read from memory meanwhile
+    now[0] += 30
+    assert flusher.run_once() == 1
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def test_range_reads_merge_stored_and_buffered_pings(session_factory):
+    store = LocationTrailStore(chunk_points=10, chunk_span_seconds=60)
+    store.append_many(7, [(-12.0 - i * 1e-4, -77.0, START + timedelta(seconds=i * 10)) for i in range(30)])
+    LocationTrailFlusher(store, session_factory, interval_seconds=5).run_once()  # closed chunks only
+    store.append(7, -12.1, -77.0, START + timedelta(seconds=300))
+
+    db = session_factory()
+    assert db.query(LocationTrailChunkModel).count() == 4  # cut every 60 s; 280-300 s still buffered
+    trail = SQLLocationTrail(store, db)
+    points = trail.points(7, START + timedelta(seconds=95), START + timedelta(seconds=300))
+    assert [point.timestamp for point in points] == [START + timedelta(seconds=s) for s in range(100, 300, 10)] + [
+        START + timedelta(seconds=300)
+    ]
+    assert trail.points(8, START, START + timedelta(hours=1)) == []
+    db.close()
+
+
+def test_failed_flush_keeps_the_pings(session_factory):
+    store = LocationTrailStore()
+    store.append_many(7, [(-12.0, -77.0, START + timedelta(seconds=i)) for i in range(5)])
+
+    def broken_session():
+        db = session_factory()
+
+        def execute(*args, **kwargs):
+            raise OperationalError("INSERT INTO location_trail_chunks", {}, Exception("database is locked"))
+
+        db.execute = execute
+        return db
+
+    with pytest.raises(OperationalError):
+        LocationTrailFlusher(store, broken_session, interval_seconds=5).run_once(force=True)
+    assert LocationTrailFlusher(store, session_factory, interval_seconds=5).run_once(force=True) == 1
+    db = session_factory()
+    assert db.query(LocationTrailChunkModel.point_count).scalar() == 5
+    db.close()
+
+
+def test_completed_trip_distance_follows_the_trail(session_factory):
+    db = session_factory()
+    SQLPassengerRepository(db).create(Passenger(id=None, name="Pedro", email="p@email.com", phone="+5191"))
+    SQLDriverRepository(db).create(Driver(
+        id=None, name="Driver", email="d@taxi24.com", phone="+51900000000", license_number="LIC1",
+        status=DriverStatus.AVAILABLE, current_location=PICKUP
+    ))
+    store = LocationTrailStore()
+    trips = SQLTripRepository(db)
+    service = TripService(trips, SQLDriverRepository(db), SQLPassengerRepository(db), trail=SQLLocationTrail(store, db))
+
+    trip = service.create_trip_request(1, PICKUP)
+    service.accept_trip(trip.id)
+    trip = service.start_trip(trip.id)
+    # An L-shaped route: 1 km north, then 1 km east
+    corner = Location(latitude=PICKUP.latitude + 0.009, longitude=PICKUP.longitude)
+    destination = Location(latitude=corner.latitude, longitude=corner.longitude + 0.0092)
+    for location in (PICKUP, corner, destination):
+        store.append(1, location.latitude, location.longitude)  # timestamped on arrival
+    completed = service.complete_trip(trip.id, destination, 10)
+
+    straight = calculate_distance(PICKUP.latitude, PICKUP.longitude, destination.latitude, destination.longitude)
+    assert completed.distance_km == pytest.approx(2.0, rel=0.02)
+    assert completed.distance_km > straight * 1.3
+    assert len(service.get_trip_trail(trip.id)) == 3
+    db.close()
+
+
+def test_trail_endpoints(client):
+    response = client.post("/api/v1/drivers/9001/locations", json={"pings": [
+        {"latitude": -12.05, "longitude": -77.04, "timestamp": "2024-03-01T12:00:00"},
+        {"latitude": -12.06, "longitude": -77.04, "timestamp": "2024-03-01T12:00:05"},
+    ]})
+    assert response.json() == {"accepted": 2}
+
+    params = {"start": "2024-03-01T11:59:00", "end": "2024-03-01T12:01:00"}
+    trail = client.get("/api/v1/drivers/9001/trail", params=params).json()
+    assert [point["latitude"] for point in trail] == [-12.05, -12.06]
+    assert client.get("/api/v1/drivers/9001/trail", params={**params, "end": "2024-03-03T00:00:00"}).status_code == 400
+    # Offsets are converted to UTC, with or without the other bound
+    offset = {"start": "2024-03-01T06:59:00-05:00", "end": "2024-03-01T12:00:02Z"}
+    assert [point["latitude"] for point in client.get("/api/v1/drivers/9001/trail", params=offset).json()] == [-12.05]
+    assert client.get("/api/v1/drivers/9001/trail", params={"start": "2024-01-01T00:00:00Z"}).status_code == 400
+    assert client.get("/api/v1/trips/999999/trail").status_code == 404
@@ -0,0 +1,75 @@
+import random
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.application.services import DriverService
+from app.domain.entities import Driver, DriverStatus, Location, NearbyQuery
+from app.domain.services import calculate_distance
+from app.domain.spatial import GridIndex
+from app.infrastructure.models import Base
+from app.infrastructure.repositories import SQLDriverRepository
+
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+
+
+def brute_force(latitudes, longitudes, location, radius_km, limit):
+    matches = []
+    for index, (lat, lon) in enumerate(zip(latitudes, longitudes)):
+        distance = calculate_distance(location.latitude, location.longitude, lat, lon)
+        if distance <= radius_km:
+            matches.append((index, distance))
+    matches.sort(key=lambda match: match[1])
+    return matches[:limit]
+
+
+def test_grid_index_matches_brute_force():
+    rng = random.Random(7)
+    latitudes = [PICKUP.latitude + rng.uniform(-0.2, 0.2) for _ in range(500)]
+    longitudes = [PICKUP.longitude + rng.uniform(-0.2, 0.2) for _ in range(500)]
+    index = GridIndex(latitudes, longitudes, cell_size_km=1.0)
+    for radius_km, limit in ((0.5, 5), (3.0, 10), (50.0, 1000)):
+        location = Location(latitude=PICKUP.latitude + rng.uniform(-0.1, 0.1), longitude=PICKUP.longitude)
+        expected = brute_force(latitudes, longitudes, location, radius_km, limit)
+        actual = index.within(location, radius_km, limit)
+        assert [i for i, _ in actual] == [i for i, _ in expected]
+
+
+def test_grid_index_skips_unknown_locations():
+    index = GridIndex([PICKUP.latitude, float("nan")], [PICKUP.longitude, float("nan")])
+    assert [i for i, _ in index.within(PICKUP, 1.0, 10)] == [0]
+
+
+def test_batch_groups_results_per_query():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    repo = SQLDriverRepository(db)
+    offsets = [(0.0, DriverStatus.AVAILABLE), (0.01, DriverStatus.AVAILABLE), (0.005, DriverStatus.BUSY), (0.3, DriverStatus.AVAILABLE)]
+    for i, (offset, status) in enumerate(offsets):
+        repo.create(Driver(
+            id=None, name=f"Driver {i}", email=f"d{i}@taxi24.com", phone="+51900000000", license_number=f"LIC{i}",
+            status=status, current_location=Location(latitude=PICKUP.latitude + offset, longitude=PICKUP.longitude)
+        ))
+
+    results = DriverService(repo).get_available_drivers_nearby_batch([
+        NearbyQuery(PICKUP),
+        NearbyQuery(PICKUP, radius_km=5.0, limit=1),
+        NearbyQuery(Location(latitude=-13.5, longitude=-72.0)),
+    ])
+    db.close()
+
+    assert [[driver.id for driver, _ in matches] for matches in results] == [[1, 2], [1], []]
+    assert results[0][1][1] == calculate_distance(PICKUP.latitude, PICKUP.longitude, PICKUP.latitude + 0.01, PICKUP.longitude)
+
+
+def test_batch_endpoint(client):
+    queries = [{"latitude": PICKUP.latitude, "longitude": PICKUP.longitude, "radius": 2.5, "limit": 2}, {"latitude": 0, "longitude": 0}]
+    response = client.post("/api/v1/drivers/available/nearby/batch", json={"queries": queries})
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["location"]["latitude"] for result in results] == [PICKUP.latitude, 0]
+    assert len(results[0]["drivers"]) <= 2
+    assert all(driver["distance_km"] <= 2.5 for driver in results[0]["drivers"])
+    assert results[1]["drivers"] == []
@@ -0,0 +1,148 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.application.services import DriverService, PassengerService
+from app.domain.degradation import DriverSnapshot
+from app.domain.entities import Driver, DriverStatus, Location
+from app.domain.spatial import GridIndex
+from app.infrastructure.degradation import DriverSnapshotRefresher, LatencySLOController
+from app.infrastructure.fleet_state import FleetState
+from app.infrastructure import dependencies
+from app.infrastructure.models import Base
+from app.infrastructure.repositories import SQLDriverRepository, SQLPassengerRepository
+
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+
+
+def controller(**overrides):
+    options = dict(slo_seconds=0.1, window_seconds=10, min_samples=5, recover_ratio=0.5, probe_every=4)
+    options.update(overrides)
+    return LatencySLOController(**options)
+
+
+def test_controller_enters_and_leaves_degraded_mode():
+    slo = controller()
+    slo.set_snapshot(DriverSnapshot([], cell_size_km=3, taken_at=0))
+    for i in range(5):
+        slo.record_exact(0.3, now=100 + i)
+    assert slo.degraded
+
+    served = [slo.snapshot(now=105) is not None for _ in range(8)]
+    assert served.count(False) == 2  # one probe in four still runs exactly
+
+    for i in range(20):
+        slo.record_exact(0.01, now=106 + i * 0.1)  # the slow samples are still in the window
+    assert slo.degraded
+    slo.record_exact(0.01, now=115)  # the slow ones have aged out
+    assert not slo.degraded
+
+    metrics = slo.metrics(now=115)
+    assert (metrics["entered_total"], metrics["exited_total"]) == (1, 1)
+    assert metrics["approximate_searches_total"] == 6 and metrics["exact_searches_total"] == 26
+    assert metrics["degraded_seconds_total"] == pytest.approx(11.0)  # entered at the fifth sample
+
+
+def test_controller_leaves_degraded_mode_when_traffic_stops():
+    slo = controller()
+    slo.set_snapshot(DriverSnapshot([], cell_size_km=3))
+    for i in range(5):
+        slo.record_exact(1.0, now=100 + i)
+    assert slo.snapshot(now=105) is not None
+    assert slo.snapshot(now=200) is None and not slo.degraded
+
+
+def test_approximate_distances_stay_close_to_haversine():
+    random.seed(7)
+    latitudes = [PICKUP.latitude + random.uniform(-0.1, 0.1) for _ in range(500)]
+    longitudes = [PICKUP.longitude + random.uniform(-0.1, 0.1) for _ in range(500)]
+    exact = GridIndex(latitudes, longitudes, cell_size_km=3).within(PICKUP, 8, 500)
+    approximate = dict(GridIndex(latitudes, longitudes, cell_size_km=3, approximate=True).within(PICKUP, 8, 500))
+    for index, distance in exact:
+        if distance < 7.9:
+            assert approximate[index] == pytest.approx(distance, rel=0.005)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    session = factory()
+    for i, km in enumerate([0.5, 1.5, 2.5, 6.0]):
+        SQLDriverRepository(session).create(Driver(
+            id=None, name=f"Driver {i}", email=f"d{i}@taxi24.com", phone="+51900000000", license_number=f"LIC{i}",
+            status=DriverStatus.AVAILABLE, current_location=Location(latitude=PICKUP.latitude + km / 111.2, longitude=PICKUP.longitude)
+        ))
+    session.factory = factory
+    yield session
+    session.close()
+
+
+def degraded_controller(db):
+    slo = controller(probe_every=1000)
+    refresher = DriverSnapshotRefresher(slo, db.factory, interval_seconds=60, cell_size_km=3)
+    assert refresher.run_once() is None  # nothing is read while healthy
+    for _ in range(5):
+        slo.record_exact(1.0)
+    refresher.run_once()
+    return slo
+
+
+def test_snapshot_is_built_from_the_fleet_state_while_degraded(db):
+    fleet = FleetState()
+    fleet.load(db)
+    slo = controller(probe_every=1000)
+    for _ in range(5):
+        slo.record_exact(1.0)
+    refresher = DriverSnapshotRefresher(slo, db.factory, interval_seconds=60, cell_size_km=3, fleet_state=fleet)
+    assert [driver.id for driver in refresher.run_once().drivers] == [1, 2, 3, 4]
+
+    # A driver moves: the next rebuild takes the position from the fleet state without reading the row
+    driver_id, (status, latitude, longitude, version) = 2, fleet.drivers[2]
+    fleet.drivers[2] = (status, latitude + 0.01, longitude, version + 1)
+    refresher.session_factory = None
+    moved = {driver.id: driver for driver in refresher.run_once().drivers}[driver_id]
+    assert moved.current_location.latitude == latitude + 0.01 and moved.version == version + 1 and moved.name
+
+    for _ in range(200):
+        slo.record_exact(0.01)
+    assert not slo.degraded and refresher.run_once() is None and slo.snapshot() is None
+
+
+def test_services_answer_from_the_snapshot_while_degraded(db):
+    slo = degraded_controller(db)
+    repo = SQLDriverRepository(db)
+    SQLDriverRepository(db).create(Driver(
+        id=None, name="Late", email="late@taxi24.com", phone="+51900000000", license_number="LATE",
+        status=DriverStatus.AVAILABLE, current_location=PICKUP
+    ))
+
+    result = DriverService(repo, degradation=slo).get_available_drivers_within_radius(PICKUP, 3.0)
+    assert result.approximate and result.staleness_seconds >= 0
+    assert [driver.id for driver in result.drivers] == [1, 2, 3]  # driver 5 joined after the snapshot
+
+    closest = PassengerService(SQLPassengerRepository(db), repo, degradation=slo).get_closest_drivers_for_passenger(1, PICKUP, 2)
+    assert [driver.id for driver in closest.drivers] == [1, 2]
+
+    exact = DriverService(repo, degradation=controller()).get_available_drivers_within_radius(PICKUP, 3.0)
+    assert not exact.approximate and sorted(driver.id for driver in exact.drivers) == [1, 2, 3, 5]
+
+
+def test_degraded_responses_are_flagged(client, db, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(dependencies.default_tenant, "nearby_degradation", degraded_controller(db))
+        response = client.get("/api/v1/drivers/available/nearby", params={"latitude": PICKUP.latitude, "longitude": PICKUP.longitude})
+        assert response.headers["x-results-approximate"] == "true"
+        assert float(response.headers["x-results-staleness-seconds"]) >= 0
+        assert [driver["id"] for driver in response.json()] == [1, 2, 3]
+
+        metrics = client.get("/api/v1/metrics/nearby").json()
+        assert metrics["degraded"] and metrics["approximate_searches_total"] == 1
+        assert metrics["snapshot_drivers"] == 4
+    assert "x-results-approximate" not in client.get(
+        "/api/v1/drivers/available/nearby", params={"latitude": PICKUP.latitude, "longitude": PICKUP.longitude}
+    ).headers
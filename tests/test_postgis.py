@@ -0,0 +1,109 @@
+import importlib.util
+import shutil
+import subprocess
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.application.services import PassengerService
+from app.domain.entities import Driver, DriverStatus, Location, Passenger
+from app.domain.liveness import DriverLiveness
+from app.domain.services import find_closest_drivers, find_drivers_within_radius
+from app.infrastructure.database import make_engine
+from app.infrastructure.models import Base
+from app.infrastructure.repositories import PostGISDriverRepository, SQLDriverRepository, SQLPassengerRepository, driver_repository
+
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+
+
+def _postgres_dialect():
+    for module, dialect in (("psycopg", "postgresql+psycopg"), ("psycopg2", "postgresql+psycopg2")):
+        if importlib.util.find_spec(module):
+            return dialect
+    return None
+
+
+@pytest.fixture(scope="module")
+def postgres_url(tmp_path_factory):
+    """A throwaway PostgreSQL server listening on a Unix socket in a temporary directory"""
+    dialect, initdb, pg_ctl = _postgres_dialect(), shutil.which("initdb"), shutil.which("pg_ctl")
+    if dialect is None or initdb is None or pg_ctl is None:
+        pytest.skip("PostgreSQL server binaries or a psycopg driver are not installed")
+    directory = tmp_path_factory.mktemp("postgres")
+    data = directory / "data"
+    setup = subprocess.run([initdb, "-D", str(data), "-U", "postgres", "--auth=trust"], capture_output=True, text=True)
+    if setup.returncode != 0:
+        pytest.skip(f"initdb failed: {setup.stderr.strip()}")
+    started = subprocess.run(
+        [pg_ctl, "-D", str(data), "-l", str(directory / "server.log"), "-w",
+         "-o", f"-c listen_addresses='' -k {directory}", "start"],
+        capture_output=True, text=True
+    )
+    if started.returncode != 0:
+        pytest.skip(f"PostgreSQL did not start: {started.stderr.strip()}")
+    try:
+        url = f"{dialect}://postgres@/postgres?host={directory}"
+        engine = make_engine(url)
+        with engine.connect() as conn:
+            postgis = conn.execute(text("SELECT 1 FROM pg_available_extensions WHERE name = 'postgis'")).first()
+        engine.dispose()
+        if postgis is None:
+            pytest.skip("PostGIS is not installed for the local PostgreSQL server")
+        yield url
+    finally:
+        subprocess.run([pg_ctl, "-D", str(data), "-m", "immediate", "stop"], capture_output=True)
+
+
+@pytest.fixture(params=["sqlite", "postgis"])
+def db(request, tmp_path):
+    url = f"sqlite:///{tmp_path}/drivers.db" if request.param == "sqlite" else request.getfixturevalue("postgres_url")
+    engine = make_engine(url)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    # Drivers every ~0.5 km north of the pickup; 3 is busy and 6 has no location
+    for i in range(1, 9):
+        location = None if i == 6 else Location(latitude=PICKUP.latitude + i * 0.0045, longitude=PICKUP.longitude)
+        SQLDriverRepository(session).create(Driver(
+            id=None, name=f"Driver {i}", email=f"d{i}@taxi24.com", phone="+51900000000", license_number=f"LIC{i}",
+            status=DriverStatus.BUSY if i == 3 else DriverStatus.AVAILABLE, current_location=location
+        ))
+    SQLPassengerRepository(session).create(Passenger(id=None, name="Pedro", email="p@email.com", phone="+5191"))
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+def test_repository_is_chosen_by_url_scheme(db):
+    repo = driver_repository(db)
+    postgres = db.get_bind().url.get_backend_name() == "postgresql"
+    assert isinstance(repo, PostGISDriverRepository) == postgres and isinstance(repo, SQLDriverRepository)
+
+
+def test_radius_and_nearest_queries_match_haversine(db):
+    repo = driver_repository(db)
+    available = repo.get_available()
+
+    within = repo.get_available_within_radius(PICKUP, 2.1)
+    assert [driver.id for driver in within] == [1, 2, 4]
+    assert within == find_drivers_within_radius(available, PICKUP, 2.1)
+
+    closest = repo.get_closest_available(PICKUP, 4)
+    assert [driver.id for driver in closest] == [1, 2, 4, 5]
+    assert closest == find_closest_drivers(available, PICKUP, 4)
+    assert len(repo.get_closest_available(PICKUP, 50)) == 6
+
+
+class Silent(DriverLiveness):
+    def __init__(self, driver_ids):
+        self.driver_ids = set(driver_ids)
+
+    def is_live(self, driver_id: int) -> bool:
+        return driver_id not in self.driver_ids
+
+
+def test_closest_drivers_for_passenger_ask_again_past_stale_drivers(db):
+    service = PassengerService(SQLPassengerRepository(db), driver_repository(db), liveness=Silent([1, 2, 4, 5, 7]))
+    assert [driver.id for driver in service.get_closest_drivers_for_passenger(1, PICKUP, 1).drivers] == [8]
+    assert [driver.id for driver in service.get_closest_drivers_for_passenger(1, PICKUP, 3).drivers] == [8]
@@ -0,0 +1,110 @@
+import threading
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.domain.entities import Driver, DriverStatus, Location
+from app.domain.pricing import SurgePricingEngine, compute_surge_multiplier
+from app.infrastructure.models import Base
+from app.infrastructure.repositories import SQLDriverRepository
+from app.infrastructure.surge_pricing import SurgePricingRefresher
+
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+
+
+def make_engine(**overrides):
+    params = dict(cell_size_km=1.0, window_seconds=60.0, tick_seconds=10.0, sensitivity=0.5, max_multiplier=3.0)
+    params.update(overrides)
+    return SurgePricingEngine(**params)
+
+
+def make_driver(driver_id, location):
+    return Driver(
+        id=driver_id, name="Driver", email=f"d{driver_id}@taxi24.com", phone="+51900000000",
+        license_number=f"LIC{driver_id}", status=DriverStatus.AVAILABLE, current_location=location
+    )
+
+
+def test_compute_surge_multiplier():
+    assert compute_surge_multiplier(0, 0, 0.5, 3.0) == 1.0
+    assert compute_surge_multiplier(2, 4, 0.5, 3.0) == 1.0
+    assert compute_surge_multiplier(6, 2, 0.5, 3.0) == 2.0
+    assert compute_surge_multiplier(100, 1, 0.5, 3.0) == 3.0
+
+
+def test_surge_applies_after_tick_and_expires():
+    engine = make_engine()
+    engine.update_supply([make_driver(1, PICKUP)])
+    for _ in range(5):
+        engine.record_demand(PICKUP, now=0.0)
+
+    # Multipliers only change on tick
+    assert engine.multiplier_for(PICKUP)[1] == 1.0
+    engine.tick(now=1.0)
+    assert engine.multiplier_for(PICKUP)[1] == 3.0
+
+    # Demand outside the rolling window no longer counts
+    engine.tick(now=120.0)
+    assert engine.multiplier_for(PICKUP)[1] == 1.0
+    assert engine.zone_counts(engine.zone_for(PICKUP)) == (0, 1)
+
+
+def test_is_due_follows_tick_interval():
+    engine = make_engine()
+    assert engine.is_due(now=0.0)
+    engine.tick(now=0.0)
+    assert not engine.is_due(now=5.0)
+    assert engine.is_due(now=10.0)
+
+
+def test_refresh_is_single_flight():
+    engine = make_engine()
+    loading, release = threading.Event(), threading.Event()
+    loads = []
+
+    def slow_supply():
+        loads.append(1)
+        loading.set()
+        release.wait(5)
+        return [make_driver(1, PICKUP)]
+
+    refresher = threading.Thread(target=engine.refresh_if_due, args=(slow_supply, 0.0))
+    refresher.start()
+    assert loading.wait(5)
+    # A concurrent caller keeps quoting from the current table instead of loading drivers too
+    assert not engine.refresh_if_due(slow_supply, now=0.0)
+    release.set()
+    refresher.join()
+    assert loads == [1]
+    assert not engine.refresh_if_due(slow_supply, now=5.0)
+    assert engine.zone_counts(engine.zone_for(PICKUP)) == (0, 1)
+
+
+def test_background_refresher_ticks_the_surge_tables():
+    database = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=database)
+    session_factory = sessionmaker(bind=database)
+    db = session_factory()
+    SQLDriverRepository(db).create(make_driver(None, PICKUP))
+    db.close()
+
+    engine = make_engine()
+    refresher = SurgePricingRefresher(engine, session_factory)
+    assert refresher.run_once()
+    assert engine.zone_counts(engine.zone_for(PICKUP)) == (0, 1)
+    assert not refresher.run_once()  # not due again until the next tick
+
+
+def test_quote_endpoint(client):
+    payload = {
+        "pickup_location": {"latitude": -12.0464, "longitude": -77.0428},
+        "destination_location": {"latitude": -12.0500, "longitude": -77.0450}
+    }
+    response = client.post("/api/v1/pricing/quote", json=payload)
+    assert response.status_code == 200
+    quote = response.json()
+    assert quote["surge_multiplier"] >= 1.0
+    assert quote["distance_km"] > 0
+    assert Decimal(quote["estimated_fare"]) >= Decimal(quote["base_fare"])
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import re
+
+import pytest
+from sqlalchemy import create_engine, text, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from main import app
+from app.domain.entities import Driver, DriverStatus, Location, Passenger
+from app.infrastructure.database import get_db
+from app.infrastructure.models import Base, DriverModel, DriverStatusEnum, TripModel
+from app.infrastructure.query_tracking import track_queries
+from app.infrastructure.repositories import SQLDriverRepository, SQLPassengerRepository
+from app.presentation.middleware import QueryBudget, QueryBudgetExceededError, QueryBudgetMiddleware
+
+PICKUP = {"latitude": -12.0464, "longitude": -77.0428}
+
+
+@pytest.fixture
+def seeded_session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    for i in range(3):
+        SQLDriverRepository(db).create(Driver(
+            id=None, name=f"Driver {i}", email=f"d{i}@taxi24.com", phone="+51900000000", license_number=f"LIC{i}",
+            status=DriverStatus.AVAILABLE,
+            current_location=Location(latitude=PICKUP["latitude"] + i * 0.001, longitude=PICKUP["longitude"])
+        ))
+    SQLPassengerRepository(db).create(Passenger(id=None, name="Pedro", email="p@email.com", phone="+5191"))
+    db.close()
+
+    def override_get_db():
+        session = factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    previous = app.dependency_overrides[get_db]
+    app.dependency_overrides[get_db] = override_get_db
+    yield factory
+    app.dependency_overrides[get_db] = previous
+
+
+def test_trip_flow_stays_within_budgets(client, seeded_session_factory):
+    # conftest runs the app with QUERY_BUDGET_MODE=raise, so any overrun fails the request
+    trip = client.post("/api/v1/trips", json={"passenger_id": 1, "pickup_location": PICKUP}).json()
+    assert client.put(f"/api/v1/trips/{trip['id']}/accept").status_code == 200
+    assert client.put(f"/api/v1/trips/{trip['id']}/start").status_code == 200
+    response = client.put(
+        f"/api/v1/trips/{trip['id']}/complete", json={"destination_location": PICKUP, "fare": "12.50"}
+    )
+    assert response.status_code == 200
+    invoice = client.post(f"/api/v1/trips/{trip['id']}/invoice").json()
+    assert invoice["tax_amount"] == "2.25"
+
+    for path in ("/drivers", "/drivers/1", "/drivers/available", "/passengers/1", "/trips/active"):
+        assert client.get(f"/api/v1{path}").status_code == 200
+
+
+def test_widened_dispatch_stays_within_budget(client, seeded_session_factory):
+    db = seeded_session_factory()
+    db.execute(update(DriverModel).values(status=DriverStatusEnum.OFFLINE))
+    db.commit()
+    SQLDriverRepository(db).create(Driver(
+        id=None, name="Far", email="far@taxi24.com", phone="+51900000000", license_number="LICFAR",
+        status=DriverStatus.AVAILABLE, current_location=Location(latitude=PICKUP["latitude"] + 0.072, longitude=PICKUP["longitude"])
+    ))
+    db.close()
+    trip = client.post("/api/v1/trips", json={"passenger_id": 1, "pickup_location": PICKUP}).json()
+    assert (trip["driver_id"], trip["search_radius_km"]) == (4, 9)  # about 8 km north
+
+
+def test_overrun_raises_in_strict_mode():
+    async def app_issuing_two_queries(scope, receive, send):
+        with create_engine("sqlite://").connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 1"))
+
+    middleware = QueryBudgetMiddleware(
+        app_issuing_two_queries, [QueryBudget("tight", "GET", re.compile("^/x$"), max_statements=1)]
+    )
+    scope = {"type": "http", "method": "GET", "path": "/x"}
+    with pytest.raises(QueryBudgetExceededError):
+        asyncio.run(middleware(scope, None, None))
+
+
+def test_lazy_relationship_loads_are_counted_and_logged(seeded_session_factory, caplog):
+    db = seeded_session_factory()
+    db.add(TripModel(passenger_id=1, driver_id=1, pickup_latitude=PICKUP["latitude"], pickup_longitude=PICKUP["longitude"]))
+    db.commit()
+    db.close()
+
+    db = seeded_session_factory()
+    with caplog.at_level(logging.WARNING), track_queries() as stats:
+        trip = db.query(TripModel).first()
+        assert trip.passenger.name == "Pedro"
+    db.close()
+    assert stats.statements == 2
+    assert stats.lazy_loads == 1
+    assert "Relationship load" in caplog.text
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.infrastructure.rate_limit import (
+    InMemoryRateLimitBackend, SQLiteRateLimitBackend, AdaptiveConcurrencyLimiter
+)
+
+
+def test_token_bucket_allows_burst_then_throttles():
+    backend = InMemoryRateLimitBackend(idle_ttl_seconds=60)
+    assert all(backend.acquire("client", rate=1.0, burst=3, now=0.0) == 0 for _ in range(3))
+    assert backend.acquire("client", rate=1.0, burst=3, now=0.0) == 1.0
+    # One token refills per second
+    assert backend.acquire("client", rate=1.0, burst=3, now=1.0) == 0
+    # Other clients have their own bucket
+    assert backend.acquire("other", rate=1.0, burst=3, now=1.0) == 0
+
+
+def test_idle_buckets_are_evicted():
+    backend = InMemoryRateLimitBackend(idle_ttl_seconds=10)
+    for i in range(100):
+        backend.acquire(f"client-{i}", rate=1.0, burst=1, now=float(i) / 100)
+    assert len(backend) == 100
+    backend.acquire("late", rate=1.0, burst=1, now=20.0)
+    assert len(backend) == 1
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "ratelimit.db")
+    worker_a = SQLiteRateLimitBackend(path, idle_ttl_seconds=60)
+    worker_b = SQLiteRateLimitBackend(path, idle_ttl_seconds=60)
+    assert worker_a.acquire("client", rate=1.0, burst=2, now=100.0) == 0
+    assert worker_b.acquire("client", rate=1.0, burst=2, now=100.0) == 0
+    assert worker_a.acquire("client", rate=1.0, burst=2, now=100.0) > 0
+
+
+def test_concurrency_limiter_reserves_headroom_for_high_priority():
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=2, min_limit=1, max_limit=10, high_priority_reserve=1, queue_delay_target_seconds=0.1
+    )
+
+    async def admitted():
+        return [await limiter.acquire(), await limiter.acquire(), await limiter.acquire(), await limiter.acquire(True)]
+
+    assert asyncio.run(admitted()) == [True, True, False, True]
+    assert limiter.shed_count == 1
+
+
+def queueing_limiter(now):
+    return AdaptiveConcurrencyLimiter(
+        initial_limit=10, min_limit=2, max_limit=20, high_priority_reserve=0,
+        queue_delay_target_seconds=0.1, max_queue_wait_seconds=5.0, clock=lambda: now[0]
+    )
+
+
+async def congested_round(limiter, now, waiting):
+    """Fill every slot, queue more requests, then let a second pass before the slots free up"""
+    holders = int(limiter.limit)
+    for _ in range(holders):
+        assert await limiter.acquire()
+    queued = [asyncio.create_task(limiter.acquire()) for _ in range(waiting)]
+    await asyncio.sleep(0)
+    now[0] += 1.0
+    for _ in range(holders):
+        limiter.release(1.0)
+    assert all(await asyncio.gather(*queued))
+    for _ in queued:
+        limiter.release(1.0)
+
+
+def test_requests_over_the_limit_wait_for_a_slot_and_are_shed_after_the_wait():
+    now = [0.0]
+    limiter = queueing_limiter(now)
+    asyncio.run(congested_round(limiter, now, 5))
+    assert limiter.in_flight == 0 and limiter.shed_count == 0
+    # Five slow admissions in one round trip shrink the limit once, not five times
+    assert limiter.limit == pytest.approx(9.0)
+
+    async def shed():
+        for _ in range(int(limiter.limit)):
+            assert await limiter.acquire()
+        limiter.max_queue_wait_seconds = 0.01
+        assert not await limiter.acquire()
+
+    asyncio.run(shed())
+    assert limiter.shed_count == 1
+
+
+def test_concurrency_limit_adapts_to_queueing_delay():
+    now = [0.0]
+    limiter = queueing_limiter(now)
+    for _ in range(30):
+        asyncio.run(congested_round(limiter, now, 2))
+    assert limiter.limit == 2
+    for _ in range(5):
+        now[0] += 1.0
+        assert asyncio.run(limiter.acquire())
+        limiter.release(0.01)
+    assert limiter.limit == 6  # the last congested window, then four calm ones
+
+
+def test_nearby_endpoint_is_rate_limited_per_client(client, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_api_keys", ["rate-limit-test", "another-client"])
+    url = "/api/v1/drivers/available/nearby?latitude=-12.0464&longitude=-77.0428"
+    headers = {"X-API-Key": "rate-limit-test"}
+    responses = [client.get(url, headers=headers) for _ in range(25)]
+    throttled = [response for response in responses if response.status_code == 429]
+    assert throttled
+    assert "retry-after" in throttled[0].headers
+    assert client.get(url, headers={"X-API-Key": "another-client"}).status_code == 200
+    # Admission control is the outermost layer: a limited client is turned away before its city is looked up
+    assert client.get(url, headers={**headers, "X-City": "atlantis"}).status_code == 429
+
+    # Unknown keys share their IP's bucket, so rotating them does not reset the limit
+    responses = [client.get(url, headers={"X-API-Key": f"rotated-{i}"}) for i in range(25)]
+    assert any(response.status_code == 429 for response in responses)
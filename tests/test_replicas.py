@@ -0,0 +1,121 @@
+import shutil
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from main import app
+from app.domain.entities import Passenger
+from app.infrastructure import database
+from app.infrastructure.database import Base, ReplicaPool, get_db, make_engine
+from app.infrastructure.models import DriverModel, DriverStatusEnum
+from app.infrastructure.repositories import SQLPassengerRepository
+
+PICKUP = {"latitude": -12.0464, "longitude": -77.0428}
+
+
+def make_database(path, driver_name):
+    engine = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(DriverModel(
+        name=driver_name, email=f"{driver_name}@taxi24.com", phone="+51900000000",
+        license_number=f"LIC-{driver_name}", status=DriverStatusEnum.AVAILABLE,
+        latitude=-12.0464, longitude=-77.0428
+    ))
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def make_replicas(tmp_path, count):
+    primary = tmp_path / "primary.db"
+    make_database(primary, "replicated")
+    urls = []
+    for i in range(count):
+        replica = tmp_path / f"replica{i}.db"
+        shutil.copy(primary, replica)
+        urls.append(f"sqlite:///{replica}")
+    return urls
+
+
+def test_round_robin_across_healthy_replicas(tmp_path):
+    pool = ReplicaPool(make_replicas(tmp_path, 2), health_check_interval_seconds=60)
+    chosen = [pool.choose() for _ in range(4)]
+    assert chosen == [pool.engines[0], pool.engines[1], pool.engines[0], pool.engines[1]]
+
+
+def test_unhealthy_replicas_are_skipped(tmp_path):
+    urls = make_replicas(tmp_path, 1) + [f"sqlite:///{tmp_path}/missing/dir/replica.db"]
+    pool = ReplicaPool(urls, health_check_interval_seconds=60)
+    pool.check_health()
+    assert {pool.choose() for _ in range(4)} == {pool.engines[0]}
+    assert pool.healthy == [True, False]
+
+
+def test_no_healthy_replica_falls_back_to_primary(tmp_path):
+    pool = ReplicaPool([f"sqlite:///{tmp_path}/missing/dir/replica.db"], health_check_interval_seconds=60)
+    pool.check_health()
+    assert pool.choose() is None
+    assert ReplicaPool([], health_check_interval_seconds=60).choose() is None
+
+
+def test_health_is_checked_in_the_background(tmp_path):
+    urls = make_replicas(tmp_path, 1) + [f"sqlite:///{tmp_path}/missing/dir/replica.db"]
+    pool = ReplicaPool(urls, health_check_interval_seconds=0.01)
+    assert {pool.choose() for _ in range(2)} == set(pool.engines)  # choosing never checks
+    pool.start()
+    try:
+        deadline = time.monotonic() + 5
+        while pool.healthy != [True, False] and time.monotonic() < deadline:
+            time.sleep(0.005)
+    finally:
+        pool.stop()
+    assert {pool.choose() for _ in range(4)} == {pool.engines[0]}
+
+
+def test_least_latency_selection(tmp_path):
+    pool = ReplicaPool(make_replicas(tmp_path, 2), health_check_interval_seconds=60, selection="least_latency")
+    pool.check_health()
+    pool.latencies = [0.5, 0.1]
+    assert pool.choose() is pool.engines[1]
+
+
+def test_read_endpoints_use_replicas(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "replica_pool", ReplicaPool(make_replicas(tmp_path, 2), 60))
+
+    names = [driver["name"] for driver in client.get("/api/v1/drivers").json()]
+    assert names == ["replicated"]
+
+    names = [
+        driver["name"]
+        for driver in client.get("/api/v1/drivers", headers={"X-Read-Consistency": "primary"}).json()
+    ]
+    assert "replicated" not in names
+
+
+def test_reads_stay_on_the_primary_after_a_write(client, tmp_path, monkeypatch):
+    replicas = make_replicas(tmp_path, 1)
+    primary = sessionmaker(bind=make_engine(f"sqlite:///{tmp_path}/primary.db"))
+    db = primary()
+    SQLPassengerRepository(db).create(Passenger(id=None, name="Pedro", email="p@email.com", phone="+5191"))
+    db.close()
+
+    def primary_db():
+        session = primary()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, primary_db)
+    monkeypatch.setattr(database, "replica_pool", ReplicaPool(replicas, 60))
+
+    assert "set-cookie" not in client.get("/api/v1/trips/active").headers
+    response = client.post("/api/v1/trips", json={"passenger_id": 1, "pickup_location": PICKUP})
+    assert response.status_code == 200
+    assert "read_primary=1; Max-Age=5" in response.headers["set-cookie"]
+
+    # The test client sends the cookie back, so the new trip is read from the primary
+    assert [trip["id"] for trip in client.get("/api/v1/trips/active").json()] == [response.json()["id"]]
+    client.cookies.clear()
+    assert client.get("/api/v1/trips/active").json() == []
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from app.core.config import settings
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_python(args, tmp_path, **env):
+    return subprocess.run(
+        [sys.executable] + args,
+        cwd=ROOT,
+        env={**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path}/startup.db", **env},
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+
+def parse_importtime(stderr):
+    """Map top-level module name -> cumulative import time in microseconds"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # imported by the script itself, not by another module
+            timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def test_startup_import_budget(tmp_path):
+    # The framework any worker needs is imported first, so main's time is only what the app adds
+    framework = ("fastapi", "pydantic_settings", "sqlalchemy.orm")
+    ratios = []
+    for _ in range(3):  # best of three, so a busy machine does not fail the budget
+        result = run_python(
+            ["-X", "importtime", "-c", f"import {', '.join(framework)}; import main"], tmp_path, FAST_BOOT="1"
+        )
+        timings = parse_importtime(result.stderr)
+        ratios.append(timings["main"] / sum(timings[name] for name in framework))
+
+    # Only needed by the CLI / dev server, never on the API boot path
+    assert "app.infrastructure.seed_data" not in result.stderr
+    assert "uvicorn" not in result.stderr
+    assert min(ratios) <= settings.startup_import_budget_ratio
+    # The engine is created on first use, not at import
+    assert not (tmp_path / "startup.db").exists()
+
+
+def test_cli_bootstraps_schema_and_seed_data(tmp_path):
+    run_python(["-m", "app.cli", "init-db", "--seed"], tmp_path)
+    result = run_python([
+        "-c",
+        "from app.infrastructure.database import SessionLocal;"
+        "from app.infrastructure.models import DriverModel;"
+        "print(SessionLocal().query(DriverModel).count())"
+    ], tmp_path)
+    assert result.stdout.strip() == "5"
+
+    # Seeding is idempotent
+    run_python(["-m", "app.cli", "seed"], tmp_path)
@@ -0,0 +1,131 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from main import app
+from app.core.config import Settings, process_settings, settings, use_city_settings
+from app.domain.entities import Driver, DriverStatus, Location
+from app.infrastructure.database import get_db, make_engine
+from app.infrastructure.dependencies import build_trip_service, tenants
+from app.infrastructure.models import Base
+from app.infrastructure.repositories import SQLDriverRepository
+from app.infrastructure.tenants import Tenant, TenantRegistry, UnknownCityError, load_city
+from sqlalchemy.orm import sessionmaker
+
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+QUIET = dict(
+    trip_scheduler_enabled=False, change_feed_enabled=False, heartbeat_enabled=False,
+    trail_enabled=False, nearby_degradation_enabled=False
+)
+
+
+def test_city_settings_override_the_process_settings():
+    base = Settings(cities={"cusco": {"tax_rate": "0.1", "max_nearby_drivers": 5}})
+    cusco = base.for_city("cusco")
+    assert (cusco.tax_rate, cusco.max_nearby_drivers, cusco.base_fare) == (0.1, 5, base.base_fare)
+    assert cusco.cities == {}
+    assert (cusco.fleet_snapshot_path, cusco.demand_forecast_path) == ("./fleet_state.cusco.snapshot", "./demand_forecast.cusco.json")
+    assert Settings(cities={"cusco": {"fleet_snapshot_path": "/var/cusco.bin"}}).for_city("cusco").fleet_snapshot_path == "/var/cusco.bin"
+    with pytest.raises(KeyError):
+        base.for_city("quito")
+
+    with use_city_settings(cusco):
+        assert settings.max_nearby_drivers == 5
+    assert settings.max_nearby_drivers == process_settings.max_nearby_drivers
+
+
+def seed_city(url, names_and_km):
+    engine = make_engine(url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    for i, (name, km) in enumerate(names_and_km):
+        SQLDriverRepository(db).create(Driver(
+            id=None, name=name, email=f"{name.lower()}@taxi24.com", phone="+51900000000", license_number=f"LIC{i}",
+            status=DriverStatus.AVAILABLE, current_location=Location(latitude=PICKUP.latitude + km / 111.2, longitude=PICKUP.longitude)
+        ))
+    db.close()
+    engine.dispose()
+
+
+def test_requests_are_served_from_their_city(client, tmp_path, monkeypatch):
+    lima, arequipa = f"sqlite:///{tmp_path}/lima.db", f"sqlite:///{tmp_path}/arequipa.db"
+    seed_city(lima, [("Lucia", 0.5), ("Luis", 2.0)])
+    seed_city(arequipa, [("Ana", 0.5), ("Andres", 2.0)])
+    monkeypatch.setattr(settings, "cities", {
+        "lima": {"database_url": lima, "default_search_radius_km": 1.0, **QUIET},
+        "arequipa": {"database_url": arequipa, "default_search_radius_km": 5.0, **QUIET},
+    })
+    monkeypatch.delitem(app.dependency_overrides, get_db)  # the test database is the default tenant's
+    params = {"latitude": PICKUP.latitude, "longitude": PICKUP.longitude}
+    try:
+        nearby = client.get("/api/v1/drivers/available/nearby", params=params, headers={"X-City": "lima"})
+        assert [driver["name"] for driver in nearby.json()] == ["Lucia"]
+        nearby = client.get("/api/v1/drivers/available/nearby", params=params, headers={"X-City": "Arequipa"})
+        assert sorted(driver["name"] for driver in nearby.json()) == ["Ana", "Andres"]
+        assert sorted(tenants.loaded()) == ["arequipa", "lima"]
+
+        drivers = client.get("/api/v1/drivers", headers={"X-City": "lima"})
+        assert sorted(driver["name"] for driver in drivers.json()) == ["Lucia", "Luis"]
+        assert "X-City" in drivers.headers["vary"]
+
+        response = client.get("/api/v1/drivers", headers={"X-City": "quito"})
+        assert response.status_code == 404 and response.json() == {"detail": "Unknown city: quito"}
+    finally:
+        tenants.stop_all()
+    assert tenants.loaded() == []
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_idle_and_excess_cities_are_unloaded():
+    base = Settings(cities={city: {"database_url": "sqlite://", "fast_boot": True, **QUIET} for city in "abcd"})
+    clock = Clock()
+    registry = TenantRegistry(
+        lambda city: load_city(base, build_trip_service, city), idle_ttl_seconds=60, max_loaded=2, clock=clock
+    )
+    with pytest.raises(UnknownCityError):
+        registry.acquire("z")
+
+    for city in "abc":
+        with registry.use(city) as tenant:
+            assert isinstance(tenant, Tenant) and tenant.city == city
+    assert registry.loaded() == ["b", "c"]  # a was least recently used
+
+    busy = registry.acquire("b")
+    clock.now += 61
+    assert registry.evict_idle() == ["c"]
+    assert registry.loaded() == ["b"]  # still serving a request
+    registry.release(busy)
+    assert registry.acquire("b", load=False) is busy
+    registry.release(busy)
+    clock.now += 61
+    assert registry.evict_idle() == ["b"] and registry.loaded() == []
+
+
+def test_a_loading_city_does_not_hold_up_other_cities():
+    base = Settings(cities={city: {"database_url": "sqlite://", "fast_boot": True, **QUIET} for city in "ab"})
+    release_a = threading.Event()
+    loads = []
+
+    def load(city):
+        loads.append(city)
+        if city == "a":
+            assert release_a.wait(5)
+        return load_city(base, build_trip_service, city)
+
+    registry = TenantRegistry(load, idle_ttl_seconds=60, max_loaded=4)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        first, second = pool.submit(registry.acquire, "a"), pool.submit(registry.acquire, "a")
+        b = pool.submit(registry.acquire, "b").result(timeout=5)  # while a is still loading
+        assert b.city == "b" and not first.done()
+        release_a.set()
+        assert first.result(timeout=5) is second.result(timeout=5)
+    assert sorted(loads) == ["a", "b"] and first.result().active_requests == 2
+    registry.stop_all()
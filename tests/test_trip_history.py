@@ -0,0 +1,159 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from main import app
+from app.domain.entities import Driver, DriverStatus, Passenger, TripCursor, TripHistoryQuery
+from app.infrastructure.database import get_db
+from app.infrastructure.models import Base, InvoiceModel, TripModel, TripStatusEnum
+from app.infrastructure.repositories import SQLDriverRepository, SQLInvoiceRepository, SQLPassengerRepository, SQLTripRepository
+from app.infrastructure.trip_partitions import archive_settled_trips, existing_partitions, partition_table
+
+# (passenger, driver, created_at, status); ids follow this order
+TRIPS = [
+    (1, 1, datetime(2024, 1, 5), TripStatusEnum.COMPLETED),
+    (1, 2, datetime(2024, 1, 20), TripStatusEnum.CANCELLED),
+    (2, 1, datetime(2024, 2, 3), TripStatusEnum.COMPLETED),
+    (1, 1, datetime(2024, 3, 9), TripStatusEnum.COMPLETED),
+    (1, 2, datetime(2024, 3, 9), TripStatusEnum.COMPLETED),
+    (1, 1, datetime(2024, 5, 1), TripStatusEnum.IN_PROGRESS),
+    (1, 2, datetime(2024, 6, 1), TripStatusEnum.COMPLETED),
+]
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    for passenger_id, driver_id, created_at, status in TRIPS:
+        db.add(TripModel(
+            passenger_id=passenger_id, driver_id=driver_id, pickup_latitude=-12.0464, pickup_longitude=-77.0428,
+            status=status, created_at=created_at
+        ))
+    db.commit()
+    moved = archive_settled_trips(db, datetime(2024, 4, 1), batch_size=2)
+    assert moved == 5
+    assert existing_partitions(db) == ["trips_202403", "trips_202402", "trips_202401"]
+    assert [model.id for model in db.query(TripModel)] == [6, 7]
+    db.close()
+    return factory
+
+
+def walk(repo, **filters):
+    pages, before = [], None
+    while True:
+        trips = repo.get_history(TripHistoryQuery(before=before, limit=2, **filters))
+        pages.append([trip.id for trip in trips])
+        if len(trips) < 2:
+            return pages
+        before = TripCursor(created_at=trips[-1].created_at, trip_id=trips[-1].id)
+
+
+def test_history_spans_hot_table_and_partitions(session_factory):
+    db = session_factory()
+    repo = SQLTripRepository(db)
+    assert walk(repo, passenger_id=1) == [[7, 6], [5, 4], [2, 1], []]
+    assert walk(repo, driver_id=1) == [[6, 4], [3, 1], []]
+    assert walk(repo, start=datetime(2024, 1, 10), end=datetime(2024, 5, 1)) == [[5, 4], [3, 2], []]
+    db.close()
+
+
+def test_archived_trips_are_found_by_id(session_factory):
+    db = session_factory()
+    repo = SQLTripRepository(db)
+    assert repo.get_by_id(3).created_at == datetime(2024, 2, 3)
+    assert repo.get_by_id(6).status.value == "in_progress"
+    assert repo.get_by_id(99) is None
+    db.close()
+
+
+def test_archived_trip_ids_are_not_reused(session_factory):
+    db = session_factory()
+    assert archive_settled_trips(db, datetime(2025, 1, 1)) == 1
+    assert [model.id for model in db.query(TripModel)] == [6]
+    db.query(TripModel).delete()
+    db.commit()
+    db.add(TripModel(passenger_id=1, pickup_latitude=-12.0464, pickup_longitude=-77.0428))
+    db.commit()
+    assert [model.id for model in db.query(TripModel)] == [8]
+    db.close()
+
+
+@pytest.fixture
+def history_client(client, session_factory):
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    previous = app.dependency_overrides[get_db]
+    app.dependency_overrides[get_db] = override_get_db
+    yield client
+    app.dependency_overrides[get_db] = previous
+
+
+def test_history_endpoints_page_with_cursors(history_client, session_factory):
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 3} | ({"cursor": cursor} if cursor else {})
+        page = history_client.get("/api/v1/passengers/1/trips", params=params).json()
+        ids += [trip["id"] for trip in page["trips"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert ids == [7, 6, 5, 4, 2, 1]
+
+    page = history_client.get("/api/v1/drivers/2/trips", params={"end": "2024-03-01T00:00:00"}).json()
+    assert [trip["id"] for trip in page["trips"]] == [2]
+    assert page["next_cursor"] is None
+
+    page = history_client.get("/api/v1/trips", params={"start": "2024-02-01T00:00:00", "limit": 1}).json()
+    assert [trip["id"] for trip in page["trips"]] == [7]
+    assert history_client.get("/api/v1/trips/2/trail").json() == []
+    assert history_client.get("/api/v1/trips/99/trail").status_code == 404
+
+    db = session_factory()
+    january = partition_table("trips_202401")
+    db.execute(update(january).where(january.c.id == 1).values(fare=Decimal("12.50")))
+    db.commit()
+    db.close()
+    invoice = history_client.post("/api/v1/trips/1/invoice").json()
+    assert (invoice["trip_id"], Decimal(str(invoice["amount"]))) == (1, Decimal("12.50"))
+    assert history_client.get("/api/v1/trips", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_archiving_keeps_invoices_with_foreign_keys_enforced():
+    # PostgreSQL enforces foreign keys; SQLite only does with this pragma
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    passenger = SQLPassengerRepository(db).create(Passenger(id=None, name="Pedro", email="p@email.com", phone="+5191"))
+    driver = SQLDriverRepository(db).create(Driver(
+        id=None, name="Driver", email="d@taxi24.com", phone="+51900000000", license_number="LIC1",
+        status=DriverStatus.AVAILABLE, current_location=None
+    ))
+    trip = TripModel(
+        passenger_id=passenger.id, driver_id=driver.id, pickup_latitude=-12.0464, pickup_longitude=-77.0428,
+        status=TripStatusEnum.COMPLETED, created_at=datetime(2024, 1, 5)
+    )
+    db.add(trip)
+    db.flush()
+    trip_id = trip.id
+    db.add(InvoiceModel(
+        trip_id=trip_id, amount=Decimal("10.00"), tax_amount=Decimal("1.80"), total_amount=Decimal("11.80")
+    ))
+    db.commit()
+
+    assert archive_settled_trips(db, datetime(2024, 4, 1)) == 1
+    assert db.query(TripModel).count() == 0
+    assert SQLInvoiceRepository(db).get_by_trip_id(trip_id).total_amount == Decimal("11.80")
+    db.close()
@@ -0,0 +1,134 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.application.services import RetryPolicy, TripService
+from app.domain.entities import Driver, DriverStatus, Location, Passenger, TripStatus
+from app.infrastructure.models import Base
+from app.infrastructure.repositories import SQLDriverRepository, SQLPassengerRepository, SQLTripRepository
+from app.infrastructure.scheduler import TimingWheel, TripTimeoutScheduler
+
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+DESTINATION = Location(latitude=-12.0500, longitude=-77.0450)
+
+
+def test_timing_wheel_expires_in_deadline_order():
+    wheel = TimingWheel(tick_seconds=1.0, wheel_size=4, start=0.0)
+    wheel.schedule("a", 2)
+    wheel.schedule("b", 6)  # more than one revolution away
+    wheel.schedule("c", 3)
+    assert wheel.cancel("c")
+    assert wheel.advance(1.0) == []
+    assert wheel.advance(2.0) == ["a"]
+    assert wheel.advance(5.0) == []
+    assert wheel.advance(6.0) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_timing_wheel_tick_skips_timers_due_in_later_revolutions():
+    wheel = TimingWheel(tick_seconds=1.0, wheel_size=4, start=0.0)
+    for i in range(100):
+        wheel.schedule(("later", i), 6 + 4 * i)  # all in the same slot as "now", revolutions ahead
+    wheel.schedule("now", 2)
+    assert wheel.slots[2] == {0: {"now": None}, **{1 + i: {("later", i): None} for i in range(100)}}
+    assert wheel.advance(2.0) == ["now"]
+    assert len(wheel.slots[2]) == 100  # the later buckets were not touched
+    assert wheel.cancel(("later", 0)) and 1 not in wheel.slots[2]
+    assert wheel.advance(10.0) == [("later", 1)]
+
+
+def test_timing_wheel_reschedule_replaces_timer():
+    wheel = TimingWheel(tick_seconds=1.0, wheel_size=8, start=0.0)
+    wheel.schedule("a", 1)
+    wheel.schedule("a", 5)
+    assert wheel.advance(4.0) == []
+    assert wheel.advance(5.0) == ["a"]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    driver_repo = SQLDriverRepository(session)
+    for i in range(2):
+        driver_repo.create(Driver(
+            id=None, name=f"Driver {i}", email=f"d{i}@taxi24.com", phone="+51900000000",
+            license_number=f"LIC{i}", status=DriverStatus.AVAILABLE,
+            current_location=Location(latitude=PICKUP.latitude + i * 0.001, longitude=PICKUP.longitude)
+        ))
+    SQLPassengerRepository(session).create(Passenger(id=None, name="Pedro", email="p@email.com", phone="+5191"))
+    return session
+
+
+def make_service(db):
+    timeouts = TripTimeoutScheduler(timeout_seconds=30, tick_seconds=1, wheel_size=64, on_timeout=lambda _: None)
+    timeouts.wheel = TimingWheel(tick_seconds=1, wheel_size=64, start=0.0)
+    service = TripService(
+        SQLTripRepository(db), SQLDriverRepository(db), SQLPassengerRepository(db),
+        retry_policy=RetryPolicy(attempts=3, backoff_seconds=0), trip_timeouts=timeouts
+    )
+    timeouts.on_timeout = service.expire_trip
+    return service, timeouts
+
+
+def driver_status(db, driver_id):
+    return SQLDriverRepository(db).get_by_id(driver_id).status
+
+
+def test_full_lifecycle(db):
+    service, timeouts = make_service(db)
+    trip = service.create_trip_request(1, PICKUP)
+    assert trip.id in timeouts.wheel
+
+    assert service.start_trip(trip.id) is None  # must be accepted first
+    assert service.accept_trip(trip.id).status == TripStatus.ACCEPTED
+    assert trip.id not in timeouts.wheel
+    assert service.start_trip(trip.id).status == TripStatus.IN_PROGRESS
+    assert service.cancel_trip(trip.id) is None
+    completed = service.complete_trip(trip.id, DESTINATION, Decimal("12.00"))
+    assert completed.status == TripStatus.COMPLETED
+    assert driver_status(db, trip.driver_id) == DriverStatus.AVAILABLE
+
+
+def test_cancel_releases_driver(db):
+    service, timeouts = make_service(db)
+    trip = service.create_trip_request(1, PICKUP)
+    assert service.cancel_trip(trip.id).status == TripStatus.CANCELLED
+    assert driver_status(db, trip.driver_id) == DriverStatus.AVAILABLE
+    assert len(timeouts.wheel) == 0
+
+
+def test_acceptance_timeout_reassigns_then_cancels(db):
+    service, timeouts = make_service(db)
+    trip = service.create_trip_request(1, PICKUP)
+    first_driver = trip.driver_id
+
+    assert timeouts.run_pending(now=30.0) == [trip.id]
+    reassigned = SQLTripRepository(db).get_by_id(trip.id)
+    assert reassigned.status == TripStatus.REQUESTED
+    assert reassigned.driver_id != first_driver
+    assert driver_status(db, first_driver) == DriverStatus.AVAILABLE
+    assert driver_status(db, reassigned.driver_id) == DriverStatus.BUSY
+
+    # Take the first driver offline so nobody is left to reassign to
+    driver_repo = SQLDriverRepository(db)
+    offline = driver_repo.get_by_id(first_driver)
+    offline.status = DriverStatus.OFFLINE
+    driver_repo.update(offline)
+
+    assert timeouts.run_pending(now=60.0) == [trip.id]
+    assert SQLTripRepository(db).get_by_id(trip.id).status == TripStatus.CANCELLED
+    assert driver_status(db, reassigned.driver_id) == DriverStatus.AVAILABLE
+    assert len(timeouts.wheel) == 0
+
+
+def test_pending_timeouts_are_rearmed(db):
+    service, timeouts = make_service(db)
+    trip = service.create_trip_request(1, PICKUP)
+    timeouts.cancel(trip.id)
+    assert service.schedule_pending_timeouts() == 1
+    assert trip.id in timeouts.wheel
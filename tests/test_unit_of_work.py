@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app.application.services import TripService
+from app.domain.entities import Driver, DriverStatus, Location, Passenger
+from app.infrastructure.models import Base, DriverModel, PassengerModel, TripModel
+from app.infrastructure.repositories import SQLDriverRepository, SQLPassengerRepository, SQLTripRepository
+from app.infrastructure.unit_of_work import GroupCommitter, SQLUnitOfWork
+
+PICKUP = Location(latitude=-12.0464, longitude=-77.0428)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # A file database, so separate sessions really are separate connections
+    engine = create_engine(f"sqlite:///{tmp_path / 'uow.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def passenger(i):
+    return Passenger(id=None, name=f"Passenger {i}", email=f"p{i}@email.com", phone="+5191")
+
+
+def count(factory, model):
+    db = factory()
+    try:
+        return db.query(model).count()
+    finally:
+        db.close()
+
+
+def test_writes_commit_together_and_nested_failures_roll_back_alone(session_factory):
+    db = session_factory()
+    repo = SQLPassengerRepository(db)
+    with SQLUnitOfWork(db) as unit:
+        repo.create(passenger(1))
+        assert count(session_factory, PassengerModel) == 0  # staged, not committed
+        with pytest.raises(IntegrityError):
+            with unit:
+                repo.create(passenger(2))
+                repo.create(passenger(2))  # duplicate email
+        repo.create(passenger(3))
+    assert [model.email for model in session_factory().query(PassengerModel)] == ["p1@email.com", "p3@email.com"]
+
+    with pytest.raises(RuntimeError):
+        with SQLUnitOfWork(db):
+            repo.create(passenger(4))
+            raise RuntimeError("abort")
+    assert count(session_factory, PassengerModel) == 2
+    db.close()
+
+
+def test_trip_creation_commits_once(session_factory):
+    db = session_factory()
+    SQLPassengerRepository(db).create(passenger(1))
+    SQLDriverRepository(db).create(Driver(
+        id=None, name="Driver", email="d@taxi24.com", phone="+51900000000", license_number="LIC1",
+        status=DriverStatus.AVAILABLE, current_location=PICKUP
+    ))
+    commits = []
+    event.listen(session_factory.kw["bind"], "commit", lambda conn: commits.append(conn))
+
+    service = TripService(
+        SQLTripRepository(db), SQLDriverRepository(db), SQLPassengerRepository(db), unit_of_work=SQLUnitOfWork(db)
+    )
+    trip = service.create_trip_request(1, PICKUP)
+    assert len(commits) == 1
+    service.complete_trip(trip.id, PICKUP, 10)
+    assert len(commits) == 2
+    assert db.get(DriverModel, 1).status.value == "available"
+    assert count(session_factory, TripModel) == 1
+    db.close()
+
+
+def test_group_committer_batches_concurrent_writers(session_factory):
+    committer = GroupCommitter(session_factory, max_batch=64, max_wait_seconds=0.05)
+    db = session_factory()
+    SQLPassengerRepository(db).create(passenger(99))
+    db.close()
+    commits = []
+    event.listen(session_factory.kw["bind"], "commit", lambda conn: commits.append(conn))
+    results, errors = {}, {}
+
+    def write(i):
+        try:
+            # Writer 7 reuses an existing email and must fail on its own
+            results[i] = committer.run(lambda db: SQLPassengerRepository(db).create(passenger(99 if i == 7 else i)))
+        except IntegrityError as error:
+            errors[i] = error
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    committer.stop()
+
+    assert list(errors) == [7]
+    assert len(results) == 15 and all(created.id for created in results.values())
+    assert count(session_factory, PassengerModel) == 16
+    assert len(commits) < 15
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.application.services import RetryPolicy, TripService
+from app.domain.entities import Driver, DriverStatus, Location, Passenger
+from app.domain.exceptions import OutOfServiceAreaError
+from app.domain.zones import ZoneIndex, parse_geojson_zones, point_in_ring
+from app.infrastructure.dependencies import DEFAULT_ZONES_PATH, load_zone_index
+from app.infrastructure.models import Base
+from app.infrastructure.repositories import SQLDriverRepository, SQLPassengerRepository, SQLTripRepository
+
+DOWNTOWN = (-12.0464, -77.0428)
+AIRPORT = (-12.0219, -77.1143)
+MIRAFLORES = (-12.1211, -77.0297)
+CUSCO = (-13.5320, -71.9675)
+
+
+def square(min_lon, min_lat, max_lon, max_lat):
+    return [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+
+
+def feature(zone_id, kind, coordinates, geometry_type="Polygon"):
+    return {
+        "type": "Feature",
+        "properties": {"id": zone_id, "name": zone_id.title(), "kind": kind},
+        "geometry": {"type": geometry_type, "coordinates": coordinates}
+    }
+
+
+def test_point_in_ring_handles_concave_polygons():
+    # U shape: the notch between the arms is outside
+    ring = [(0, 0), (3, 0), (3, 3), (2, 3), (2, 1), (1, 1), (1, 3), (0, 3), (0, 0)]
+    assert point_in_ring(0.5, 2, ring)
+    assert point_in_ring(2.5, 2, ring)
+    assert not point_in_ring(1.5, 2, ring)
+    assert not point_in_ring(4, 1, ring)
+
+
+def test_index_prefers_smallest_zone_and_respects_holes():
+    zones = parse_geojson_zones({"type": "FeatureCollection", "features": [
+        feature("city", "service_area", [square(0, 0, 10, 10), square(4, 4, 5, 5)]),  # with a hole
+        feature("airport", "airport", [[square(1, 1, 2, 2)], [square(8, 8, 9, 9)]], "MultiPolygon"),
+    ]})
+    index = ZoneIndex(zones, cell_size_deg=0.5)
+    assert index.classify(1.5, 1.5).id == "airport"
+    assert index.classify(8.5, 8.5).id == "airport"
+    assert index.classify(3.0, 3.0).id == "city"
+    assert index.classify(4.5, 4.5) is None
+    assert index.classify(11.0, 11.0) is None
+
+
+def test_bundled_zones_classify_lima():
+    index = load_zone_index(str(DEFAULT_ZONES_PATH))
+    assert index.classify(*DOWNTOWN).kind == "downtown"
+    assert index.classify(*AIRPORT).kind == "airport"
+    assert index.classify(*MIRAFLORES).kind == "service_area"
+    assert index.classify(*CUSCO) is None
+
+
+def test_classify_endpoint(client):
+    points = [{"latitude": lat, "longitude": lon} for lat, lon in (DOWNTOWN, AIRPORT, CUSCO)]
+    response = client.post("/api/v1/zones/classify", json={"points": points})
+    assert response.status_code == 200
+    zones = response.json()["zones"]
+    assert [zone and zone["kind"] for zone in zones] == ["downtown", "airport", None]
+
+
+@pytest.fixture
+def trip_service():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    SQLDriverRepository(db).create(Driver(
+        id=None, name="Driver", email="d@taxi24.com", phone="+51900000000", license_number="LIC1",
+        status=DriverStatus.AVAILABLE, current_location=Location(latitude=DOWNTOWN[0], longitude=DOWNTOWN[1])
+    ))
+    SQLPassengerRepository(db).create(Passenger(id=None, name="Pedro", email="p@email.com", phone="+5191"))
+    yield TripService(
+        SQLTripRepository(db), SQLDriverRepository(db), SQLPassengerRepository(db),
+        retry_policy=RetryPolicy(attempts=1, backoff_seconds=0),
+        zone_index=load_zone_index(str(DEFAULT_ZONES_PATH))
+    )
+    db.close()
+
+
+def test_trip_request_is_tagged_with_pickup_zone(trip_service):
+    trip = trip_service.create_trip_request(1, Location(latitude=DOWNTOWN[0], longitude=DOWNTOWN[1]))
+    assert trip.pickup_zone == "lima-centro"
+
+
+def test_trip_request_outside_service_area_is_rejected(trip_service):
+    with pytest.raises(OutOfServiceAreaError):
+        trip_service.create_trip_request(1, Location(latitude=CUSCO[0], longitude=CUSCO[1]))